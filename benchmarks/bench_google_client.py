@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+"""
+Benchmark: per-call Google authorization vs the cached google_client
+
+Runs the local Sheets stub (benchmarks/sheets_stub.py) with --latency-ms per request and
+updates --updates order statuses through:
+  - per call: read token.json, build Credentials, gspread.authorize, open_by_key
+    (a metadata request), update_cell (the old update_sheet_verification_status)
+  - cached:   bot.utils.update_sheet_verification_status via google_client
+Reports ms and Sheets requests per update. Then lets --threads threads ask for
+the worksheet at once while the token is inside the refresh margin (should
+refresh exactly once), and rotates token.json underneath a running process.
+Token refreshes are simulated (no network): they take --refresh-ms and hand out
+a new token valid for an hour.
+
+Usage:
+    python benchmarks/bench_google_client.py --updates 100 --latency-ms 80
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+SCRATCH = tempfile.mkdtemp(prefix='eeonam-bench-')
+TOKEN_PATH = os.path.join(SCRATCH, 'token.json')
+os.environ['GOOGLE_OAUTH_TOKEN_PATH'] = TOKEN_PATH
+os.environ.pop('GOOGLE_OAUTH_TOKEN_JSON', None)
+os.environ['GOOGLE_SHEET_ID'] = 'bench-sheet'
+os.environ['GOOGLE_TOKEN_CHECK_INTERVAL'] = '0.2'
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'eeonam_project.settings')
+
+import django  # noqa: E402
+import gspread  # noqa: E402
+from google.oauth2.credentials import Credentials  # noqa: E402
+
+django.setup()
+
+from bot.google_client import SCOPES, google_client  # noqa: E402
+from sheets_stub import StubClient, start_sheets_stub  # noqa: E402
+from bot.utils import update_sheet_verification_status  # noqa: E402
+
+
+def utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def write_token(token, expires_in):
+    with open(TOKEN_PATH, 'w') as f:
+        json.dump({
+            'token': token, 'refresh_token': 'bench-refresh', 'client_id': 'bench', 'client_secret': 'bench',
+            'expiry': (utcnow() + timedelta(seconds=expires_in)).strftime('%Y-%m-%dT%H:%M:%S.%fZ'),
+        }, f)
+
+
+def fake_refresh(refresh_seconds, counter):
+    def refresh(creds, request):
+        time.sleep(refresh_seconds)
+        counter.append(1)
+        creds.token = f"refreshed-{len(counter)}"
+        creds.expiry = utcnow() + timedelta(hours=1)
+    return refresh
+
+
+def legacy_update(order, status):
+    with open(TOKEN_PATH) as f:
+        creds = Credentials.from_authorized_user_info(json.load(f), SCOPES)
+    sheet = gspread.authorize(creds).open_by_key('bench-sheet').sheet1
+    sheet.update_cell(order.sheet_row_number, 13, status.title())
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--updates', type=int, default=100)
+    parser.add_argument('--latency-ms', type=float, default=80)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--refresh-ms', type=float, default=150)
+    args = parser.parse_args()
+
+    server, stub, base_url = start_sheets_stub(latency=args.latency_ms / 1000)
+    authorized = []
+    gspread.authorize = lambda creds: authorized.append(creds.token) or StubClient(base_url)
+    refreshes = []
+    Credentials.refresh = fake_refresh(args.refresh_ms / 1000, refreshes)
+    write_token('initial', 3600)
+    orders = [SimpleNamespace(order_id=f"EO-{n}", sheet_row_number=n + 2) for n in range(args.updates)]
+
+    print(f"{args.updates} status updates, Sheets latency {args.latency_ms:.0f} ms")
+    print(f"{'strategy':<10} | {'ms per update':>13} | {'Sheets requests per update':>26}")
+    print('-' * 56)
+    for label, update in (('per call', legacy_update), ('cached', update_sheet_verification_status)):
+        before = stub.requests
+        started = time.perf_counter()
+        for order in orders:
+            assert update(order, 'verified')
+        ms = (time.perf_counter() - started) / len(orders) * 1000
+        print(f"{label:<10} | {ms:>13.1f} | {(stub.requests - before) / len(orders):>26.2f}")
+
+    # Token now expires inside the refresh margin: every thread wants the sheet at once
+    google_client._creds.expiry = utcnow() + timedelta(seconds=60)
+    barrier = threading.Barrier(args.threads)
+
+    def worker():
+        barrier.wait()
+        return google_client.worksheet()
+
+    threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print(f"\n{args.threads} threads inside the refresh margin: {len(refreshes)} refresh(es), "
+          f"token.json rewritten: {json.load(open(TOKEN_PATH))['token'] == google_client._creds.token}")
+
+    # Someone rotates token.json (new grant) while the process keeps running
+    time.sleep(0.3)
+    write_token('rotated', 3600)
+    time.sleep(0.3)
+    update_sheet_verification_status(orders[0], 'rejected')
+    print(f"token.json rotated without a restart: now authorized with {authorized[-1]!r}")
+    print(f"google_client stats: {google_client.stats()}")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+"""
+Benchmark: per-send latency of bare requests.post against the pooled client
+
+Starts a local keep-alive HTTP server that answers like the Graph API
+/messages endpoint (optionally over TLS with a throwaway self-signed
+certificate, which is where keep-alive pays off most) and sends the same
+payload N times with each strategy.
+
+Usage:
+    python benchmarks/bench_http_client.py --sends 500 [--tls]
+"""
+
+import argparse
+import json
+import os
+import ssl
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'eeonam_project.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+import requests  # noqa: E402
+import urllib3  # noqa: E402
+
+from bot.http_client import PooledHttpClient  # noqa: E402
+
+PAYLOAD = {"messaging_product": "whatsapp", "to": "919000000000", "type": "text", "text": {"body": "Hello"}}
+
+
+class GraphHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        body = json.dumps({"messages": [{"id": "wamid.bench"}]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(tls):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), GraphHandler)
+    scheme = 'http'
+    if tls:
+        workdir = tempfile.mkdtemp(prefix='eeonam-bench-')
+        cert, key = os.path.join(workdir, 'cert.pem'), os.path.join(workdir, 'key.pem')
+        subprocess.run(
+            ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+             '-subj', '/CN=127.0.0.1', '-keyout', key, '-out', cert],
+            check=True, capture_output=True
+        )
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert, key)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+        scheme = 'https'
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"{scheme}://127.0.0.1:{server.server_address[1]}/v18.0/123/messages"
+
+
+def measure(send, sends):
+    latencies = []
+    for _ in range(sends):
+        started = time.perf_counter()
+        send()
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    return {
+        'mean': statistics.mean(latencies),
+        'p50': latencies[len(latencies) // 2],
+        'p95': latencies[int(len(latencies) * 0.95) - 1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sends', type=int, default=500)
+    parser.add_argument('--tls', action='store_true', help='Serve over TLS (needs openssl on PATH)')
+    args = parser.parse_args()
+
+    server, url = start_server(args.tls)
+    headers = {"Authorization": "Bearer bench", "Content-Type": "application/json"}
+    client = PooledHttpClient(pool_size=4)
+
+    def bare_send():
+        requests.post(url, headers=headers, json=PAYLOAD, verify=False).raise_for_status()
+
+    def pooled_send():
+        client.post(url, headers=headers, json=PAYLOAD, verify=False).raise_for_status()
+
+    results = [
+        ('requests.post (new connection)', measure(bare_send, args.sends)),
+        ('PooledHttpClient (keep-alive)', measure(pooled_send, args.sends)),
+    ]
+    server.shutdown()
+
+    print(f"{args.sends} sends over {'TLS' if args.tls else 'plain HTTP'} to a local Graph stub")
+    print(f"{'strategy':<32} | {'mean ms':>8} | {'p50 ms':>7} | {'p95 ms':>7}")
+    print('-' * 64)
+    for name, stats in results:
+        print(f"{name:<32} | {stats['mean']:>8.3f} | {stats['p50']:>7.3f} | {stats['p95']:>7.3f}")
+
+
+if __name__ == '__main__':
+    urllib3.disable_warnings()
+    main()
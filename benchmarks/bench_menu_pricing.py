@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+"""
+Benchmark: parse + total of synthetic orders, hard-coded dicts against the compiled menu
+
+The legacy path is a verbatim copy of the old EeOnamBot._parse_order and
+_calculate_total (per-call dict literals, inline `import re`, float → str →
+Decimal). The compiled path is CompiledMenu.parse_order + total in integer
+paise. Both must produce the same totals and summaries for every order.
+
+Usage:
+    python benchmarks/bench_menu_pricing.py --orders 100000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from decimal import Decimal
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'eeonam_project.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from bot.catalog import DEFAULT_MENU_ITEMS, CompiledMenu, paise_to_decimal  # noqa: E402
+
+
+def legacy_parse_order(order_text):
+    menu_mapping = {
+        1: 'Veg Sadhya',
+        2: 'Non-Veg Sadhya',
+        3: 'Palada Pradhaman',
+        4: 'Parippu/Gothambu Payasam',
+        5: 'Kaaya Varuthathu',
+        6: 'Sharkkaravaratti'
+    }
+    selected_items = {}
+    for item in order_text.split(','):
+        item = item.strip()
+        import re
+        match = re.match(r'(\d+)\s*[x*]\s*(\d+)', item, re.IGNORECASE)
+        if match:
+            item_id = int(match.group(1))
+            quantity = int(match.group(2))
+            if 1 <= item_id <= 6 and quantity > 0:
+                selected_items[item_id] = selected_items.get(item_id, 0) + quantity
+    return selected_items
+
+
+def legacy_calculate_total(selected_items, junction):
+    prices = {1: 150, 2: 200, 3: 40, 4: 40, 5: 30, 6: 30}
+    names = {
+        1: 'Veg Sadhya',
+        2: 'Non-Veg Sadhya',
+        3: 'Palada Pradhaman',
+        4: 'Parippu/Gothambu Payasam',
+        5: 'Kaaya Varuthathu',
+        6: 'Sharkkaravaratti'
+    }
+    total = 0
+    summary_lines = []
+    for item_id, quantity in selected_items.items():
+        item_total = prices[item_id] * quantity
+        total += item_total
+        summary_lines.append(f"• {names[item_id]} x {quantity} = ₹{item_total}")
+    if 'delivery' in junction:
+        delivery_fee = 50
+        total += delivery_fee
+        summary_lines.append(f"• Delivery Fee = ₹{delivery_fee}")
+    return Decimal(str(total)), '\n'.join(summary_lines)
+
+
+def synthetic_orders(count, seed=7):
+    rng = random.Random(seed)
+    separators = [' x ', 'x', '*', ' X ', ' * ']
+    orders = []
+    for _ in range(count):
+        parts = [
+            f"{rng.randint(1, 6)}{rng.choice(separators)}{rng.randint(1, 9)}"
+            for _ in range(rng.randint(1, 5))
+        ]
+        junction = rng.choice(['vyttila_delivery', 'pickup'])
+        orders.append((', '.join(parts), junction))
+    return orders
+
+
+def run_legacy(orders):
+    return [legacy_calculate_total(legacy_parse_order(text), junction) for text, junction in orders]
+
+
+def run_compiled(menu, orders):
+    results = []
+    for text, junction in orders:
+        total, lines = menu.total(menu.parse_order(text), 5000 if 'delivery' in junction else 0)
+        results.append((paise_to_decimal(total), '\n'.join(lines)))
+    return results
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, default=100000)
+    args = parser.parse_args()
+
+    orders = synthetic_orders(args.orders)
+    menu = CompiledMenu.from_rows(DEFAULT_MENU_ITEMS)
+
+    legacy, legacy_seconds = timed(run_legacy, orders)
+    compiled, compiled_seconds = timed(run_compiled, menu, orders)
+
+    mismatches = sum(1 for a, b in zip(legacy, compiled) if a != b or str(a[0]) != str(b[0]))
+
+    print(f"{args.orders} synthetic orders (parse + total)")
+    print(f"{'strategy':<28} | {'total s':>8} | {'us/order':>9}")
+    print('-' * 52)
+    for name, seconds in (('hard-coded dicts (legacy)', legacy_seconds), ('CompiledMenu (paise)', compiled_seconds)):
+        print(f"{name:<28} | {seconds:>8.3f} | {seconds / args.orders * 1e6:>9.2f}")
+    print(f"speedup: {legacy_seconds / compiled_seconds:.2f}x, mismatched results: {mismatches}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+"""
+Benchmark: amount-keyed QR cache hit ratio and per-order QR cost
+
+Order totals come from, in order of preference:
+  --totals-file  one total per line (e.g. the Amount column exported from the orders sheet)
+  --from-db      Order.total_amount from the configured DATABASE_URL, oldest first
+  otherwise      synthetic carts from the compiled menu: mostly one or two sadhyas,
+                 sometimes payasam or chips, half of them delivered (+ delivery fee)
+
+Replays the totals through LRUs of several sizes and reports the hit ratio
+(orders that need no render and no upload). Then times generate_qr_code per
+order in QR_CACHE_MODE=order and =amount, with the real render (inline) and
+the Cloudinary upload replaced by a sleep of --upload-ms.
+
+Usage:
+    python benchmarks/bench_qr_amount_cache.py --orders 300 [--totals-file totals.txt | --from-db]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter, OrderedDict
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+os.environ['QR_RENDER_WORKERS'] = '0'
+os.environ['QR_AMOUNT_CACHE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='eeonam-bench-'), 'qr_amount_urls.json')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'eeonam_project.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+import cloudinary.uploader  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+from bot.catalog import DEFAULT_MENU_ITEMS, CompiledMenu, paise_to_decimal, to_paise  # noqa: E402
+from bot.location_manager import DELIVERY_CHARGE  # noqa: E402
+from bot.qr_cache import amount_qr_cache  # noqa: E402
+from bot.qr_render import get_template  # noqa: E402
+from bot.utils import generate_qr_code  # noqa: E402
+
+
+def synthetic_totals(orders, seed=7):
+    rng = random.Random(seed)
+    menu = CompiledMenu.from_rows(DEFAULT_MENU_ITEMS)
+    totals = []
+    for _ in range(orders):
+        cart = {rng.choices([1, 2], weights=[3, 2])[0]: rng.choices([1, 2, 3, 4], weights=[6, 5, 2, 1])[0]}
+        if rng.random() < 0.25:
+            cart[rng.choice([3, 4])] = rng.choice([1, 2])
+        if rng.random() < 0.1:
+            cart[rng.choice([5, 6])] = 1
+        fee = to_paise(DELIVERY_CHARGE) if rng.random() < 0.5 else 0
+        totals.append(float(paise_to_decimal(menu.total(cart, fee)[0])))
+    return totals
+
+
+def load_totals(args):
+    if args.totals_file:
+        with open(args.totals_file, encoding='utf-8') as f:
+            return [float(line.strip().lstrip('₹').replace(',', '')) for line in f if line.strip()], args.totals_file
+    if args.from_db:
+        from bot.models import Order
+        return [float(t) for t in Order.objects.order_by('created_at').values_list('total_amount', flat=True)], 'database'
+    return synthetic_totals(args.orders), 'synthetic carts'
+
+
+def lru_hit_ratio(totals, size):
+    lru = OrderedDict()
+    hits = 0
+    for total in totals:
+        if total in lru:
+            hits += 1
+            lru.move_to_end(total)
+        else:
+            lru[total] = True
+            if len(lru) > size:
+                lru.popitem(last=False)
+    return hits / len(totals)
+
+
+def per_order_ms(totals, mode):
+    settings.QR_CACHE_MODE = mode
+    started = time.perf_counter()
+    for n, total in enumerate(totals):
+        generate_qr_code(total, f"EO-20250901-{n:04X}")
+    return (time.perf_counter() - started) / len(totals) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, default=300)
+    parser.add_argument('--totals-file')
+    parser.add_argument('--from-db', action='store_true')
+    parser.add_argument('--upload-ms', type=float, default=300)
+    parser.add_argument('--timed-orders', type=int, default=40)
+    args = parser.parse_args()
+
+    totals, source = load_totals(args)
+    counts = Counter(totals)
+    top = sum(count for _, count in counts.most_common(5))
+    print(f"{len(totals)} order totals from {source}: {len(counts)} distinct, "
+          f"top 5 totals cover {top / len(totals):.0%}")
+    print(f"{'LRU size':>8} | {'hit ratio':>9}")
+    print('-' * 20)
+    for size in (4, 8, 16, 32, 64):
+        print(f"{size:>8} | {lru_hit_ratio(totals, size):>9.1%}")
+
+    def upload(file, public_id=None, **options):
+        time.sleep(args.upload_ms / 1000)
+        return {'secure_url': f'https://res.cloudinary.test/{public_id}.png'}
+
+    cloudinary.uploader.upload = upload
+    get_template()
+    timed = totals[:args.timed_orders]
+    print(f"\ngenerate_qr_code over the first {len(timed)} orders (upload {args.upload_ms:.0f} ms):")
+    print(f"  order mode:  {per_order_ms(timed, 'order'):.1f} ms per order")
+    print(f"  amount mode: {per_order_ms(timed, 'amount'):.1f} ms per order "
+          f"(cache hit rate {amount_qr_cache.stats()['hit_rate']:.1%}, size {settings.QR_AMOUNT_CACHE_SIZE})")
+
+
+if __name__ == '__main__':
+    main()
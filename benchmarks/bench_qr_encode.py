@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+"""
+Benchmark: payment QR image encoding options
+
+Encodes the same composed payment QR canvases with:
+  - legacy: RGB PNG, optimize=False, upscaled to 1000x1200 with LANCZOS and
+    re-encoded when under 10 KB (the old encode_png)
+  - RGB PNG at zlib level 6
+  - ImageEncoder palette PNG at several palette sizes and zlib levels
+  - ImageEncoder JPEG and WebP (lossless and lossy)
+and reports bytes, encode ms, decode ms (Pillow, full load) and how many images OpenCV's QR detector (when installed) decodes to their payload,
+plus whether the QR slot survives the round trip pixel for pixel.
+The explicit size floor (QR_MIN_IMAGE_BYTES padding) is left out of the byte
+counts; its cost is shown separately.
+
+Usage:
+    python benchmarks/bench_qr_encode.py --renders 20
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'eeonam_project.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+import numpy as np  # noqa: E402
+from PIL import Image  # noqa: E402
+
+from bot.qr_render import (  # noqa: E402
+    QR_SIZE,
+    QR_X,
+    QR_Y,
+    ImageEncoder,
+    build_upi_string,
+    get_template,
+    render_payment_qr
+)
+
+
+def legacy_encode(canvas):
+    img_buffer = io.BytesIO()
+    canvas.save(img_buffer, format='PNG', quality=95, optimize=False)
+    img_buffer.seek(0)
+    if len(img_buffer.getvalue()) < 10240:
+        canvas_large = canvas.resize((1000, 1200), Image.Resampling.LANCZOS)
+        img_buffer = io.BytesIO()
+        canvas_large.save(img_buffer, format='PNG', quality=100, optimize=False)
+        img_buffer.seek(0)
+    return img_buffer.getvalue()
+
+
+def rgb_png(canvas):
+    buffer = io.BytesIO()
+    canvas.save(buffer, format='PNG', compress_level=6)
+    return buffer.getvalue()
+
+
+OPTIONS = [
+    ('legacy RGB PNG (+upscale)', legacy_encode),
+    ('RGB PNG level 6', rgb_png),
+]
+for colors in (16, 64):
+    for level in (1, 6, 9):
+        OPTIONS.append((f'palette PNG {colors}c level {level}', ImageEncoder('png', colors, level).encode))
+OPTIONS += [
+    ('JPEG q90', ImageEncoder('jpeg', quality=90).encode),
+    ('WebP lossless', ImageEncoder('webp', quality=100).encode),
+    ('WebP q90', ImageEncoder('webp', quality=90).encode),
+]
+
+
+def decodes(encoded, orders):
+    """How many images OpenCV decodes to their payload (its detector misses a few of any encoding)"""
+    try:
+        import cv2
+    except ImportError:
+        return 'n/a'
+    detector = cv2.QRCodeDetector()
+    decoded = 0
+    for data, order in zip(encoded, orders):
+        with Image.open(io.BytesIO(data)) as img:
+            pixels = np.asarray(img.convert('L'))
+        decoded += detector.detectAndDecode(pixels)[0] == build_upi_string(*order)
+    return f"{decoded}/{len(encoded)}"
+
+
+def qr_exact(data, canvas):
+    """QR slot pixels identical to the composed canvas after a decode"""
+    box = (QR_X, QR_Y, QR_X + QR_SIZE, QR_Y + QR_SIZE)
+    with Image.open(io.BytesIO(data)) as img:
+        return np.array_equal(np.asarray(img.convert('RGB').crop(box)), np.asarray(canvas.crop(box)))
+
+
+def decode(data):
+    with Image.open(io.BytesIO(data)) as img:
+        img.load()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--renders', type=int, default=20)
+    args = parser.parse_args()
+
+    get_template()
+    orders = [(150 + n % 7 * 50, f"EO-20250901-{n:04X}") for n in range(args.renders)]
+    canvases = [render_payment_qr(amount, order_id) for amount, order_id in orders]
+    for _, encode in OPTIONS:
+        encode(canvases[0])
+
+    print(f"{args.renders} payment QR canvases ({canvases[0].width}x{canvases[0].height})")
+    print(f"{'option':<28} | {'bytes':>7} | {'encode ms':>9} | {'decode ms':>9} | {'decodes':>7} | {'QR exact':>8}")
+    print('-' * 85)
+    for name, encode in OPTIONS:
+        started = time.perf_counter()
+        encoded = [encode(canvas) for canvas in canvases]
+        encode_ms = (time.perf_counter() - started) / len(canvases) * 1000
+        started = time.perf_counter()
+        for data in encoded:
+            decode(data)
+        decode_ms = (time.perf_counter() - started) / len(encoded) * 1000
+        size = sum(map(len, encoded)) // len(encoded)
+        print(f"{name:<28} | {size:>7} | {encode_ms:>9.1f} | {decode_ms:>9.1f} | "
+              f"{decodes(encoded, orders):>7} | {str(qr_exact(encoded[0], canvases[0])):>8}")
+
+    padded = ImageEncoder('png', 16, 6, min_bytes=20480)
+    padded.palette()
+    started = time.perf_counter()
+    data = padded.encode(canvases[0])
+    pad_ms = (time.perf_counter() - started) * 1000
+    with Image.open(io.BytesIO(data)) as img:
+        img.load()
+    print(f"\npalette PNG padded to a 20 KB floor: {len(data)} bytes, {pad_ms:.1f} ms, still a valid PNG")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+"""
+Benchmark: locally served payment QR images against per-order Cloudinary uploads
+
+Against a scratch SQLite database and image directory:
+  - generate_qr_code per order with QR_HOSTING=cloudinary (upload replaced by a
+    sleep of --upload-ms) and with QR_HOSTING=local (render into the store)
+  - GET /qr/<order_id>.png as WhatsApp would fetch it: first fetch after
+    generate_qr_code, a repeat fetch, and a conditional GET with If-None-Match
+  - eviction: fills a store capped at a few images and checks it stays bounded
+
+Usage:
+    python benchmarks/bench_qr_endpoint.py --orders 20 --upload-ms 300
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from decimal import Decimal
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+SCRATCH = tempfile.mkdtemp(prefix='eeonam-bench-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(SCRATCH, 'bench.sqlite3')}"
+os.environ['QR_IMAGE_DIR'] = os.path.join(SCRATCH, 'qr_images')
+os.environ['QR_RENDER_WORKERS'] = '0'
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'eeonam_project.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+import cloudinary.uploader  # noqa: E402
+from django.conf import settings  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from bot.models import Order  # noqa: E402
+from bot.qr_render import get_template  # noqa: E402
+from bot.qr_store import QRImageStore, qr_image_store  # noqa: E402
+from bot.utils import generate_qr_code  # noqa: E402
+
+
+def create_orders(orders, prefix):
+    created = []
+    for n in range(orders):
+        created.append(Order.objects.create(
+            order_id=f"EO-{prefix}-{n:04X}", phone_number='919000000000',
+            delivery_date=timezone.localdate(), junction='pickup', items='{"1": 2}',
+            total_amount=Decimal(150 + n % 7 * 50)
+        ))
+    return created
+
+
+def timed_ms(func):
+    started = time.perf_counter()
+    result = func()
+    return (time.perf_counter() - started) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, default=20)
+    parser.add_argument('--upload-ms', type=float, default=300)
+    args = parser.parse_args()
+
+    call_command('migrate', verbosity=0)
+
+    def upload(file, public_id=None, **options):
+        time.sleep(args.upload_ms / 1000)
+        return {'secure_url': f'https://res.cloudinary.test/{public_id}.png'}
+
+    cloudinary.uploader.upload = upload
+    get_template()
+    client = Client(HTTP_HOST='localhost')
+
+    settings.QR_HOSTING = 'cloudinary'
+    uploaded = [timed_ms(lambda: generate_qr_code(float(o.total_amount), o.order_id))[0]
+                for o in create_orders(args.orders, 'CLOUD')]
+
+    settings.QR_HOSTING = 'local'
+    local_orders = create_orders(args.orders, 'LOCAL')
+    generated, first, repeat, revalidate = [], [], [], []
+    for order in local_orders:
+        ms, url = timed_ms(lambda: generate_qr_code(float(order.total_amount), order.order_id))
+        generated.append(ms)
+        path = url[len(settings.BASE_URL):]
+        ms, response = timed_ms(lambda: client.get(path))
+        assert response.status_code == 200 and response['Content-Type'] == 'image/png', response.status_code
+        first.append(ms)
+        repeat.append(timed_ms(lambda: client.get(path))[0])
+        ms, conditional = timed_ms(lambda: client.get(path, HTTP_IF_NONE_MATCH=response['ETag']))
+        assert conditional.status_code == 304, conditional.status_code
+        revalidate.append(ms)
+
+    print(f"{args.orders} orders, simulated upload {args.upload_ms:.0f} ms")
+    print(f"{'step':<44} | {'p50 ms':>8} | {'max ms':>8}")
+    print('-' * 66)
+    for label, samples in (
+        ('generate_qr_code, Cloudinary upload', uploaded),
+        ('generate_qr_code, local store', generated),
+        ('GET /qr/<id>.png after generate (200)', first),
+        ('GET /qr/<id>.png repeat (200)', repeat),
+        ('GET with If-None-Match (304)', revalidate),
+    ):
+        print(f"{label:<44} | {statistics.median(samples):>8.2f} | {max(samples):>8.2f}")
+    print(f"\nheaders: ETag {response['ETag'][:20]}..., Cache-Control: {response['Cache-Control']}")
+    print(f"store counters: {qr_image_store.stats()}")
+
+    image_bytes = len(response.content)
+    bounded = QRImageStore(os.path.join(SCRATCH, 'bounded'), max_bytes=image_bytes * 4)
+    for n in range(12):
+        bounded.get_or_render(1000 + n, f"EO-EVICT-{n:04X}")
+    on_disk = sum(size for _, size, _ in bounded._objects())
+    print(f"bounded store (cap {bounded.max_bytes} bytes): {on_disk} bytes on disk after 12 images, "
+          f"{bounded.evictions} evicted, newest still served: "
+          f"{bounded.lookup(1011, 'EO-EVICT-000B') is not None}")
+
+
+if __name__ == '__main__':
+    main()
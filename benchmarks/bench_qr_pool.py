@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+"""
+Benchmark: QR throughput with inline rendering against the warm process pool
+
+Several client threads (standing in for webhook threads) each request QR PNGs
+through a QRRenderService with 0 (inline, in-process) to N worker processes.
+A heartbeat thread meanwhile runs a tiny Python task every millisecond; its
+worst lateness shows how long rendering held this process's GIL, i.e. how long
+other conversations in the same web worker would have stalled.
+
+Usage:
+    python benchmarks/bench_qr_pool.py --renders 120 --clients 8 --workers 0 1 2 4
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'eeonam_project.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from bot.qr_render import get_template  # noqa: E402
+from bot.qr_service import QRRenderService  # noqa: E402
+
+
+class Heartbeat(threading.Thread):
+    """Wakes every millisecond and records how late each wake-up was"""
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.lateness = []
+        self.stopping = threading.Event()
+
+    def run(self):
+        while not self.stopping.is_set():
+            expected = time.perf_counter() + 0.001
+            time.sleep(0.001)
+            self.lateness.append(max(0.0, time.perf_counter() - expected) * 1000)
+
+
+def run(workers, renders, clients):
+    service = QRRenderService(workers=workers, max_pending=max(2, workers * 2),
+                              submit_timeout=60, render_timeout=60)
+    service.warm()
+
+    remaining = list(range(renders))
+    lock = threading.Lock()
+
+    def client():
+        while True:
+            with lock:
+                if not remaining:
+                    return
+                n = remaining.pop()
+            service.render_image(150 + n % 7 * 50, f"EO-20250901-{n:04X}")
+
+    heartbeat = Heartbeat()
+    heartbeat.start()
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    heartbeat.stopping.set()
+    heartbeat.join()
+
+    service.shutdown()
+
+    lateness = sorted(heartbeat.lateness)
+    return {
+        'rate': renders / elapsed,
+        'p50': statistics.median(lateness),
+        'p99': lateness[int(len(lateness) * 0.99) - 1],
+        'max': lateness[-1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--renders', type=int, default=120)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, 1, 2, 4])
+    args = parser.parse_args()
+
+    get_template()
+    print(f"{args.renders} QR renders from {args.clients} client threads, {os.cpu_count()} CPUs")
+    print(f"{'workers':<16} | {'renders/s':>9} | {'heartbeat lateness ms':>30}")
+    print(f"{'':<16} | {'':>9} | {'p50':>8} {'p99':>10} {'max':>10}")
+    print('-' * 62)
+    for workers in args.workers:
+        result = run(workers, args.renders, args.clients)
+        label = 'inline' if workers == 0 else f'{workers} process(es)'
+        print(f"{label:<16} | {result['rate']:>9.1f} | {result['p50']:>8.2f} {result['p99']:>10.2f} "
+              f"{result['max']:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+"""
+Benchmark: payment-step latency with and without speculative QR preparation
+
+Walks delivery conversations through EeOnamBot.process_message against a
+scratch SQLite database. The QR render is real (QR_RENDER_WORKERS=0, inline);
+the Cloudinary upload is replaced with a sleep of --upload-ms, and the
+customer spends --think-ms typing the address between the menu and address
+messages. Reports how long the address message (which sends the payment QR)
+takes to handle, and checks that the order got the reserved id and that a
+restarted conversation discards its reservation.
+
+Usage:
+    python benchmarks/bench_qr_prefetch.py --conversations 10 --upload-ms 400 --think-ms 1500
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix='eeonam-bench-'), 'bench.sqlite3')
+os.environ['DATABASE_URL'] = f'sqlite:///{DB_PATH}'
+os.environ['QR_RENDER_WORKERS'] = '0'
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'eeonam_project.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+import cloudinary.uploader  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+
+from bot.models import Order, UserSession  # noqa: E402
+from bot.qr_prefetch import qr_prefetcher  # noqa: E402
+from bot.qr_render import get_template  # noqa: E402
+from bot.services import EeOnamBot, WhatsAppService  # noqa: E402
+from bot.sheet_sync import sheet_syncer  # noqa: E402
+from bot.utils import get_available_dates  # noqa: E402
+
+
+class NullWhatsAppService(WhatsAppService):
+    """Accepts every send without touching the network"""
+
+    def _make_request(self, payload):
+        return True
+
+    def send_group(self, payloads):
+        return [True] * len(payloads)
+
+
+def slow_upload(upload_ms):
+    def upload(file, public_id=None, **options):
+        time.sleep(upload_ms / 1000)
+        return {'secure_url': f'https://res.cloudinary.test/{public_id}.png'}
+    return upload
+
+
+def order_steps(bot, phone):
+    date = get_available_dates()[0]
+    bot.process_message(phone, message_text='start')
+    bot.process_message(phone, message_type='interactive', interactive_data={
+        'button_reply': {'id': f"date_{date.strftime('%Y-%m-%d')}"}})
+    bot.process_message(phone, message_type='interactive', interactive_data={
+        'button_reply': {'id': 'vyttila_delivery'}})
+    bot.process_message(phone, message_text='1 x 2, 3 x 1')
+
+
+def run(bot, conversations, think_ms, phone_prefix):
+    latencies = []
+    reserved_ok = 0
+    for n in range(conversations):
+        phone = f'{phone_prefix}{n:05d}'
+        order_steps(bot, phone)
+        reserved = UserSession.objects.get(phone_number=phone).pending_order_id
+        time.sleep(think_ms / 1000)
+
+        started = time.perf_counter()
+        bot.process_message(phone, message_text='12 Temple Road, Vyttila')
+        latencies.append((time.perf_counter() - started) * 1000)
+
+        order = Order.objects.filter(phone_number=phone).first()
+        reserved_ok += bool(order) and (not reserved or order.order_id == reserved)
+    return latencies, reserved_ok
+
+
+def check_restart_discards(bot):
+    phone = '919999900001'
+    order_steps(bot, phone)
+    reserved = UserSession.objects.get(phone_number=phone).pending_order_id
+    bot.process_message(phone, message_text='start')
+    session = UserSession.objects.get(phone_number=phone)
+    return bool(reserved) and not session.pending_order_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--conversations', type=int, default=10)
+    parser.add_argument('--upload-ms', type=float, default=400)
+    parser.add_argument('--think-ms', type=float, default=1500)
+    args = parser.parse_args()
+
+    call_command('migrate', verbosity=0)
+    cloudinary.uploader.upload = slow_upload(args.upload_ms)
+    sheet_syncer.enqueue_append = lambda order: True
+    get_template()
+
+    bot = EeOnamBot(whatsapp=NullWhatsAppService())
+    print(f"{args.conversations} delivery conversations, upload {args.upload_ms:.0f} ms, "
+          f"address typed in {args.think_ms:.0f} ms")
+    print(f"{'mode':<14} | {'p50 ms':>8} | {'max ms':>8} | {'reserved id used':>16}")
+    print('-' * 56)
+    for label, enabled, prefix in (('on demand', False, '9190000'), ('speculative', True, '9191000')):
+        qr_prefetcher.enabled = enabled
+        latencies, reserved_ok = run(bot, args.conversations, args.think_ms, prefix)
+        print(f"{label:<14} | {statistics.median(latencies):>8.1f} | {max(latencies):>8.1f} | "
+              f"{reserved_ok:>9} of {args.conversations:<3}")
+
+    print(f"\nrestart discards the reservation: {check_restart_discards(bot)}")
+    print(f"prefetch counters: {qr_prefetcher.stats()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+"""
+Benchmark: branded payment QR rendering
+
+Strategies:
+  - legacy: a verbatim copy of the old utils.generate_qr_code drawing code
+    (everything up to the PNG encode)
+  - the pre-rendered template with qrcode's PIL backend + LANCZOS resize
+  - bot.qr_render.render_payment_qr (template + NumPy integer-scale raster)
+
+Reports renders per second and the peak Python-heap allocation of a single
+render (tracemalloc). Scan equivalence is checked by decoding with OpenCV's
+QR detector (when installed), by reading the module grid back at module
+centres and comparing it with the encoder's matrix, and by comparing
+VectorizedQRCode's module matrices with qrcode.QRCode's.
+
+Usage:
+    python benchmarks/bench_qr_render.py --renders 200
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'eeonam_project.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+import numpy as np  # noqa: E402
+import PIL  # noqa: E402
+import qrcode  # noqa: E402
+from PIL import Image, ImageDraw, ImageFont  # noqa: E402
+
+from bot.fonts import font_registry  # noqa: E402
+from bot.qr_render import (  # noqa: E402
+    QR_SIZE,
+    QR_X,
+    QR_Y,
+    build_upi_string,
+    get_template,
+    qr_modules,
+    render_payment_qr,
+    render_qr_matrix
+)
+
+
+def legacy_render(amount, order_id):
+    upi_string = build_upi_string(amount, order_id)
+    qr = qrcode.QRCode(version=3, error_correction=qrcode.constants.ERROR_CORRECT_H, box_size=15, border=6)
+    qr.add_data(upi_string)
+    qr.make(fit=True)
+    qr_img = qr.make_image(fill_color="black", back_color="white")
+
+    canvas_width = 800
+    canvas_height = 1000
+    canvas = Image.new('RGB', (canvas_width, canvas_height), 'white')
+    draw = ImageDraw.Draw(canvas)
+
+    border_color = "#2E8B57"
+    border_width = 8
+    draw.rectangle([0, 0, canvas_width, canvas_height], outline=border_color, width=border_width)
+    inner_border_margin = 20
+    draw.rectangle([
+        inner_border_margin, inner_border_margin,
+        canvas_width - inner_border_margin, canvas_height - inner_border_margin
+    ], outline="#FFD700", width=4)
+
+    header_height = 120
+    draw.rectangle([border_width, border_width, canvas_width - border_width, header_height + border_width],
+                   fill="#2E8B57")
+
+    try:
+        title_font = ImageFont.truetype("/System/Library/Fonts/Arial.ttc", 48)
+        subtitle_font = ImageFont.truetype("/System/Library/Fonts/Arial.ttc", 24)
+        detail_font = ImageFont.truetype("/System/Library/Fonts/Arial.ttc", 20)
+    except Exception:
+        try:
+            title_font = ImageFont.load_default()
+            subtitle_font = ImageFont.load_default()
+            detail_font = ImageFont.load_default()
+        except Exception:
+            title_font = subtitle_font = detail_font = None
+
+    brand_text = "SADYA KOCHI"
+    if title_font:
+        bbox = draw.textbbox((0, 0), brand_text, font=title_font)
+        draw.text(((canvas_width - (bbox[2] - bbox[0])) // 2, 25), brand_text, fill="white", font=title_font)
+
+    tagline = "Authentic Kerala Meals Delivered"
+    if subtitle_font:
+        bbox = draw.textbbox((0, 0), tagline, font=subtitle_font)
+        draw.text(((canvas_width - (bbox[2] - bbox[0])) // 2, 80), tagline, fill="#FFD700", font=subtitle_font)
+
+    qr_size = 450
+    qr_img_resized = qr_img.resize((qr_size, qr_size), Image.Resampling.LANCZOS)
+    qr_x = (canvas_width - qr_size) // 2
+    qr_y = header_height + 50
+
+    shadow_offset = 5
+    draw.rectangle([qr_x + shadow_offset, qr_y + shadow_offset,
+                    qr_x + qr_size + shadow_offset, qr_y + qr_size + shadow_offset], fill="#CCCCCC")
+    draw.rectangle([qr_x - 10, qr_y - 10, qr_x + qr_size + 10, qr_y + qr_size + 10],
+                   fill="white", outline="#DDDDDD", width=2)
+    canvas.paste(qr_img_resized, (qr_x, qr_y))
+
+    details_y = qr_y + qr_size + 40
+    if detail_font:
+        for offset, text, fill in ((0, f"Amount: ₹{amount:.2f}", "#2E8B57"),
+                                   (35, f"Order ID: {order_id}", "#666666"),
+                                   (70, "Scan to pay with any UPI app", "#666666")):
+            bbox = draw.textbbox((0, 0), text, font=detail_font)
+            draw.text(((canvas_width - (bbox[2] - bbox[0])) // 2, details_y + offset), text, fill=fill,
+                      font=detail_font)
+
+    for i in range(3):
+        draw.arc([30 + i*10, 140 + i*10, 70 + i*10, 180 + i*10], start=0, end=90, fill="#FFD700", width=3)
+        draw.arc([canvas_width - 70 - i*10, 140 + i*10, canvas_width - 30 - i*10, 180 + i*10],
+                 start=90, end=180, fill="#FFD700", width=3)
+    return canvas
+
+
+def lanczos_qr(upi_string):
+    """The pre-NumPy rasteriser: qrcode's PIL backend at box_size=15, LANCZOS down to the slot"""
+    qr = qrcode.QRCode(version=3, error_correction=qrcode.constants.ERROR_CORRECT_H, box_size=15, border=6)
+    qr.add_data(upi_string)
+    qr.make(fit=True)
+    return qr.make_image(fill_color="black", back_color="white").resize((QR_SIZE, QR_SIZE), Image.Resampling.LANCZOS)
+
+
+def template_lanczos_render(amount, order_id):
+    return get_template().compose(lanczos_qr(build_upi_string(amount, order_id)), amount, order_id)
+
+
+STRATEGIES = [
+    ('per-order redraw (legacy)', legacy_render),
+    ('template + LANCZOS QR', template_lanczos_render),
+    ('template + NumPy QR', render_payment_qr),
+]
+
+
+def qr_slot(canvas):
+    return canvas.convert('L').crop((QR_X, QR_Y, QR_X + QR_SIZE, QR_Y + QR_SIZE))
+
+
+def sampled_modules(slot, modules):
+    """
+    Read the module grid back from the slot the way a simple scanner would:
+    locate the dark symbol, then threshold each module centre.
+    """
+    pixels = np.asarray(slot) < 128
+    rows, cols = np.nonzero(pixels)
+    top, left, bottom, right = rows.min(), cols.min(), rows.max() + 1, cols.max() + 1
+    border = int(np.argmax(modules.any(axis=1)))
+    symbol = modules[border:modules.shape[0] - border, border:modules.shape[1] - border]
+    count = symbol.shape[0]
+    centres_y = (top + (np.arange(count) + 0.5) * (bottom - top) / count).astype(int)
+    centres_x = (left + (np.arange(count) + 0.5) * (right - left) / count).astype(int)
+    return np.array_equal(pixels[np.ix_(centres_y, centres_x)], symbol)
+
+
+def decodes(canvas, upi_string):
+    """Decode with OpenCV's QR detector when it is installed"""
+    try:
+        import cv2
+    except ImportError:
+        return 'n/a'
+    text, _, _ = cv2.QRCodeDetector().detectAndDecode(np.asarray(canvas.convert('L')))
+    return str(text == upi_string)
+
+
+def throughput(render, renders):
+    started = time.perf_counter()
+    for n in range(renders):
+        render(150 + n % 7 * 50, f"EO-20250901-{n:04X}")
+    return renders / (time.perf_counter() - started)
+
+
+def raster_ms(rasterize, renders):
+    upi_strings = [build_upi_string(150 + n % 7 * 50, f"EO-20250901-{n:04X}") for n in range(renders)]
+    started = time.perf_counter()
+    for upi_string in upi_strings:
+        rasterize(upi_string)
+    return (time.perf_counter() - started) / renders * 1000
+
+
+def peak_allocation(render):
+    render(350, "EO-20250901-WARM")
+    tracemalloc.start()
+    render(350, "EO-20250901-PEAK")
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--renders', type=int, default=200)
+    args = parser.parse_args()
+
+    get_template()
+    amount, order_id = 350, "EO-20250901-ABCD"
+    upi_string = build_upi_string(amount, order_id)
+    modules = qr_modules(upi_string)
+
+    print(f"{args.renders} renders per strategy (Pillow {PIL.__version__}, NumPy {np.__version__})")
+    print(f"font: {font_registry.path or 'Pillow built-in'}")
+    print(f"{'strategy':<28} | {'renders/s':>9} | {'peak KiB':>8} | {'decodes':>7} | {'modules ok':>10}")
+    print('-' * 78)
+    for name, render in STRATEGIES:
+        rate = throughput(render, args.renders)
+        peak = peak_allocation(render)
+        canvas = render(amount, order_id)
+        slot = qr_slot(canvas)
+        print(f"{name:<28} | {rate:>9.1f} | {peak / 1024:>8.1f} | {decodes(canvas, upi_string):>7} | "
+              f"{str(sampled_modules(slot, modules)):>10}")
+
+    print("\nQR build + rasterisation only, ms per code:")
+    print(f"  qrcode.QRCode + PIL backend + LANCZOS:  {raster_ms(lanczos_qr, args.renders):.2f}")
+    print(f"  VectorizedQRCode + NumPy integer scale: {raster_ms(render_qr_matrix, args.renders):.2f}")
+
+    mismatches = 0
+    for n in range(args.renders):
+        upi_string = build_upi_string(150 + n % 7 * 50, f"EO-20250901-{n:04X}")
+        reference = qrcode.QRCode(version=3, error_correction=qrcode.constants.ERROR_CORRECT_H, border=6)
+        reference.add_data(upi_string)
+        reference.make(fit=True)
+        mismatches += not np.array_equal(np.array(reference.get_matrix(), dtype=bool), qr_modules(upi_string))
+    print(f"module matrices differing from qrcode.QRCode: {mismatches} of {args.renders}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+"""
+Benchmark: payment screenshot download + Cloudinary upload, buffered vs streamed
+
+Serves screenshots of --sizes-mb from the local Graph stub's media download
+endpoint and pushes each through:
+  - buffered: the old upload_to_cloudinary (resp.content, one upload call)
+  - streamed: bot.utils.upload_to_cloudinary (spooled temp file, chunked upload)
+Cloudinary is replaced by models of its SDK's memory behaviour: upload() reads
+a file object whole and builds one multipart body, upload_large() reads and
+posts chunk_size at a time. Reports tracemalloc peak per request (sequential)
+and with --concurrency requests in flight, then checks the size cap and that
+the checksum sent as context matches the served bytes.
+
+Usage:
+    python benchmarks/bench_screenshot_upload.py --sizes-mb 2 8 14 --concurrency 4
+"""
+
+import argparse
+import hashlib
+import os
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'eeonam_project.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+import cloudinary.uploader  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+from bot import utils  # noqa: E402
+from graph_stub import start_graph_stub  # noqa: E402
+from bot.http_client import http_client  # noqa: E402
+
+MB = 1024 * 1024
+uploaded = {}
+
+
+def multipart(data, **fields):
+    """Roughly what the SDK's urllib3 encoder builds: one bytes body holding the file"""
+    parts = [f"--b\r\nContent-Disposition: form-data; name=\"{k}\"\r\n\r\n{v}\r\n".encode() for k, v in fields.items()]
+    return b''.join(parts + [b"--b\r\nContent-Disposition: form-data; name=\"file\"\r\n\r\n", data, b"\r\n--b--\r\n"])
+
+
+def model_upload(file, **options):
+    data = file.read() if hasattr(file, 'read') else file
+    body = multipart(data, public_id=options.get('public_id'))
+    uploaded[options.get('public_id')] = {'bytes': len(data), 'context': options.get('context'), 'body': len(body)}
+    return {'secure_url': f"https://res.cloudinary.test/{options.get('public_id')}.jpg"}
+
+
+def model_upload_large(file, chunk_size=20 * MB, **options):
+    total = 0
+    while True:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            break
+        multipart(chunk, public_id=options.get('public_id'))
+        total += len(chunk)
+    uploaded[options.get('public_id')] = {'bytes': total, 'context': options.get('context'), 'chunked': True}
+    return {'secure_url': f"https://res.cloudinary.test/{options.get('public_id')}.jpg"}
+
+
+def legacy_upload(media_url, order_id):
+    headers = {'Authorization': f'Bearer {settings.WHATSAPP_ACCESS_TOKEN}'}
+    resp = http_client.get(media_url, headers=headers, timeout=(settings.HTTP_CONNECT_TIMEOUT, 30))
+    resp.raise_for_status()
+    result = cloudinary.uploader.upload(resp.content, folder="payment_screenshots",
+                                        public_id=f"payment_{order_id}", overwrite=True, resource_type="image")
+    return result.get('secure_url')
+
+
+def measure(upload, urls, concurrency):
+    tracemalloc.start()
+    started = time.perf_counter()
+    if concurrency == 1:
+        results = [upload(url, f"EO-{n}") for n, url in enumerate(urls)]
+    else:
+        with ThreadPoolExecutor(concurrency) as pool:
+            results = list(pool.map(upload, urls, [f"EO-{n}" for n in range(len(urls))]))
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert all(results), 'upload failed'
+    return peak / MB, elapsed / len(urls) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes-mb', type=float, nargs='+', default=[2, 8, 14])
+    parser.add_argument('--concurrency', type=int, default=4)
+    args = parser.parse_args()
+
+    cloudinary.uploader.upload = model_upload
+    cloudinary.uploader.upload_large = model_upload_large
+    server, stub, _ = start_graph_stub()
+    host, port = server.server_address[:2]
+
+    def media_url(size):
+        media_id = stub.upload('image/jpeg', os.urandom(int(size * MB)))
+        return f"http://{host}:{port}/media-download/{media_id}", media_id
+
+    print(f"spool {settings.SCREENSHOT_SPOOL_BYTES // 1024} KiB, upload chunks "
+          f"{settings.SCREENSHOT_UPLOAD_CHUNK_BYTES / MB:.0f} MiB, cap {settings.SCREENSHOT_MAX_BYTES / MB:.0f} MiB")
+    print(f"{'size':>6} | {'pipeline':<9} | {'peak MiB (1)':>12} | {'ms':>6} | "
+          f"{f'peak MiB ({args.concurrency})':>12} | {'ms':>6}")
+    print('-' * 68)
+    for size in args.sizes_mb:
+        url, _ = media_url(size)
+        for label, upload in (('buffered', legacy_upload), ('streamed', utils.upload_to_cloudinary)):
+            upload(url, 'warm')
+            peak, ms = measure(upload, [url], 1)
+            peak_n, ms_n = measure(upload, [url] * args.concurrency, args.concurrency)
+            print(f"{size:>4.0f}MB | {label:<9} | {peak:>12.1f} | {ms:>6.0f} | {peak_n:>12.1f} | {ms_n:>6.0f}")
+
+    url, media_id = media_url(settings.SCREENSHOT_MAX_BYTES / MB + 1)
+    print(f"\nover the cap rejected: {utils.upload_to_cloudinary(url, 'big') is None}")
+    url, media_id = media_url(3)
+    utils.upload_to_cloudinary(url, 'sum')
+    expected = hashlib.sha256(stub.media[media_id]['data']).hexdigest()
+    print(f"checksum context matches: {uploaded['payment_sum']['context'] == {'sha256': expected}}")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+"""
+Benchmark: database statements per conversation step
+
+Walks one phone through a whole order (start → date → junction → menu →
+address → QR → screenshot) with EeOnamBot.process_message against a scratch
+SQLite database and counts SELECT / INSERT / UPDATE statements per step.
+Outbound WhatsApp sends, QR upload, Cloudinary and Google Sheets are replaced
+with no-ops so only the bot's own persistence is measured.
+
+Runs once with the session cache off and once with it on (locmem), reports
+the session store's hit rate and DB reads, then checks that a step decided
+from a stale cached copy is aborted instead of overwriting a second worker's write.
+
+Usage:
+    python benchmarks/bench_session_queries.py [--conversations 20]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+from collections import Counter, defaultdict
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix='eeonam-bench-'), 'bench.sqlite3')
+os.environ['DATABASE_URL'] = f'sqlite:///{DB_PATH}'
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'eeonam_project.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+
+from bot import qr_prefetch, services  # noqa: E402
+from bot.models import UserSession  # noqa: E402
+from bot.services import EeOnamBot, WhatsAppService  # noqa: E402
+from bot.session_store import session_store  # noqa: E402
+from bot.sheet_sync import sheet_syncer  # noqa: E402
+from bot.utils import get_available_dates  # noqa: E402
+
+
+class NullWhatsAppService(WhatsAppService):
+    """Accepts every send without touching the network"""
+
+    def _make_request(self, payload):
+        return True
+
+    def send_group(self, payloads):
+        return [True] * len(payloads)
+
+
+def conversation_steps():
+    date = get_available_dates()[0]
+    return [
+        ('start', dict(message_text='start')),
+        ('date_selection', dict(message_type='interactive', interactive_data={
+            'button_reply': {'id': f"date_{date.strftime('%Y-%m-%d')}"}})),
+        ('junction_selection', dict(message_type='interactive', interactive_data={
+            'button_reply': {'id': 'vyttila_delivery'}})),
+        ('menu_selection', dict(message_text='1 x 2, 3 x 1')),
+        ('delivery_details', dict(message_text='12 Temple Road, Vyttila')),
+        ('payment_screenshot', dict(message_type='image', media_data={
+            'type': 'image', 'url': 'https://example.invalid/screenshot.jpg'})),
+    ]
+
+
+def run(bot, steps, conversations, phone_prefix):
+    per_step = defaultdict(Counter)
+    for n in range(conversations):
+        phone = f'{phone_prefix}{n:05d}'
+        for name, kwargs in steps:
+            with CaptureQueriesContext(connection) as captured:
+                bot.process_message(phone, **kwargs)
+            for query in captured.captured_queries:
+                verb = query['sql'].lstrip().split(' ', 1)[0].upper()
+                per_step[name][verb if verb in ('SELECT', 'INSERT', 'UPDATE') else 'OTHER'] += 1
+    return per_step
+
+
+def report(title, steps, per_step, conversations):
+    print(title)
+    print(f"{'step':<20} | {'SELECT':>6} | {'INSERT':>6} | {'UPDATE':>6} | {'other':>5} | {'total':>5}")
+    print('-' * 64)
+    totals = Counter()
+    for name, _ in steps:
+        counts = per_step[name]
+        totals.update(counts)
+        row = [counts[k] / conversations for k in ('SELECT', 'INSERT', 'UPDATE', 'OTHER')]
+        print(f"{name:<20} | {row[0]:>6.1f} | {row[1]:>6.1f} | {row[2]:>6.1f} | {row[3]:>5.1f} | {sum(row):>5.1f}")
+    print(f"reads per conversation: {totals['SELECT'] / conversations:.1f}, "
+          f"writes per conversation: {(totals['INSERT'] + totals['UPDATE']) / conversations:.1f}\n")
+    return totals
+
+
+def check_stale_copy():
+    """Worker A holds a cached copy, worker B writes the row, then A flushes"""
+    phone = '919999900000'
+    session, _ = session_store.load(phone)
+    session.current_step = 'date_selection'
+    session_store.flush(session)
+
+    worker_a, _ = session_store.load(phone)
+    worker_b = UserSession.objects.get(phone_number=phone)
+    worker_b.snapshot_fields()
+    worker_b.selected_junction = 'pickup'
+    session_store.flush(worker_b)
+
+    # Put A's stale copy back in the cache, as a racing write-through could
+    session_store._to_cache(worker_a)
+    stale, _ = session_store.load(phone)
+    stale.current_step = 'menu_selection'
+    written = session_store.flush(stale)
+
+    # B's row stands and the next load starts from it
+    row = UserSession.objects.get(phone_number=phone)
+    fresh, _ = session_store.load(phone)
+    return (not written and row.current_step == 'date_selection' and row.selected_junction == 'pickup'
+            and fresh.version == row.version)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--conversations', type=int, default=20)
+    args = parser.parse_args()
+
+    call_command('migrate', verbosity=0)
+    services.generate_qr_code = lambda amount, order_id: f'https://example.invalid/{order_id}.png'
+    qr_prefetch.generate_qr_code = services.generate_qr_code
+    services.upload_to_cloudinary = lambda url, order_id: f'https://example.invalid/{order_id}.jpg'
+    sheet_syncer.enqueue_append = lambda order: True
+
+    bot = EeOnamBot(whatsapp=NullWhatsAppService())
+    steps = conversation_steps()
+
+    session_store.cache_enabled = False
+    uncached = report('Session cache off', steps, run(bot, steps, args.conversations, '9190000'),
+                      args.conversations)
+
+    session_store.cache_enabled = True
+    cached = report('Session cache on (locmem)', steps, run(bot, steps, args.conversations, '9191000'),
+                    args.conversations)
+
+    stats = session_store.stats()
+    print(f"session cache: {stats['hits']} hits, {stats['misses']} misses, hit rate {stats['hit_rate']:.1%}")
+    print(f"SELECTs per conversation: {uncached['SELECT'] / args.conversations:.1f} -> "
+          f"{cached['SELECT'] / args.conversations:.1f} "
+          f"({1 - cached['SELECT'] / uncached['SELECT']:.0%} fewer DB reads)")
+    print(f"step from a stale cached copy aborted, other worker's write kept: {check_stale_copy()} "
+          f"(conflicts detected: {session_store.stats()['conflicts']})")
+
+
+if __name__ == '__main__':
+    main()
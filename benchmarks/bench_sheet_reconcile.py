@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+"""
+Benchmark: incremental sheet reconciliation vs a full scan
+
+Seeds the local Sheets stub (benchmarks/sheets_stub.py) and the database with --orders
+orders that are already in sync (one change every 10 s, the last an hour ago), reconciles once
+to build the cached sheet index, then drifts --changes orders: status
+changes whose sheet write was lost, and paid orders that never reached the sheet.
+Reports, for the incremental pass (watermark + cached index) and for a
+--full pass over the same drift, the orders scanned, Sheets requests, KiB
+downloaded and time, and checks the sheet matches the database afterwards.
+
+Usage:
+    python benchmarks/bench_sheet_reconcile.py --orders 10000 --changes 25 --latency-ms 80
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+SCRATCH = tempfile.mkdtemp(prefix='eeonam-bench-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(SCRATCH, 'bench.sqlite3')}"
+os.environ['SHEET_INDEX_PATH'] = os.path.join(SCRATCH, 'sheet_index.json')
+os.environ['GOOGLE_SHEET_ID'] = 'bench-sheet'
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'eeonam_project.settings')
+
+import django  # noqa: E402
+import gspread  # noqa: E402
+
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from bot.google_client import google_client  # noqa: E402
+from bot.models import Order  # noqa: E402
+from bot.sheet_reconcile import sheet_reconciler  # noqa: E402
+from sheets_stub import StubClient, start_sheets_stub  # noqa: E402
+
+PAST = timezone.now() - timedelta(hours=1)
+HEADER = ['Timestamp', 'Phone', 'Junction', 'Delivery Date', 'Order ID', 'Items', 'Total', 'Delivery Address',
+          'Maps Link', 'Cloudinary Link', 'Verification Link', 'Rejection Link', 'Verified Status']
+
+
+def seed(stub, count):
+    orders = Order.objects.bulk_create([Order(
+        order_id=f"EO-SYNC-{n:05d}", phone_number='919000000000', delivery_date=timezone.localdate(),
+        junction='pickup', items='{"1": 2}', total_amount=Decimal(700), status='verified',
+        payment_screenshot_url='https://res.cloudinary.test/x.jpg', sheet_row_number=n + 2
+    ) for n in range(count)], batch_size=1000)
+    # One change every 10 s in the hours before PAST (bulk_update keeps updated_at as given)
+    for n, order in enumerate(orders):
+        order.updated_at = PAST - timedelta(seconds=10 * (count - n))
+    Order.objects.bulk_update(orders, ['updated_at'], batch_size=1000)
+    stub.sheets['Sheet1'] = [HEADER] + [
+        ['2025-08-20 10:00:00', '919000000000', 'Pickup Only', '2025-08-28', f"EO-SYNC-{n:05d}", 'Sadya x 2',
+         '700.0', '', '', 'https://res.cloudinary.test/x.jpg', '', '', 'Verified']
+        for n in range(count)
+    ]
+
+
+def drift(count, changes):
+    """Lost status writes on existing orders, plus paid orders that never reached the sheet"""
+    for n in range(0, count, max(1, count // max(1, changes - changes // 5))):
+        order = Order.objects.get(order_id=f"EO-SYNC-{n:05d}")
+        order.status = 'rejected'
+        order.save()
+    for n in range(changes // 5):
+        Order.objects.create(
+            order_id=f"EO-LOST-{n:04d}", phone_number='919000000000', delivery_date=timezone.localdate(),
+            junction='pickup', items='{"1": 2}', total_amount=Decimal(350),
+            payment_screenshot_url='https://res.cloudinary.test/y.jpg'
+        )
+
+
+def undo_drift(stub):
+    stub.sheets['Sheet1'] = [row for row in stub.sheets['Sheet1'] if not row[4].startswith('EO-LOST-')]
+    for row in stub.sheets['Sheet1'][1:]:
+        row[12] = 'Verified'
+    Order.objects.filter(order_id__startswith='EO-LOST-').delete()
+    Order.objects.filter(status='rejected').update(status='verified', updated_at=PAST)
+
+
+def in_sync(stub):
+    rows = stub.sheets['Sheet1']
+    sheet = {row[4]: row[12] for row in rows[1:]}
+    orders = Order.objects.exclude(payment_screenshot_url__isnull=True).values_list('order_id', 'status')
+    return all(sheet.get(order_id) == status.title() for order_id, status in orders)
+
+
+def measure(stub, full):
+    requests, sent = stub.requests, stub.bytes_sent
+    started = time.perf_counter()
+    result = sheet_reconciler.reconcile(full=full)
+    return result, stub.requests - requests, (stub.bytes_sent - sent) / 1024, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, default=10000)
+    parser.add_argument('--changes', type=int, default=25)
+    parser.add_argument('--latency-ms', type=float, default=80)
+    args = parser.parse_args()
+
+    call_command('migrate', verbosity=0)
+    server, stub, base_url = start_sheets_stub(latency=args.latency_ms / 1000)
+    client = StubClient(base_url)
+    google_client.credentials = lambda: object()
+    gspread.authorize = lambda creds: client
+    seed(stub, args.orders)
+
+    result, requests, kib, elapsed = measure(stub, full=False)
+    print(f"{args.orders} orders in sync; first run built the index: {result['rows_read']} rows read, "
+          f"{requests} requests, {kib:.0f} KiB, {elapsed:.2f}s")
+    print(f"\ndrift: {args.changes} orders ({args.changes // 5} never appended)")
+    print(f"{'pass':<12} | {'scanned':>7} | {'requests':>8} | {'KiB read':>8} | {'seconds':>7} | "
+          f"{'appended':>8} | {'cells':>5} | {'in sync':>7}")
+    print('-' * 84)
+    for label, full in (('incremental', False), ('full', True)):
+        if full:
+            undo_drift(stub)
+        drift(args.orders, args.changes)
+        result, requests, kib, elapsed = measure(stub, full)
+        print(f"{label:<12} | {result['orders_scanned']:>7} | {requests:>8} | {kib:>8.1f} | {elapsed:>7.2f} | "
+              f"{result['appended']:>8} | {result['status_cells']:>5} | {str(in_sync(stub)):>7}")
+
+    result, requests, kib, elapsed = measure(stub, full=False)
+    print(f"\nnothing changed since: scanned {result['orders_scanned']}, {requests} requests, {elapsed * 1000:.0f} ms")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
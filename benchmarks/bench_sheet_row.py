@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+"""
+Benchmark: recording an order's sheet row number after the append
+
+Seeds the local Sheets stub (benchmarks/sheets_stub.py) with --rows order rows and
+saves --orders more through:
+  - get_all_values: append_row, then download the whole sheet and count rows (old)
+  - updatedRange:   bot.utils.save_to_google_sheet (row from the append response)
+  - column lookup:  the fallback, reading only the Order ID column
+Reports ms and response bytes per order. Then saves --concurrency orders at
+once with each strategy and counts how many stored row numbers actually hold
+that order.
+
+Usage:
+    python benchmarks/bench_sheet_row.py --rows 12000 --orders 30 --latency-ms 0
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+SCRATCH = tempfile.mkdtemp(prefix='eeonam-bench-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(SCRATCH, 'bench.sqlite3')}"
+os.environ['GOOGLE_SHEET_ID'] = 'bench-sheet'
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'eeonam_project.settings')
+
+import django  # noqa: E402
+import gspread  # noqa: E402
+
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from bot import utils  # noqa: E402
+from bot.google_client import google_client  # noqa: E402
+from bot.models import Order  # noqa: E402
+from sheets_stub import StubClient, start_sheets_stub  # noqa: E402
+
+
+def seed(stub, rows):
+    header = ['Timestamp', 'Phone', 'Junction', 'Delivery Date', 'Order ID', 'Items', 'Total', 'Address',
+              'Maps', 'Screenshot', 'Verify', 'Reject', 'Status']
+    stub.sheets['Sheet1'] = [header] + [
+        ['2025-08-20 10:00:00', '919000000000', 'Pickup Only', '2025-08-28', f"EO-SEED-{n:05d}",
+         'Sadya x 2', '700.0', '', '', '', 'https://example.test/verify/', 'https://example.test/reject/', 'Pending']
+        for n in range(rows)
+    ]
+
+
+def make_orders(prefix, count):
+    return [Order.objects.create(
+        order_id=f"EO-{prefix}-{n:04d}", phone_number='919000000000', delivery_date=timezone.localdate(),
+        junction='pickup', items='{"1": 2}', total_amount=Decimal(700)
+    ) for n in range(count)]
+
+
+def legacy_save(order):
+    """The old tail of save_to_google_sheet, after the same append"""
+    sheet = gspread.authorize(None).open_by_key('bench-sheet').sheet1
+    sheet.append_row(['', order.phone_number, '', '', order.order_id] + [''] * 8)
+    order.sheet_row_number = len(sheet.get_all_values())
+    order.save(update_fields=['sheet_row_number'])
+    return True
+
+
+def column_save(order):
+    sheet = gspread.authorize(None).open_by_key('bench-sheet').sheet1
+    sheet.append_row(['', order.phone_number, '', '', order.order_id] + [''] * 8)
+    order.sheet_row_number = utils.find_order_row(sheet, order.order_id)
+    order.save(update_fields=['sheet_row_number'])
+    return True
+
+
+def threaded(save):
+    def run(order):
+        try:
+            return save(order)
+        finally:
+            connection.close()
+    return run
+
+
+STRATEGIES = [
+    ('get_all_values', legacy_save),
+    ('updatedRange', utils.save_to_google_sheet),
+    ('column lookup', column_save),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=12000)
+    parser.add_argument('--orders', type=int, default=30)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    args = parser.parse_args()
+
+    call_command('migrate', verbosity=0)
+    server, stub, base_url = start_sheets_stub(latency=args.latency_ms / 1000)
+    client = StubClient(base_url)
+    google_client.credentials = lambda: object()
+    gspread.authorize = lambda creds: client
+
+    print(f"sheet seeded with {args.rows} rows, {args.orders} orders per strategy")
+    print(f"{'strategy':<16} | {'ms per order':>12} | {'KiB read per order':>18} | "
+          f"{f'correct rows ({args.concurrency} at once)':>27}")
+    print('-' * 84)
+    for n, (label, save) in enumerate(STRATEGIES):
+        seed(stub, args.rows)
+        orders = make_orders(f"S{n}", args.orders)
+        bytes_before = stub.bytes_sent
+        started = time.perf_counter()
+        for order in orders:
+            assert save(order)
+        ms = (time.perf_counter() - started) / len(orders) * 1000
+        kib = (stub.bytes_sent - bytes_before) / len(orders) / 1024
+
+        racing = make_orders(f"R{n}", args.concurrency)
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            list(pool.map(threaded(save), racing))
+        rows = stub.sheets['Sheet1']
+        correct = sum(
+            1 for order in racing
+            if Order.objects.get(pk=order.pk).sheet_row_number
+            and rows[Order.objects.get(pk=order.pk).sheet_row_number - 1][4] == order.order_id
+        )
+        print(f"{label:<16} | {ms:>12.1f} | {kib:>18.1f} | {f'{correct}/{len(racing)}':>27}")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
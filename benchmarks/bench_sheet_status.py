@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+"""
+Benchmark: verify/reject status writes, one update_cell each vs batched
+
+Runs the local Sheets stub (benchmarks/sheets_stub.py) with --latency-ms per request and
+the real per-minute write quota (--write-quota), then clears a backlog of
+--clicks verify/reject clicks (some orders clicked twice) through:
+  - inline: update_sheet_verification_status per click (the old behaviour)
+  - outbox: SheetOutbox rows flushed by SheetSyncer as one batch_update
+Reports Sheets write requests, 429 rejections and how many status cells match
+the database afterwards. Then exhausts the quota right before a flush and
+checks the batch is retried through it.
+
+Usage:
+    python benchmarks/bench_sheet_status.py --clicks 100 --latency-ms 80
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from decimal import Decimal
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+SCRATCH = tempfile.mkdtemp(prefix='eeonam-bench-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(SCRATCH, 'bench.sqlite3')}"
+os.environ['GOOGLE_SHEET_ID'] = 'bench-sheet'
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'eeonam_project.settings')
+
+import django  # noqa: E402
+import gspread  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from bot.google_client import google_client  # noqa: E402
+from bot.models import Order  # noqa: E402
+from bot.sheet_sync import sheet_syncer  # noqa: E402
+from sheets_stub import StubClient, start_sheets_stub  # noqa: E402
+
+
+def seed(stub, prefix, count):
+    """Orders already on the sheet (rows 2..count+1), all pending"""
+    stub.sheets['Sheet1'] = [['Order ID'] * 13] + [
+        [''] * 4 + [f"EO-{prefix}-{n:04d}"] + [''] * 7 + ['Pending'] for n in range(count)
+    ]
+    return [Order.objects.create(
+        order_id=f"EO-{prefix}-{n:04d}", phone_number='919000000000', delivery_date=timezone.localdate(),
+        junction='pickup', items='{"1": 2}', total_amount=Decimal(700), sheet_row_number=n + 2
+    ) for n in range(count)]
+
+
+def clicks(orders, count):
+    """Admin clicks: every order once, the first tenth clicked again with the other outcome"""
+    for n in range(count):
+        order = orders[n % len(orders)]
+        order.status = 'verified' if n < len(orders) else 'rejected'
+        order.save()
+        yield order, order.status
+
+
+def cells_correct(stub, orders):
+    rows = stub.sheets['Sheet1']
+    return sum(1 for order in Order.objects.filter(pk__in=[o.pk for o in orders])
+               if rows[order.sheet_row_number - 1][12] == order.status.title())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clicks', type=int, default=100)
+    parser.add_argument('--latency-ms', type=float, default=80)
+    parser.add_argument('--write-quota', type=int, default=60)
+    args = parser.parse_args()
+
+    call_command('migrate', verbosity=0)
+    server, stub, base_url = start_sheets_stub(latency=args.latency_ms / 1000, write_quota=args.write_quota)
+    client = StubClient(base_url)
+    google_client.credentials = lambda: object()
+    gspread.authorize = lambda creds: client
+    distinct = args.clicks * 10 // 11
+
+    print(f"{args.clicks} verify/reject clicks on {distinct} orders, quota {args.write_quota} writes/min, "
+          f"latency {args.latency_ms:.0f} ms")
+    print(f"{'mode':<8} | {'admin ms/click':>14} | {'write requests':>14} | {'429s':>4} | {'cells correct':>13}")
+    print('-' * 66)
+    for mode in ('inline', 'outbox'):
+        settings.SHEET_SYNC_MODE = mode
+        stub._write_times.clear()
+        orders = seed(stub, mode.upper(), distinct)
+        writes, rejected = stub.writes, stub.rejected
+        started = time.perf_counter()
+        for order, status in clicks(orders, args.clicks):
+            sheet_syncer.enqueue_status(order, status)
+        ms = (time.perf_counter() - started) / args.clicks * 1000
+        sheet_syncer.run(interval=0, exit_when_empty=True)
+        print(f"{mode:<8} | {ms:>14.1f} | {stub.writes - writes:>14} | {stub.rejected - rejected:>4} | "
+              f"{f'{cells_correct(stub, orders)}/{len(orders)}':>13}")
+
+    stats = sheet_syncer.stats()
+    print(f"\nstatus updates folded per batch_update: {stats['status_updates_per_call']} "
+          f"(last batch {stats['last_status_batch']}, {stats['status_cells']} cells)")
+
+    # Quota already used up by something else; it frees up 1.5 s into the flush
+    orders = seed(stub, 'QUOTA', 20)
+    for order, status in clicks(orders, 20):
+        sheet_syncer.enqueue_status(order, status)
+    stub._write_times.extend([time.monotonic()] * args.write_quota)
+    threading.Timer(1.5, stub._write_times.clear).start()
+    started = time.perf_counter()
+    sheet_syncer.run(interval=0, exit_when_empty=True)
+    print(f"flush through an exhausted quota: {sheet_syncer.stats()['quota_retried']} retries, "
+          f"{time.perf_counter() - started:.1f}s, cells correct {cells_correct(stub, orders)}/{len(orders)}")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
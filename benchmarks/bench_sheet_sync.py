@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+"""
+Benchmark: inline Google Sheet writes vs the write-behind outbox
+
+Runs the local Sheets stub (benchmarks/sheets_stub.py) with --latency-ms per request and
+records --orders orders:
+  - inline: save_to_google_sheet inside the payment step (the old behaviour)
+  - outbox: the payment step only inserts a SheetOutbox row
+Reports ms the customer path spends per order. Then flushes the outbox with
+SheetSyncer and reports Sheets requests, flush time and whether every stored
+row number holds its order. Finally pushes --orders orders through batches of
+--batch-size with a token bucket of --writes-per-minute and reports the write
+rate actually reached.
+
+Usage:
+    python benchmarks/bench_sheet_sync.py --orders 100 --latency-ms 150
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from decimal import Decimal
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+SCRATCH = tempfile.mkdtemp(prefix='eeonam-bench-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(SCRATCH, 'bench.sqlite3')}"
+os.environ['GOOGLE_SHEET_ID'] = 'bench-sheet'
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'eeonam_project.settings')
+
+import django  # noqa: E402
+import gspread  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from bot.google_client import google_client  # noqa: E402
+from bot.models import Order  # noqa: E402
+from bot.sheet_sync import SheetSyncer, TokenBucket, sheet_syncer  # noqa: E402
+from sheets_stub import StubClient, start_sheets_stub  # noqa: E402
+
+
+def make_orders(prefix, count):
+    return [Order.objects.create(
+        order_id=f"EO-{prefix}-{n:04d}", phone_number='919000000000', delivery_date=timezone.localdate(),
+        junction='pickup', items='{"1": 2}', total_amount=Decimal(700)
+    ) for n in range(count)]
+
+
+def rows_correct(stub, orders):
+    rows = stub.sheets['Sheet1']
+    stored = Order.objects.filter(pk__in=[order.pk for order in orders]).values_list('order_id', 'sheet_row_number')
+    return sum(1 for order_id, row in stored if row and rows[row - 1][4] == order_id)
+
+
+def customer_path(mode, orders):
+    settings.SHEET_SYNC_MODE = mode
+    started = time.perf_counter()
+    for order in orders:
+        sheet_syncer.enqueue_append(order)
+    return (time.perf_counter() - started) / len(orders) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, default=100)
+    parser.add_argument('--latency-ms', type=float, default=150)
+    parser.add_argument('--batch-size', type=int, default=10)
+    parser.add_argument('--writes-per-minute', type=float, default=120)
+    args = parser.parse_args()
+
+    call_command('migrate', verbosity=0)
+    server, stub, base_url = start_sheets_stub(latency=args.latency_ms / 1000)
+    client = StubClient(base_url)
+    google_client.credentials = lambda: object()
+    gspread.authorize = lambda creds: client
+    make_orders('WARM', 1)
+
+    print(f"{args.orders} orders, Sheets latency {args.latency_ms:.0f} ms")
+    print(f"{'mode':<8} | {'customer ms/order':>17} | {'Sheets requests':>15} | {'flush s':>7} | {'rows correct':>12}")
+    print('-' * 74)
+
+    inline = make_orders('IN', args.orders)
+    before = stub.requests
+    ms = customer_path('inline', inline)
+    print(f"{'inline':<8} | {ms:>17.1f} | {stub.requests - before:>15} | {'-':>7} | "
+          f"{f'{rows_correct(stub, inline)}/{len(inline)}':>12}")
+
+    queued = make_orders('OUT', args.orders)
+    ms = customer_path('outbox', queued)
+    # A retried screenshot queues the same order again; the flush folds it in
+    customer_path('outbox', queued[:5])
+    before = stub.requests
+    started = time.perf_counter()
+    sheet_syncer.run(interval=0, exit_when_empty=True)
+    flush_s = time.perf_counter() - started
+    print(f"{'outbox':<8} | {ms:>17.1f} | {stub.requests - before:>15} | {flush_s:>7.2f} | "
+          f"{f'{rows_correct(stub, queued)}/{len(queued)}':>12}")
+    print(f"\nsheet_sync stats: {sheet_syncer.stats()}")
+
+    paced = SheetSyncer(
+        batch_size=args.batch_size, max_attempts=5, lease_seconds=120,
+        bucket=TokenBucket(rate=args.writes_per_minute / 60, capacity=2)
+    )
+    orders = make_orders('RATE', args.orders)
+    customer_path('outbox', orders)
+    before = stub.requests
+    started = time.perf_counter()
+    paced.run(interval=0, exit_when_empty=True)
+    elapsed = time.perf_counter() - started
+    writes = stub.requests - before
+    print(f"\ntoken bucket {args.writes_per_minute:.0f}/min, burst 2: {writes} appends of {args.batch_size} in "
+          f"{elapsed:.1f}s ({writes / elapsed * 60:.0f}/min), throttled {paced.throttled} times, "
+          f"rows correct {rows_correct(stub, orders)}/{len(orders)}")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
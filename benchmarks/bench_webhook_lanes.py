@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+"""
+Benchmark: inbound queue throughput against the number of worker lanes
+
+Fills a scratch SQLite queue with messages from many phones, then drains it
+with 1..N lanes (one thread per lane) using the real claim logic from
+bot.inbound. The bot itself is replaced by a handler that sleeps for
+--handler-ms, which stands in for the Graph API / Cloudinary round-trips that
+dominate a real conversation step. Per-phone ordering and mutual exclusion
+are verified on every run.
+
+Usage:
+    python benchmarks/bench_webhook_lanes.py --messages 600 --phones 120 --lanes 1 2 4 8 16
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix='eeonam-bench-'), 'bench.sqlite3')
+os.environ['DATABASE_URL'] = f'sqlite:///{DB_PATH}'
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'eeonam_project.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+
+from bot import inbound  # noqa: E402
+from bot.models import InboundMessage, SeenMessage  # noqa: E402
+
+
+class SimulatedBot:
+    """Stands in for EeOnamBot: sleeps, and checks ordering/exclusivity per phone"""
+
+    def __init__(self, handler_seconds):
+        self.handler_seconds = handler_seconds
+        self.lock = threading.Lock()
+        self.in_flight = set()
+        self.seen = defaultdict(list)
+        self.violations = 0
+
+    def __call__(self, message, deduplicate=True, raise_errors=False):
+        phone = message['from']
+        with self.lock:
+            if phone in self.in_flight:
+                self.violations += 1
+            self.in_flight.add(phone)
+
+        time.sleep(self.handler_seconds)
+
+        with self.lock:
+            self.in_flight.discard(phone)
+            self.seen[phone].append(message['seq'])
+
+
+def fill_queue(messages, phones):
+    InboundMessage.objects.all().delete()
+    SeenMessage.objects.all().delete()
+    payload_messages = [
+        {'id': f'wamid.{i}', 'from': f'9190000{i % phones:05d}', 'type': 'text', 'seq': i}
+        for i in range(messages)
+    ]
+    # Every run reuses the same ids; the in-process dedup cache must not remember the last run
+    inbound.message_deduplicator.forget(message['id'] for message in payload_messages)
+    inbound.enqueue_webhook_payload({'entry': [{'changes': [{'value': {'messages': payload_messages}}]}]})
+
+
+def run(lanes, messages, phones, handler_seconds):
+    fill_queue(messages, phones)
+    bot = SimulatedBot(handler_seconds)
+    inbound.process_inbound_message = bot
+
+    def lane_worker(lane):
+        try:
+            inbound.drain_queue(exit_when_empty=True, lane=lane, lanes=lanes)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=lane_worker, args=(lane,)) for lane in range(lanes)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    processed = sum(len(seqs) for seqs in bot.seen.values())
+    out_of_order = sum(1 for seqs in bot.seen.values() if seqs != sorted(seqs))
+    return processed, elapsed, bot.violations, out_of_order
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=600)
+    parser.add_argument('--phones', type=int, default=120)
+    parser.add_argument('--handler-ms', type=float, default=20.0)
+    parser.add_argument('--lanes', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+
+    settings.DATABASES['default'].setdefault('OPTIONS', {})['timeout'] = 30
+    call_command('migrate', verbosity=0)
+    # WAL lets lane threads read while another one commits, closer to a server database
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA journal_mode=WAL')
+    connection.close()
+
+    print(f"{args.messages} messages from {args.phones} phones, simulated handler {args.handler_ms:.0f} ms")
+    print(f"{'lanes':>6} | {'msgs/s':>9} | {'speedup':>7} | {'elapsed s':>9} | {'overlap':>7} | {'reordered':>9}")
+    print('-' * 62)
+
+    baseline = None
+    for lanes in args.lanes:
+        processed, elapsed, violations, out_of_order = run(
+            lanes, args.messages, args.phones, args.handler_ms / 1000
+        )
+        throughput = processed / elapsed
+        baseline = baseline or throughput
+        print(
+            f"{lanes:>6} | {throughput:>9.1f} | {throughput / baseline:>6.2f}x | "
+            f"{elapsed:>9.2f} | {violations:>7} | {out_of_order:>9}"
+        )
+
+
+if __name__ == '__main__':
+    main()
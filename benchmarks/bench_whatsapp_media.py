@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+"""
+Benchmark: sending repeated images by uploaded media id against the local Graph stub
+
+Starts benchmarks/graph_stub.py with --latency-ms per request and sends --sends images
+drawn from --distinct different PNGs (shared amount QRs, say):
+  - upload every time: WhatsAppService.upload_media + send by id, per send
+  - media id cache:    WhatsAppService.media_id_for + send by id (one upload per distinct image)
+Reports Graph requests, uploaded bytes and time per send. Then walks one
+delivery conversation with QR_HOSTING=whatsapp through the real
+WhatsAppService and checks the payment QR went out by media id.
+
+Usage:
+    python benchmarks/bench_whatsapp_media.py --sends 60 --distinct 6 --latency-ms 80
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+SCRATCH = tempfile.mkdtemp(prefix='eeonam-bench-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(SCRATCH, 'bench.sqlite3')}"
+os.environ['QR_IMAGE_DIR'] = os.path.join(SCRATCH, 'qr_images')
+os.environ['QR_RENDER_WORKERS'] = '0'
+os.environ['QR_PREFETCH_ENABLED'] = 'False'
+os.environ['WHATSAPP_PHONE_NUMBER_ID'] = '123'
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'eeonam_project.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+
+from graph_stub import start_graph_stub  # noqa: E402
+from bot.media_cache import media_id_cache  # noqa: E402
+from bot.services import EeOnamBot, WhatsAppService  # noqa: E402
+from bot.sheet_sync import sheet_syncer  # noqa: E402
+from bot.utils import get_available_dates, payment_qr_bytes  # noqa: E402
+
+
+def run(whatsapp, stub, images, sends, cached):
+    requests_before = len(stub.messages) + len(stub.media)
+    uploaded = sum(len(m['data']) for m in stub.media.values())
+    started = time.perf_counter()
+    for n in range(sends):
+        image = images[n % len(images)]
+        media_id = whatsapp.media_id_for(image) if cached else whatsapp.upload_media(image)
+        whatsapp._make_request(whatsapp.image_payload('919000000000', caption='Scan to pay', media_id=media_id))
+    elapsed = time.perf_counter() - started
+    return {
+        'requests': len(stub.messages) + len(stub.media) - requests_before,
+        'uploaded': sum(len(m['data']) for m in stub.media.values()) - uploaded,
+        'ms': elapsed / sends * 1000,
+    }
+
+
+def payment_qr_by_media_id(stub):
+    settings.QR_HOSTING = 'whatsapp'
+    sheet_syncer.enqueue_append = lambda order: True
+    bot = EeOnamBot(whatsapp=WhatsAppService())
+    phone = '919000000001'
+    date = get_available_dates()[0]
+    bot.process_message(phone, message_text='start')
+    bot.process_message(phone, message_type='interactive', interactive_data={
+        'button_reply': {'id': f"date_{date.strftime('%Y-%m-%d')}"}})
+    bot.process_message(phone, message_type='interactive', interactive_data={
+        'button_reply': {'id': 'vyttila_delivery'}})
+    bot.process_message(phone, message_text='1 x 2')
+    bot.process_message(phone, message_text='12 Temple Road, Vyttila')
+    images = [m for m in stub.messages if m.get('to') == phone and m.get('type') == 'image']
+    return bool(images) and 'id' in images[-1]['image'] and 'link' not in images[-1]['image']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sends', type=int, default=60)
+    parser.add_argument('--distinct', type=int, default=6)
+    parser.add_argument('--latency-ms', type=float, default=80)
+    args = parser.parse_args()
+
+    call_command('migrate', verbosity=0)
+    server, stub, base_url = start_graph_stub(latency=args.latency_ms / 1000)
+    settings.WHATSAPP_GRAPH_URL = base_url
+    whatsapp = WhatsAppService()
+
+    images = [payment_qr_bytes(150 + n * 50, None) for n in range(args.distinct)]
+    print(f"{args.sends} image sends of {args.distinct} distinct PNGs "
+          f"({sum(map(len, images)) // len(images)} bytes avg), Graph latency {args.latency_ms:.0f} ms")
+    print(f"{'strategy':<22} | {'Graph requests':>14} | {'uploaded KiB':>12} | {'ms per send':>11}")
+    print('-' * 70)
+    for label, cached in (('upload every time', False), ('media id cache', True)):
+        result = run(whatsapp, stub, images, args.sends, cached)
+        print(f"{label:<22} | {result['requests']:>14} | {result['uploaded'] / 1024:>12.1f} | {result['ms']:>11.1f}")
+
+    print(f"\nmedia id cache: {media_id_cache.stats()}")
+    print(f"payment QR sent by media id (QR_HOSTING=whatsapp): {payment_qr_by_media_id(stub)}")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
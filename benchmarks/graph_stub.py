@@ -0,0 +1,169 @@
+"""
+Local stand-in for the WhatsApp Graph API endpoints the bot uses
+POST /<version>/<phone_number_id>/messages   send (image by link or by uploaded media id)
+POST /<version>/<phone_number_id>/media      multipart upload, returns a media id
+GET  /<version>/<media_id>                   media metadata with a download URL
+GET  /media-download/<media_id>              the uploaded bytes
+Point WHATSAPP_GRAPH_URL at http://127.0.0.1:<port>/v18.0 to use it.
+
+Usage (standalone, for trying the bot end to end without Meta):
+    python benchmarks/graph_stub.py [--port 8765] [--latency-ms 0]
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import logging
+import threading
+import time
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def parse_multipart(content_type: str, body: bytes) -> Dict[str, Tuple[Optional[str], bytes]]:
+    """Form field name -> (content type, bytes) of a multipart/form-data body"""
+    message = BytesParser(policy=HTTP).parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode('latin-1') + body
+    )
+    fields = {}
+    for part in message.iter_parts():
+        name = part.get_param('name', header='content-disposition')
+        if name:
+            fields[name] = (part.get_content_type() if part.get_filename() else None,
+                            part.get_payload(decode=True) or b'')
+    return fields
+
+
+class GraphStub:
+    """In-memory Graph API state shared by the request handlers"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.media: Dict[str, Dict] = {}
+        self.messages = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def upload(self, mime_type: str, data: bytes) -> str:
+        with self._lock:
+            media_id = str(1000000 + next(self._ids))
+            self.media[media_id] = {
+                'mime_type': mime_type,
+                'data': data,
+                'sha256': hashlib.sha256(data).hexdigest(),
+            }
+        return media_id
+
+    def send(self, payload: Dict) -> Tuple[int, Dict]:
+        image = payload.get('image') if payload.get('type') == 'image' else None
+        if image is not None and not image.get('link') and image.get('id') not in self.media:
+            return 400, {'error': {'message': 'Media id not found', 'code': 131053}}
+        with self._lock:
+            self.messages.append(payload)
+            message_id = f"wamid.stub.{next(self._ids)}"
+        return 200, {
+            'messaging_product': 'whatsapp',
+            'contacts': [{'input': payload.get('to'), 'wa_id': payload.get('to')}],
+            'messages': [{'id': message_id}],
+        }
+
+
+def make_handler(stub: GraphStub):
+    class GraphStubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _reply(self, status: int, body, content_type: str = 'application/json'):
+            if not isinstance(body, bytes):
+                body = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            try:
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                # Client gave up on the body (a download rejected by its size cap)
+                self.close_connection = True
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            if stub.latency:
+                time.sleep(stub.latency)
+
+            if self.path.endswith('/messages'):
+                try:
+                    payload = json.loads(body)
+                except ValueError:
+                    return self._reply(400, {'error': {'message': 'Invalid JSON'}})
+                return self._reply(*stub.send(payload))
+
+            if self.path.endswith('/media'):
+                fields = parse_multipart(self.headers.get('Content-Type', ''), body)
+                if 'file' not in fields or fields.get('messaging_product', (None, b''))[1] != b'whatsapp':
+                    return self._reply(400, {'error': {'message': 'file and messaging_product are required'}})
+                mime_type, data = fields['file']
+                return self._reply(200, {'id': stub.upload(mime_type, data)})
+
+            return self._reply(404, {'error': {'message': f'Unknown endpoint {self.path}'}})
+
+        def do_GET(self):
+            if stub.latency:
+                time.sleep(stub.latency)
+            media_id = self.path.rstrip('/').rsplit('/', 1)[-1]
+            media = stub.media.get(media_id)
+            if media is None:
+                return self._reply(404, {'error': {'message': 'Media id not found'}})
+            if self.path.startswith('/media-download/'):
+                return self._reply(200, media['data'], media['mime_type'])
+
+            host, port = self.server.server_address[:2]
+            return self._reply(200, {
+                'messaging_product': 'whatsapp',
+                'url': f"http://{host}:{port}/media-download/{media_id}",
+                'mime_type': media['mime_type'],
+                'sha256': media['sha256'],
+                'file_size': len(media['data']),
+                'id': media_id,
+            })
+
+        def log_message(self, format, *args):
+            logger.debug(f"graph stub: {format % args}")
+
+    return GraphStubHandler
+
+
+def start_graph_stub(host: str = '127.0.0.1', port: int = 0, latency: float = 0.0):
+    """Serve a GraphStub on a background thread; returns (server, stub, base URL for WHATSAPP_GRAPH_URL)"""
+    stub = GraphStub(latency=latency)
+    server = ThreadingHTTPServer((host, port), make_handler(stub))
+    threading.Thread(target=server.serve_forever, name='graph-stub', daemon=True).start()
+    return server, stub, f"http://{host}:{server.server_address[1]}/v18.0"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=0,
+                        help='Delay added to every request, to mimic the real API round trip')
+    args = parser.parse_args()
+
+    server, stub, base_url = start_graph_stub(args.host, args.port, args.latency_ms / 1000)
+    print(f"Graph API stub listening; set WHATSAPP_GRAPH_URL={base_url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        print(f"Stopped after {len(stub.messages)} messages and {len(stub.media)} media uploads")
+
+
+if __name__ == '__main__':
+    main()
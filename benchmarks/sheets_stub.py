@@ -0,0 +1,319 @@
+"""
+Local stand-in for the Google Sheets v4 values endpoints the bot uses
+GET  /v4/spreadsheets/<id>                          spreadsheet metadata (gspread's open_by_key)
+GET  /v4/spreadsheets/<id>/values/<range>           read (majorDimension ROWS or COLUMNS)
+GET  /v4/spreadsheets/<id>/values:batchGet          read several ranges
+PUT  /v4/spreadsheets/<id>/values/<range>           write a range
+POST /v4/spreadsheets/<id>/values/<range>:append    append rows after the table
+POST /v4/spreadsheets/<id>/values:batchUpdate       write several ranges
+An optional per-minute write quota answers 429 like the real API.
+StubClient / StubWorksheet speak to it with the subset of the gspread Worksheet
+API that bot.utils calls, so benchmarks can run without Google credentials.
+"""
+
+import json
+import logging
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, quote, unquote, urlparse
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+A1_CELL = re.compile(r'^([A-Z]*)(\d*)$')
+
+
+def column_letter(index: int) -> str:
+    """1 -> A, 27 -> AA"""
+    letters = ''
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+
+def _column_index(letters: str) -> int:
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - ord('A') + 1
+    return index
+
+
+def parse_a1(a1_range: str) -> Tuple[str, int, int, Optional[int], Optional[int]]:
+    """'Sheet1!B2:M' -> (title, first row, first col, last row or None, last col or None), 1-based"""
+    title, _, cells = a1_range.rpartition('!')
+    if not title:
+        title, cells = cells, ''
+    title = title.strip("'")
+    if not cells:
+        return title, 1, 1, None, None
+    start, _, end = cells.partition(':')
+    start_col, start_row = A1_CELL.match(start).groups()
+    if not end:
+        end_col, end_row = start_col, start_row
+    else:
+        end_col, end_row = A1_CELL.match(end).groups()
+    return (title, int(start_row or 1), _column_index(start_col) if start_col else 1,
+            int(end_row) if end_row else None, _column_index(end_col) if end_col else None)
+
+
+class SheetsStub:
+    """In-memory spreadsheet state shared by the request handlers"""
+
+    def __init__(self, latency: float = 0.0, write_quota: Optional[int] = None):
+        self.latency = latency
+        self.write_quota = write_quota
+        self.sheets: Dict[str, List[List[str]]] = {'Sheet1': []}
+        self.requests = 0
+        self.writes = 0
+        self.rejected = 0
+        self.bytes_sent = 0
+        self._write_times = deque()
+        self._lock = threading.Lock()
+
+    def allow_write(self) -> bool:
+        """Count a write request against the per-minute quota"""
+        with self._lock:
+            now = time.monotonic()
+            while self._write_times and now - self._write_times[0] > 60:
+                self._write_times.popleft()
+            if self.write_quota is not None and len(self._write_times) >= self.write_quota:
+                self.rejected += 1
+                return False
+            self._write_times.append(now)
+            self.writes += 1
+            return True
+
+    def metadata(self, spreadsheet_id: str) -> Dict:
+        return {
+            'spreadsheetId': spreadsheet_id,
+            'properties': {'title': 'EeOnam Orders'},
+            'sheets': [
+                {'properties': {'sheetId': index, 'title': title, 'index': index}}
+                for index, title in enumerate(self.sheets)
+            ],
+        }
+
+    def rows(self, title: str) -> List[List[str]]:
+        return self.sheets.setdefault(title, [])
+
+    def read(self, a1_range: str, major_dimension: str = 'ROWS') -> Dict:
+        title, row, col, last_row, last_col = parse_a1(a1_range)
+        with self._lock:
+            rows = self.rows(title)
+            last_row = len(rows) if last_row is None else min(last_row, len(rows))
+            values = []
+            for cells in rows[row - 1:last_row]:
+                values.append(cells[col - 1:last_col])
+        if major_dimension == 'COLUMNS':
+            width = max((len(r) for r in values), default=0)
+            values = [[r[i] if i < len(r) else '' for r in values] for i in range(width)]
+            for column in values:
+                while column and column[-1] == '':
+                    column.pop()
+        while values and not any(values[-1]):
+            values.pop()
+        return {'range': a1_range, 'majorDimension': major_dimension, 'values': values}
+
+    def write(self, a1_range: str, values: List[List]) -> Dict:
+        title, row, col, _, _ = parse_a1(a1_range)
+        with self._lock:
+            rows = self.rows(title)
+            for offset, cells in enumerate(values):
+                while len(rows) < row + offset:
+                    rows.append([])
+                target = rows[row + offset - 1]
+                while len(target) < col - 1 + len(cells):
+                    target.append('')
+                target[col - 1:col - 1 + len(cells)] = ['' if v is None else str(v) for v in cells]
+        width = max((len(cells) for cells in values), default=0)
+        return {
+            'updatedRange': f"{title}!{column_letter(col)}{row}:{column_letter(col + width - 1)}{row + len(values) - 1}",
+            'updatedRows': len(values),
+            'updatedColumns': width,
+            'updatedCells': sum(len(cells) for cells in values),
+        }
+
+    def append(self, a1_range: str, values: List[List]) -> Dict:
+        title, _, col, _, _ = parse_a1(a1_range)
+        with self._lock:
+            rows = self.rows(title)
+            table_rows = len(rows)
+            # Claim the rows under the lock so concurrent appends never overlap
+            start = table_rows + 1
+            rows.extend([] for _ in values)
+        updates = self.write(f"{title}!{column_letter(col)}{start}", values)
+        return {
+            'tableRange': f"{title}!A1:{column_letter(col + updates['updatedColumns'] - 1)}{table_rows}",
+            'updates': updates,
+        }
+
+
+def make_handler(stub: SheetsStub):
+    class SheetsStubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def _reply(self, status: int, body: Dict):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            with stub._lock:
+                stub.requests += 1
+                stub.bytes_sent += len(data)
+
+        def _route(self):
+            url = urlparse(self.path)
+            match = re.match(r'^/v4/spreadsheets/([^/]+)/values(?:/([^:]+))?(?::(\w+))?$', url.path)
+            if not match:
+                return None
+            spreadsheet_id, a1_range, action = match.groups()
+            return spreadsheet_id, unquote(a1_range or ''), action, parse_qs(url.query)
+
+        def _quota_exceeded(self):
+            return self._reply(429, {'error': {
+                'code': 429,
+                'message': "Quota exceeded for quota metric 'Write requests' per minute per user",
+                'status': 'RESOURCE_EXHAUSTED',
+            }})
+
+        def _body(self) -> Dict:
+            length = int(self.headers.get('Content-Length', 0))
+            return json.loads(self.rfile.read(length) or b'{}')
+
+        def do_GET(self):
+            if stub.latency:
+                time.sleep(stub.latency)
+            metadata = re.match(r'^/v4/spreadsheets/([^/?]+)$', urlparse(self.path).path)
+            if metadata:
+                return self._reply(200, stub.metadata(metadata.group(1)))
+            route = self._route()
+            if route and route[2] == 'batchGet':
+                query = route[3]
+                dimension = query.get('majorDimension', ['ROWS'])[0]
+                return self._reply(200, {'valueRanges': [stub.read(r, dimension) for r in query.get('ranges', [])]})
+            if not route or route[2]:
+                return self._reply(404, {'error': {'message': f'Unknown endpoint {self.path}'}})
+            _, a1_range, _, query = route
+            return self._reply(200, stub.read(a1_range, query.get('majorDimension', ['ROWS'])[0]))
+
+        def do_PUT(self):
+            body = self._body()
+            if stub.latency:
+                time.sleep(stub.latency)
+            route = self._route()
+            if not route or route[2]:
+                return self._reply(404, {'error': {'message': f'Unknown endpoint {self.path}'}})
+            if not stub.allow_write():
+                return self._quota_exceeded()
+            return self._reply(200, stub.write(route[1], body.get('values', [])))
+
+        def do_POST(self):
+            body = self._body()
+            if stub.latency:
+                time.sleep(stub.latency)
+            route = self._route()
+            if route and route[2] in ('append', 'batchUpdate') and not stub.allow_write():
+                return self._quota_exceeded()
+            if route and route[2] == 'append':
+                return self._reply(200, stub.append(route[1], body.get('values', [])))
+            if route and route[2] == 'batchUpdate':
+                responses = [stub.write(data['range'], data.get('values', [])) for data in body.get('data', [])]
+                return self._reply(200, {
+                    'totalUpdatedCells': sum(r['updatedCells'] for r in responses),
+                    'responses': responses,
+                })
+            return self._reply(404, {'error': {'message': f'Unknown endpoint {self.path}'}})
+
+        def log_message(self, format, *args):
+            logger.debug(f"sheets stub: {format % args}")
+
+    return SheetsStubHandler
+
+
+def start_sheets_stub(host: str = '127.0.0.1', port: int = 0, latency: float = 0.0,
+                      write_quota: Optional[int] = None):
+    """Serve a SheetsStub on a background thread; returns (server, stub, base URL)"""
+    stub = SheetsStub(latency=latency, write_quota=write_quota)
+    server = ThreadingHTTPServer((host, port), make_handler(stub))
+    threading.Thread(target=server.serve_forever, name='sheets-stub', daemon=True).start()
+    return server, stub, f"http://{host}:{server.server_address[1]}/v4/spreadsheets"
+
+
+class StubWorksheet:
+    """The gspread Worksheet calls bot.utils makes, sent to a SheetsStub over HTTP"""
+
+    def __init__(self, base_url: str, spreadsheet_id: str, title: str = 'Sheet1', session=None):
+        self.title = title
+        self._values_url = f"{base_url}/{spreadsheet_id}/values"
+        self._session = session or requests.Session()
+
+    def _range(self, cells: str = '') -> str:
+        return quote(f"{self.title}!{cells}" if cells else self.title, safe='')
+
+    def _call(self, method: str, url: str, **kwargs) -> Dict:
+        resp = self._session.request(method, url, timeout=30, **kwargs)
+        resp.raise_for_status()
+        return resp.json()
+
+    def append_row(self, values, value_input_option='RAW', insert_data_option=None, table_range=None,
+                   include_values_in_response=False) -> Dict:
+        return self.append_rows([values], value_input_option, insert_data_option, table_range)
+
+    def append_rows(self, values, value_input_option='RAW', insert_data_option=None, table_range=None) -> Dict:
+        return self._call('POST', f"{self._values_url}/{self._range(table_range or '')}:append",
+                          params={'valueInputOption': value_input_option}, json={'values': values})
+
+    def get_all_values(self) -> List[List[str]]:
+        return self._call('GET', f"{self._values_url}/{self._range()}").get('values', [])
+
+    def col_values(self, col: int) -> List[str]:
+        letter = column_letter(col)
+        data = self._call('GET', f"{self._values_url}/{self._range(f'{letter}:{letter}')}",
+                          params={'majorDimension': 'COLUMNS'})
+        return (data.get('values') or [[]])[0]
+
+    def batch_get(self, ranges: List[str], major_dimension: Optional[str] = None) -> List[List[List[str]]]:
+        data = self._call('GET', f"{self._values_url}:batchGet", params={
+            'ranges': [f"{self.title}!{r}" for r in ranges],
+            'majorDimension': major_dimension or 'ROWS',
+        })
+        return [value_range.get('values', []) for value_range in data.get('valueRanges', [])]
+
+    def update_cell(self, row: int, col: int, value) -> Dict:
+        return self._call('PUT', f"{self._values_url}/{self._range(f'{column_letter(col)}{row}')}",
+                          params={'valueInputOption': 'USER_ENTERED'}, json={'values': [[value]]})
+
+    def batch_update(self, data: List[Dict], value_input_option='RAW') -> Dict:
+        return self._call('POST', f"{self._values_url}:batchUpdate", json={
+            'valueInputOption': value_input_option,
+            'data': [{'range': f"{self.title}!{d['range']}", 'values': d['values']} for d in data],
+        })
+
+
+class StubSpreadsheet:
+    def __init__(self, base_url: str, spreadsheet_id: str, session=None):
+        # Like gspread, opening a spreadsheet fetches its metadata
+        resp = session.get(f"{base_url}/{spreadsheet_id}", timeout=30)
+        resp.raise_for_status()
+        title = resp.json()['sheets'][0]['properties']['title']
+        self.sheet1 = StubWorksheet(base_url, spreadsheet_id, title=title, session=session)
+
+
+class StubClient:
+    """Stands in for gspread.authorize(creds) in benchmarks"""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self.session = requests.Session()
+
+    def open_by_key(self, key: str) -> StubSpreadsheet:
+        return StubSpreadsheet(self.base_url, key, session=self.session)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Order, UserSession, MenuItem
+from .models import Order, UserSession, MenuItem, InboundMessage, SheetOutbox
 
 
 @admin.register(Order)
@@ -56,3 +56,23 @@ class MenuItemAdmin(admin.ModelAdmin):
     search_fields = ['name']
     list_editable = ['price', 'is_available', 'sort_order']
     ordering = ['sort_order', 'name']
+
+
+@admin.register(InboundMessage)
+class InboundMessageAdmin(admin.ModelAdmin):
+    """Admin interface for InboundMessage model"""
+    
+    list_display = ['id', 'message_id', 'phone_number', 'status', 'attempts', 'created_at', 'processed_at']
+    list_filter = ['status']
+    search_fields = ['message_id', 'phone_number']
+    readonly_fields = ['created_at', 'locked_at', 'processed_at']
+
+
+@admin.register(SheetOutbox)
+class SheetOutboxAdmin(admin.ModelAdmin):
+    """Admin interface for SheetOutbox model"""
+    
+    list_display = ['id', 'order', 'kind', 'status', 'attempts', 'created_at', 'processed_at']
+    list_filter = ['status', 'kind']
+    search_fields = ['order__order_id']
+    readonly_fields = ['created_at', 'locked_at', 'processed_at']
@@ -0,0 +1,186 @@
+"""
+Async WhatsApp pipeline for EeOnam (ASGI)
+The conversation state machine stays synchronous and runs in a worker thread
+through sync_to_async; every Graph API send runs on the event loop. Each
+conversation holds one thread of a dedicated pool (and its DB connection) from
+its first query to its last send, so a process keeps at most ASYNC_BOT_THREADS
+conversations in flight; further messages wait on the event loop for a thread.
+"""
+
+import asyncio
+import logging
+import threading
+import weakref
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import httpx
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from .http_client import RETRY_STATUSES, backoff_delay
+from .inbound import enqueue_webhook_payload, process_inbound_message
+from .services import WhatsAppPayloads, WhatsAppService
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncWhatsAppService(WhatsAppPayloads):
+    """
+    WhatsApp Graph API client for the event loop, built on a pooled httpx.AsyncClient.
+    Every method is a coroutine; the bot itself talks to LoopWhatsAppService.
+    """
+
+    # One client per event loop: an httpx pool cannot be shared between loops
+    _clients = weakref.WeakKeyDictionary()
+
+    def _client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=settings.HTTP_POOL_SIZE,
+                    max_keepalive_connections=settings.HTTP_POOL_SIZE
+                ),
+                timeout=httpx.Timeout(settings.HTTP_READ_TIMEOUT, connect=settings.HTTP_CONNECT_TIMEOUT)
+            )
+            self._clients[loop] = client
+        return client
+
+    async def send_message(self, to: str, message: str) -> bool:
+        """Send a text message"""
+        return await self._make_request(self.text_payload(to, message))
+
+    async def send_interactive_message(self, to: str, message: str, buttons: List[Dict]) -> bool:
+        """Send an interactive message with buttons"""
+        return await self._make_request(self.interactive_payload(to, message, buttons))
+
+    async def send_list_message(self, to: str, message: str, button_text: str, sections: List[Dict]) -> bool:
+        """Send a list message"""
+        return await self._make_request(self.list_payload(to, message, button_text, sections))
+
+    async def send_image(self, to: str, image_url: str, caption: str = "") -> bool:
+        """Send an image message"""
+        return await self._make_request(self.image_payload(to, image_url, caption))
+
+    async def send_group(self, payloads: List[Dict]) -> List[bool]:
+        """Send independent messages concurrently"""
+        return list(await asyncio.gather(*(self._make_request(payload) for payload in payloads)))
+
+    async def _make_request(self, payload: Dict) -> bool:
+        """Make API request to WhatsApp, with the same retry budget as the sync client"""
+        headers = {
+            "Authorization": f"Bearer {self.access_token}",
+            "Content-Type": "application/json"
+        }
+
+        attempt = 0
+        while True:
+            try:
+                response = await self._client().post(self.api_url, headers=headers, json=payload)
+                if response.status_code in RETRY_STATUSES and attempt < settings.HTTP_MAX_RETRIES:
+                    delay = backoff_delay(
+                        attempt, response.headers.get('Retry-After'),
+                        settings.HTTP_BACKOFF_BASE, settings.HTTP_BACKOFF_MAX
+                    )
+                    logger.warning(f"WhatsApp API returned {response.status_code}; retrying in {delay:.2f}s")
+                else:
+                    response.raise_for_status()
+                    logger.info(f"Message sent successfully: {response.json()}")
+                    return True
+            except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                # Like the sync client: the request never reached the server, so retry it;
+                # read timeouts are not retried
+                if attempt >= settings.HTTP_MAX_RETRIES:
+                    logger.error(f"Failed to send message: {e}")
+                    return False
+                delay = backoff_delay(attempt, None, settings.HTTP_BACKOFF_BASE, settings.HTTP_BACKOFF_MAX)
+            except httpx.HTTPError as e:
+                logger.error(f"Failed to send message: {e}")
+                return False
+
+            attempt += 1
+            await asyncio.sleep(delay)
+
+
+class LoopWhatsAppService(WhatsAppService):
+    """
+    WhatsAppService for the synchronous bot running in a sync_to_async thread.
+    Each send is run on the event loop by the async client and the thread waits
+    for its real result, so the bot sees delivery failures exactly as it does
+    with the sync client. Media uploads (media_id_for) stay on the pooled sync
+    client in this thread.
+    """
+
+    def __init__(self, client: AsyncWhatsAppService):
+        super().__init__()
+        self.client = client
+
+    def _make_request(self, payload: Dict) -> bool:
+        return async_to_sync(self.client._make_request)(payload)
+
+    def send_group(self, payloads: List[Dict]) -> List[bool]:
+        return async_to_sync(self.client.send_group)(payloads)
+
+
+async_whatsapp = AsyncWhatsAppService()
+
+_bot_executor = None
+_bot_executor_lock = threading.Lock()
+
+
+def bot_executor() -> ThreadPoolExecutor:
+    """Threads that run the synchronous bot; their number caps the conversations in flight"""
+    global _bot_executor
+    if _bot_executor is None:
+        with _bot_executor_lock:
+            if _bot_executor is None:
+                _bot_executor = ThreadPoolExecutor(
+                    max_workers=settings.ASYNC_BOT_THREADS, thread_name_prefix='async-bot'
+                )
+    return _bot_executor
+
+
+def _run_bot(message_data: Dict, whatsapp: WhatsAppService):
+    """Run the synchronous bot in an executor thread with a fresh DB connection"""
+    close_old_connections()
+    try:
+        process_inbound_message(message_data, whatsapp=whatsapp)
+    finally:
+        close_old_connections()
+
+
+async def aprocess_inbound_message(message_data: Dict) -> None:
+    """Process a single webhook message; ORM work in a thread, sends on the event loop"""
+    # thread_sensitive=False lets conversations for different phones run in parallel threads;
+    # a dedicated pool, because the default executor would cap them at min(32, CPUs + 4)
+    await sync_to_async(_run_bot, thread_sensitive=False, executor=bot_executor())(
+        message_data, LoopWhatsAppService(async_whatsapp)
+    )
+
+
+async def aprocess_webhook_messages(messages: List[Dict]) -> None:
+    """Process a webhook's messages: phones concurrently, each phone's messages in order"""
+    by_phone = defaultdict(list)
+    for message in messages:
+        by_phone[message.get('from')].append(message)
+
+    async def run_conversation(conversation: List[Dict]):
+        for message in conversation:
+            await aprocess_inbound_message(message)
+
+    await asyncio.gather(*(run_conversation(conversation) for conversation in by_phone.values()))
+
+
+def _enqueue(data: Dict) -> int:
+    close_old_connections()
+    try:
+        return enqueue_webhook_payload(data)
+    finally:
+        close_old_connections()
+
+
+aenqueue_webhook_payload = sync_to_async(_enqueue, thread_sensitive=False)
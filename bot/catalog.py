@@ -0,0 +1,254 @@
+"""
+Menu catalog cache for EeOnam
+Loads MenuItem rows once per process into an immutable, compiled price table and
+reloads them only when the menu's version changes. The version is a stamp in
+Django's cache when that cache is shared between processes (REDIS_URL), and
+otherwise read from the MenuItem table itself, so every process sees an edit.
+"""
+
+import logging
+import re
+import threading
+import time
+from decimal import Decimal
+from typing import Dict, Iterable, List, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from .models import MenuItem
+
+logger = logging.getLogger(__name__)
+
+# Used when the MenuItem table is empty (also seeded by `manage.py initialize_bot`)
+DEFAULT_MENU_ITEMS = [
+    {'name': 'Veg Sadhya', 'price': 150, 'sort_order': 1, 'description': 'Traditional vegetarian Onam feast'},
+    {'name': 'Non-Veg Sadhya', 'price': 200, 'sort_order': 2, 'description': 'Sadhya with non-vegetarian dishes'},
+    {'name': 'Palada Pradhaman', 'price': 40, 'sort_order': 3, 'description': 'Traditional Kerala dessert'},
+    {'name': 'Parippu/Gothambu Payasam', 'price': 40, 'sort_order': 4, 'description': 'Lentil or wheat payasam'},
+    {'name': 'Kaaya Varuthathu', 'price': 30, 'sort_order': 5, 'description': 'Banana chips'},
+    {'name': 'Sharkkaravaratti', 'price': 30, 'sort_order': 6, 'description': 'Jaggery-coated banana chips'},
+]
+
+# Match pattern like "1 x 2" or "1x2" or "1*2"
+ORDER_ITEM_RE = re.compile(r'(\d+)\s*[x*]\s*(\d+)', re.IGNORECASE)
+
+
+def to_paise(amount) -> int:
+    """Convert a rupee amount (int, str or Decimal) to integer paise"""
+    return int(Decimal(str(amount)) * 100)
+
+
+def format_rupees(paise: int) -> str:
+    """Rupee amount for messages: '150' for whole rupees, '150.50' otherwise"""
+    rupees, remainder = divmod(paise, 100)
+    return str(rupees) if not remainder else f"{rupees}.{remainder:02d}"
+
+
+def paise_to_decimal(paise: int) -> Decimal:
+    """Rupee Decimal that prints like format_rupees (Decimal('150'), Decimal('150.50'))"""
+    return Decimal(format_rupees(paise))
+
+
+def _menu_number_emoji(number: int) -> str:
+    return f"{number}️⃣" if number < 10 else f"{number}."
+
+
+class MenuEntry:
+    """One compiled menu line; `number` is what customers type"""
+
+    __slots__ = ('number', 'name', 'price_paise', 'description', 'is_available', 'menu_line')
+
+    def __init__(self, number: int, name: str, price_paise: int, description: str = '',
+                 is_available: bool = True):
+        self.number = number
+        self.name = name
+        self.price_paise = price_paise
+        self.description = description
+        self.is_available = is_available
+        self.menu_line = f"{_menu_number_emoji(number)} {name} - ₹{format_rupees(price_paise)}"
+
+
+class CompiledMenu:
+    """
+    Immutable price table shared by order parsing, totals, summaries and the menu text.
+    Menu numbers are MenuItem ids: sessions and orders (Order.items) store only the
+    numbers, so reordering, adding or hiding items must never change what a stored
+    number refers to. The menu is listed in (sort_order, name) order. The built-in
+    default menu has no ids and is numbered by position, which matches the ids
+    `initialize_bot` gives it on a fresh database.
+    """
+
+    __slots__ = ('entries', 'prices', 'names', 'size', 'menu_lines', 'numbers_text', 'example_hint')
+
+    def __init__(self, entries: Tuple[MenuEntry, ...]):
+        self.entries = entries
+        self.size = len(entries)
+        # Keyed by menu number; unavailable items cost 0 and are rejected
+        self.prices = {e.number: e.price_paise if e.is_available else 0 for e in entries}
+        self.names = {e.number: e.name for e in entries}
+        self.menu_lines = '\n'.join(e.menu_line for e in entries if e.is_available)
+
+        available = [e for e in entries if e.is_available]
+        numbers = sorted(e.number for e in available)
+        if numbers and numbers == list(range(numbers[0], numbers[-1] + 1)):
+            self.numbers_text = f"{numbers[0]}-{numbers[-1]}"
+        else:
+            self.numbers_text = ', '.join(str(number) for number in numbers)
+
+        if len(available) >= 2:
+            first, second = available[0], available[min(2, len(available) - 1)]
+            self.example_hint = (
+                f"*Example:* {first.number} x 2, {second.number} x 1 "
+                f"(means 2 {first.name}, 1 {second.name})"
+            )
+        else:
+            self.example_hint = "*Example:* 1 x 2 (means 2 of item 1)"
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict]) -> 'CompiledMenu':
+        """Compile dicts with id, name, price (rupees), description, is_available, sort_order"""
+        ordered = sorted(rows, key=lambda row: (row.get('sort_order', 0), row['name']))
+        return cls(tuple(
+            MenuEntry(
+                number=row.get('id') or position,
+                name=row['name'],
+                price_paise=to_paise(row['price']),
+                description=row.get('description', ''),
+                is_available=row.get('is_available', True)
+            )
+            for position, row in enumerate(ordered, start=1)
+        ))
+
+    def parse_order(self, order_text: str) -> Dict[int, int]:
+        """Parse order text ("1 x 2, 3 x 1") into a menu number: quantity mapping"""
+        prices = self.prices
+        selected_items = {}
+
+        for item in order_text.split(','):
+            match = ORDER_ITEM_RE.match(item.strip())
+            if match:
+                number = int(match.group(1))
+                quantity = int(match.group(2))
+
+                if prices.get(number) and quantity > 0:
+                    selected_items[number] = selected_items.get(number, 0) + quantity
+
+        return selected_items
+
+    def total(self, selected_items: Dict[int, int], delivery_fee_paise: int = 0) -> Tuple[int, List[str]]:
+        """Exact total in paise and the order summary lines"""
+        prices = self.prices
+        names = self.names
+        total = 0
+        summary_lines = []
+
+        for number, quantity in selected_items.items():
+            item_total = prices[number] * quantity
+            total += item_total
+            summary_lines.append(f"• {names[number]} x {quantity} = ₹{format_rupees(item_total)}")
+
+        if delivery_fee_paise:
+            total += delivery_fee_paise
+            summary_lines.append(f"• Delivery Fee = ₹{format_rupees(delivery_fee_paise)}")
+
+        return total, summary_lines
+
+    def describe(self, selected_items: Dict) -> str:
+        """One-line item list for sheets ("Veg Sadhya x 2, Palada Pradhaman x 1")"""
+        names = self.names
+        parts = []
+        for number, quantity in selected_items.items():
+            name = names.get(int(number))
+            if name:
+                parts.append(f"{name} x {quantity}")
+        return ', '.join(parts)
+
+
+class MenuCatalog:
+    """
+    Process-wide, versioned cache of the menu.
+    With shared_cache the version is a counter in Django's cache that invalidate()
+    bumps; without it (locmem is per process) the version is the MenuItem count,
+    highest id and latest updated_at, which any save or delete changes.
+    """
+
+    VERSION_KEY = 'bot:menu_catalog:version'
+
+    def __init__(self, check_interval: float, shared_cache: bool):
+        self.check_interval = check_interval
+        self.shared_cache = shared_cache
+        self._lock = threading.Lock()
+        self._state = None  # (items dict, CompiledMenu)
+        self._version = None
+        self._checked_at = 0.0
+
+    def _shared_version(self):
+        if not self.shared_cache:
+            stamp = MenuItem.objects.aggregate(count=Count('id'), last_id=Max('id'), changed=Max('updated_at'))
+            return stamp['count'], stamp['last_id'], stamp['changed']
+
+        version = cache.get(self.VERSION_KEY)
+        if version is None:
+            cache.add(self.VERSION_KEY, 1, timeout=None)
+            version = cache.get(self.VERSION_KEY, 1)
+        return version
+
+    def _load(self) -> Tuple[Dict[str, Dict], CompiledMenu]:
+        rows = list(MenuItem.objects.values('id', 'name', 'price', 'description', 'is_available', 'sort_order'))
+        if not rows:
+            logger.warning("No menu items in the database; using the default menu")
+            rows = DEFAULT_MENU_ITEMS
+
+        items = {}
+        for row in rows:
+            if row.get('is_available', True) and 'id' in row:
+                items[str(row['id'])] = {
+                    'name': row['name'],
+                    'price': float(row['price']),
+                    'description': row['description']
+                }
+        return items, CompiledMenu.from_rows(rows)
+
+    def _current(self) -> Tuple[Dict[str, Dict], CompiledMenu]:
+        state = self._state
+        if state is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return state
+
+        with self._lock:
+            version = self._shared_version()
+            if self._state is None or version != self._version:
+                self._state = self._load()
+                self._version = version
+                logger.debug(f"Loaded menu catalog version {version} ({self._state[1].size} items)")
+            self._checked_at = time.monotonic()
+            return self._state
+
+    def items(self) -> Dict[str, Dict]:
+        """Available menu items keyed by id; no DB round-trip while the catalog is current"""
+        return self._current()[0]
+
+    def compiled(self) -> CompiledMenu:
+        """Compiled price table; no DB round-trip while the catalog is current"""
+        return self._current()[1]
+
+    def invalidate(self):
+        """Drop the local copy and bump the shared version so every process reloads"""
+        with self._lock:
+            self._state = None
+            if not self.shared_cache:
+                # The saved or deleted row already changed the version in the database
+                return
+            try:
+                cache.incr(self.VERSION_KEY)
+            except ValueError:
+                # Key missing or evicted: start a new version sequence
+                cache.set(self.VERSION_KEY, int(time.time()), timeout=None)
+
+
+# Global menu catalog instance
+menu_catalog = MenuCatalog(
+    check_interval=settings.MENU_CATALOG_CHECK_INTERVAL,
+    shared_cache=settings.MENU_CATALOG_SHARED_CACHE
+)
@@ -0,0 +1,77 @@
+"""
+Delivery date window for EeOnam
+The bookable dates, their lookup index and the date buttons/list text are built
+once per local calendar day (settings.TIME_ZONE) and rebuilt after midnight.
+"""
+
+import threading
+from datetime import date, timedelta
+from typing import Dict, FrozenSet, List, Tuple
+
+from django.utils import timezone
+
+# ============ CONFIGURATION ============
+
+# Orders must be placed at least this many days before delivery
+MIN_ADVANCE_DAYS = 3
+
+# Number of consecutive bookable days
+WINDOW_DAYS = 30
+
+# Dates offered as quick-reply buttons (WhatsApp allows at most 3)
+BUTTON_DATES = 3
+
+# Dates listed when the customer types an invalid date
+LISTED_DATES = 7
+
+# ============ END CONFIGURATION ============
+
+
+class DateWindow:
+    """Immutable snapshot of the bookable dates for one day; payloads are shared, treat as read-only"""
+
+    __slots__ = ('day', 'dates', 'index', 'buttons', 'list_text')
+
+    def __init__(self, day: date):
+        start_date = day + timedelta(days=MIN_ADVANCE_DAYS)
+        self.day = day
+        self.dates: Tuple[date, ...] = tuple(start_date + timedelta(days=i) for i in range(WINDOW_DAYS))
+        self.index: FrozenSet[date] = frozenset(self.dates)
+        self.buttons: List[Dict] = [
+            {
+                "type": "reply",
+                "reply": {
+                    "id": f"date_{d.strftime('%Y-%m-%d')}",
+                    "title": d.strftime('%d %b %Y')
+                }
+            }
+            for d in self.dates[:BUTTON_DATES]
+        ]
+        self.list_text = '\n'.join(f"• {d.strftime('%d %b %Y')}" for d in self.dates[:LISTED_DATES])
+
+    def __contains__(self, value: date) -> bool:
+        return value in self.index
+
+
+class DeliveryDateWindow:
+    """Process-wide date window that rolls over at local midnight"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._window = None
+
+    def current(self) -> DateWindow:
+        """Today's window; handlers should take one snapshot per message"""
+        today = timezone.localdate()
+        window = self._window
+        if window is not None and window.day == today:
+            return window
+
+        with self._lock:
+            if self._window is None or self._window.day != today:
+                self._window = DateWindow(today)
+            return self._window
+
+
+# Global date window instance
+delivery_dates = DeliveryDateWindow()
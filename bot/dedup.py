@@ -0,0 +1,107 @@
+"""
+Inbound message deduplication for EeOnam
+Meta redelivers a webhook whenever we answer slowly; every WhatsApp message id
+must reach the bot only once.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Dict
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import SeenMessage
+
+logger = logging.getLogger(__name__)
+
+
+class MessageDeduplicator:
+    """Bounded in-process LRU of seen message ids in front of the SeenMessage table"""
+
+    def __init__(self, max_entries: int, ttl: timedelta, prune_every: int = 1000):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.prune_every = prune_every
+        self._recent = OrderedDict()
+        self._lock = threading.Lock()
+        self._inserts_since_prune = 0
+        self.hits = 0
+        self.misses = 0
+
+    def is_duplicate(self, message_id: str) -> bool:
+        """Record a message id; True if it was already seen"""
+        if not message_id:
+            return False
+
+        with self._lock:
+            if message_id in self._recent:
+                self._recent.move_to_end(message_id)
+                self.hits += 1
+                return True
+
+        # The primary key makes the insert an atomic check-and-set across processes
+        try:
+            with transaction.atomic():
+                SeenMessage.objects.create(message_id=message_id)
+            duplicate = False
+        except IntegrityError:
+            duplicate = True
+
+        prune_now = False
+        with self._lock:
+            self._remember(message_id)
+            if duplicate:
+                self.hits += 1
+            else:
+                self.misses += 1
+                self._inserts_since_prune += 1
+                prune_now = self._inserts_since_prune >= self.prune_every
+                if prune_now:
+                    self._inserts_since_prune = 0
+
+        if not duplicate and prune_now:
+            self.prune()
+
+        return duplicate
+
+    def forget(self, message_ids):
+        """Drop ids from the in-process cache, e.g. after the transaction that recorded them rolled back"""
+        with self._lock:
+            for message_id in message_ids:
+                self._recent.pop(message_id, None)
+
+    def _remember(self, message_id: str):
+        self._recent[message_id] = True
+        self._recent.move_to_end(message_id)
+        while len(self._recent) > self.max_entries:
+            self._recent.popitem(last=False)
+
+    def prune(self) -> int:
+        """Delete seen ids older than the TTL"""
+        cutoff = timezone.now() - self.ttl
+        deleted, _ = SeenMessage.objects.filter(seen_at__lt=cutoff).delete()
+        if deleted:
+            logger.info(f"Pruned {deleted} expired seen message ids")
+        return deleted
+
+    def stats(self) -> Dict:
+        """Hit/miss counters for this process"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'cached_ids': len(self._recent),
+            }
+
+
+# Global deduplicator instance
+message_deduplicator = MessageDeduplicator(
+    max_entries=settings.MESSAGE_DEDUP_CACHE_SIZE,
+    ttl=timedelta(seconds=settings.MESSAGE_DEDUP_TTL_SECONDS)
+)
@@ -0,0 +1,133 @@
+"""
+Font registry for EeOnam image rendering
+Resolves one TrueType font file per process (configured, bundled or a common
+system font) and caches font objects per size and text measurements, so
+rendering never touches the filesystem after warm-up.
+"""
+
+import logging
+import os
+import threading
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+from PIL import ImageFont
+
+logger = logging.getLogger(__name__)
+
+# Drop a TTF here to ship a font with the app
+BUNDLED_FONT_DIR = os.path.join(settings.BASE_DIR, 'assets', 'fonts')
+
+# Tried in order after QR_FONT_PATH and the bundled fonts
+SYSTEM_FONT_CANDIDATES = [
+    # Linux (Debian/Ubuntu, Fedora, Alpine)
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+    '/usr/share/fonts/dejavu/DejaVuSans.ttf',
+    '/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf',
+    '/usr/share/fonts/liberation-sans/LiberationSans-Regular.ttf',
+    '/usr/share/fonts/ttf-dejavu/DejaVuSans.ttf',
+    # macOS
+    '/System/Library/Fonts/Supplemental/Arial.ttf',
+    '/Library/Fonts/Arial.ttf',
+    '/System/Library/Fonts/Arial.ttc',
+    # Windows
+    'C:\\Windows\\Fonts\\arial.ttf',
+]
+
+
+def _bundled_fonts():
+    try:
+        names = sorted(os.listdir(BUNDLED_FONT_DIR))
+    except OSError:
+        return []
+    return [os.path.join(BUNDLED_FONT_DIR, name) for name in names if name.lower().endswith(('.ttf', '.otf', '.ttc'))]
+
+
+class FontRegistry:
+    """Process-wide cache of FreeType fonts keyed by size"""
+
+    def __init__(self, configured_path: str = ''):
+        self.configured_path = configured_path
+        self._path = None
+        self._resolved = False
+        self._fonts: Dict[int, ImageFont.ImageFont] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> Optional[str]:
+        """Font file in use (None means Pillow's built-in font)"""
+        if not self._resolved:
+            with self._lock:
+                if not self._resolved:
+                    self._path = self._resolve()
+                    self._resolved = True
+        return self._path
+
+    def _resolve(self) -> Optional[str]:
+        candidates = ([self.configured_path] if self.configured_path else []) + _bundled_fonts() + SYSTEM_FONT_CANDIDATES
+        for candidate in candidates:
+            try:
+                ImageFont.truetype(candidate, 12)
+            except OSError:
+                if candidate == self.configured_path:
+                    logger.warning(f"QR_FONT_PATH {candidate} is not a loadable font; trying fallbacks")
+                continue
+            logger.info(f"Using font {candidate}")
+            return candidate
+
+        logger.warning("No TrueType font found; using Pillow's built-in font (set QR_FONT_PATH)")
+        return None
+
+    def get(self, size: int) -> Optional[ImageFont.ImageFont]:
+        """Font at a pixel size, loaded once"""
+        font = self._fonts.get(size)
+        if font is not None:
+            return font
+
+        path = self.path
+        with self._lock:
+            font = self._fonts.get(size)
+            if font is None:
+                font = self._load(path, size)
+                if font is not None:
+                    self._fonts[size] = font
+        return font
+
+    def _load(self, path: Optional[str], size: int) -> Optional[ImageFont.ImageFont]:
+        if path:
+            try:
+                return ImageFont.truetype(path, size)
+            except OSError as e:
+                logger.error(f"Could not load font {path} at size {size}: {e}")
+        try:
+            return ImageFont.load_default(size)
+        except TypeError:
+            # Pillow without FreeType sizing support
+            return ImageFont.load_default()
+        except Exception as e:
+            logger.error(f"Could not load Pillow's default font: {e}")
+            return None
+
+    def warm(self, *sizes: int):
+        """Resolve and load the given sizes up front (at template build time)"""
+        for size in sizes:
+            self.get(size)
+
+
+# Global font registry instance
+font_registry = FontRegistry(configured_path=settings.QR_FONT_PATH)
+
+
+@lru_cache(maxsize=1024)
+def text_bbox(text: str, size: int) -> Tuple[int, int, int, int]:
+    """Cached bounding box of text at a size (fixed strings are measured once)"""
+    font = font_registry.get(size)
+    if font is None:
+        return (0, 0, 0, 0)
+    return font.getbbox(text)
+
+
+def text_width(text: str, size: int) -> int:
+    left, _, right, _ = text_bbox(text, size)
+    return right - left
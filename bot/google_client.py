@@ -0,0 +1,220 @@
+"""
+Process-wide Google Sheets client for EeOnam
+Credentials are loaded once (from GOOGLE_OAUTH_TOKEN_JSON or token.json) and
+kept together with the authorized gspread client and the opened order
+worksheet, so a sheet write is one API call instead of a token parse, an
+authorize and a spreadsheet metadata fetch. The access token is refreshed under
+a lock shortly before it expires, and a rotated token.json is picked up
+without a restart.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+import gspread
+from django.conf import settings
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+
+logger = logging.getLogger(__name__)
+
+SCOPES = [
+    'https://www.googleapis.com/auth/drive',
+    'https://www.googleapis.com/auth/spreadsheets'
+]
+
+
+def _token_path() -> str:
+    return os.getenv('GOOGLE_OAUTH_TOKEN_PATH', 'token.json')
+
+
+class GoogleSheetClient:
+    """Cached credentials, gspread client and order worksheet, shared by the threads of a process"""
+
+    def __init__(self, refresh_margin: int, check_interval: float):
+        self.refresh_margin = timedelta(seconds=refresh_margin)
+        self.check_interval = check_interval
+        self._creds = None
+        self._client = None
+        self._worksheet = None
+        self._sheet_id = None
+        self._source = None
+        self._checked_at = 0.0
+        self._refresh_failed_at = None
+        self._pid = None
+        self._lock = threading.RLock()
+        self.loads = 0
+        self.refreshes = 0
+        self.authorizations = 0
+        self.opens = 0
+        self.rotations = 0
+
+    def _token_source(self):
+        """(fingerprint, token JSON) of the configured token, env var first"""
+        token_json = os.getenv('GOOGLE_OAUTH_TOKEN_JSON')
+        if token_json:
+            return f"env:{hashlib.sha1(token_json.encode('utf-8')).hexdigest()}", token_json
+        path = _token_path()
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None, None
+        return f"file:{path}:{stat.st_mtime_ns}:{stat.st_size}", None
+
+    def _load(self, source: str, token_json: Optional[str]) -> Optional[Credentials]:
+        try:
+            if token_json is None:
+                logger.debug(f"Loading Google credentials from file: {_token_path()}")
+                with open(_token_path(), 'r') as token_file:
+                    token_json = token_file.read()
+            else:
+                logger.debug("Loading Google credentials from environment variable")
+            creds = Credentials.from_authorized_user_info(json.loads(token_json), SCOPES)
+        except Exception as e:
+            logger.error(f"Error loading Google credentials: {e}", exc_info=True)
+            return None
+        self.loads += 1
+        return creds
+
+    def _reset(self, creds: Optional[Credentials], source: Optional[str]):
+        self._creds = creds
+        self._source = source
+        self._client = None
+        self._worksheet = None
+
+    def _check_source(self):
+        """Reload when the process forked or the token source changed (rotated token.json)"""
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._reset(None, None)
+        if self._creds is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return
+        self._checked_at = time.monotonic()
+
+        source, token_json = self._token_source()
+        if source is None:
+            if self._creds is None:
+                logger.error(f"Neither GOOGLE_OAUTH_TOKEN_JSON env var nor token file found at: {_token_path()}")
+            return
+        if source == self._source and self._creds is not None:
+            return
+
+        creds = self._load(source, token_json)
+        if creds is None:
+            return
+        if self._source is not None:
+            self.rotations += 1
+            logger.info("Google token source changed; using the new credentials")
+        self._reset(creds, source)
+
+    def _needs_refresh(self, creds: Credentials) -> bool:
+        if not creds.token:
+            return True
+        if creds.expiry is None:
+            return False
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        return creds.expiry - now <= self.refresh_margin
+
+    def _refresh(self, creds: Credentials) -> bool:
+        if not creds.refresh_token:
+            return False
+        # After a failure, don't retry on every call while the old token still works
+        if (self._refresh_failed_at is not None and creds.valid
+                and time.monotonic() - self._refresh_failed_at < self.check_interval):
+            return False
+        try:
+            logger.debug("Refreshing Google credentials ahead of expiry")
+            creds.refresh(Request())
+        except Exception as e:
+            logger.error(f"Error refreshing Google credentials: {e}", exc_info=True)
+            self._refresh_failed_at = time.monotonic()
+            return False
+        self._refresh_failed_at = None
+        self.refreshes += 1
+
+        refreshed_token_json = creds.to_json()
+        if self._source and self._source.startswith('env:'):
+            logger.info("Token refreshed. Update GOOGLE_OAUTH_TOKEN_JSON env var with the new token JSON.")
+            return True
+        try:
+            path = _token_path()
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as token_file:
+                token_file.write(refreshed_token_json)
+            os.replace(tmp_path, path)
+            # Our own write is not a rotation
+            self._source = self._token_source()[0]
+            logger.debug("Updated local token.json with refreshed token")
+        except OSError as e:
+            logger.warning(f"Could not write refreshed token to {_token_path()}: {e}")
+        return True
+
+    def credentials(self) -> Optional[Credentials]:
+        """Valid credentials, refreshed if they expire within the refresh margin"""
+        with self._lock:
+            self._check_source()
+            creds = self._creds
+            if creds is None:
+                return None
+            if self._needs_refresh(creds) and not self._refresh(creds) and not creds.valid:
+                logger.error("Invalid or missing Google credentials.")
+                return None
+            return creds
+
+    def worksheet(self):
+        """The order worksheet (sheet1 of GOOGLE_SHEET_ID), or None without credentials or a sheet id"""
+        sheet_id = getattr(settings, 'GOOGLE_SHEET_ID', None)
+        if not sheet_id:
+            logger.error("GOOGLE_SHEET_ID not set")
+            return None
+
+        with self._lock:
+            creds = self.credentials()
+            if creds is None:
+                return None
+            if self._client is None:
+                self._client = gspread.authorize(creds)
+                self._worksheet = None
+                self.authorizations += 1
+            if self._worksheet is None or self._sheet_id != sheet_id:
+                self._worksheet = self._client.open_by_key(sheet_id).sheet1
+                self._sheet_id = sheet_id
+                self.opens += 1
+            return self._worksheet
+
+    def invalidate(self):
+        """Forget everything; the next call reloads the token source"""
+        with self._lock:
+            self._reset(None, None)
+
+    def handle_error(self, error: Exception):
+        """Drop the cached client after an authorization failure from the Sheets API"""
+        response = getattr(error, 'response', None)
+        if getattr(response, 'status_code', None) == 401:
+            logger.warning("Google rejected the cached credentials; reloading them")
+            self.invalidate()
+
+    def stats(self) -> Dict:
+        """Counters for this process"""
+        with self._lock:
+            return {
+                'loads': self.loads,
+                'refreshes': self.refreshes,
+                'authorizations': self.authorizations,
+                'opens': self.opens,
+                'rotations': self.rotations,
+                'expiry': self._creds.expiry.isoformat() if self._creds and self._creds.expiry else None,
+            }
+
+
+# Global Google Sheets client instance
+google_client = GoogleSheetClient(
+    refresh_margin=settings.GOOGLE_TOKEN_REFRESH_MARGIN,
+    check_interval=settings.GOOGLE_TOKEN_CHECK_INTERVAL
+)
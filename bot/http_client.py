@@ -0,0 +1,108 @@
+"""
+Shared HTTP client for outbound API calls (WhatsApp Graph API, media downloads)
+One keep-alive connection pool per process, with timeouts and a bounded retry budget
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+from typing import Optional, Tuple
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Responses worth another attempt: rate limiting and transient server errors
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+def backoff_delay(attempt: int, retry_after: Optional[str], base: float, maximum: float) -> float:
+    """Full-jitter exponential backoff, honouring Retry-After when the server sends one"""
+    if retry_after and retry_after.isdigit():
+        return min(float(retry_after), maximum)
+    ceiling = min(maximum, base * (2 ** attempt))
+    return random.uniform(0, ceiling)
+
+
+class PooledHttpClient:
+    """requests.Session wrapper with connection pooling, timeouts and jittered retries"""
+
+    def __init__(self, pool_size: int = 20, timeout: Tuple[float, float] = (3.05, 15),
+                 max_retries: int = 2, backoff_base: float = 0.5, backoff_max: float = 8.0):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._session = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self) -> requests.Session:
+        """Process-local session; recreated after fork so children never share sockets"""
+        if self._session is None or self._pid != os.getpid():
+            with self._lock:
+                if self._session is None or self._pid != os.getpid():
+                    session = requests.Session()
+                    adapter = HTTPAdapter(
+                        pool_connections=self.pool_size,
+                        pool_maxsize=self.pool_size
+                    )
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    self._session = session
+                    self._pid = os.getpid()
+        return self._session
+
+    def _backoff(self, attempt: int, response: Optional[requests.Response]) -> float:
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        return backoff_delay(attempt, retry_after, self.backoff_base, self.backoff_max)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Send a request, retrying connection failures and 429/5xx responses.
+        Returns the last response (callers still call raise_for_status()).
+        """
+        kwargs.setdefault('timeout', self.timeout)
+
+        attempt = 0
+        while True:
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.exceptions.ConnectionError as e:
+                # Read timeouts are not ConnectionErrors and are never retried:
+                # the server may already have acted on the request
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt, None)
+                logger.warning(f"{method} {url} failed ({e}); retrying in {delay:.2f}s")
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    return response
+                delay = self._backoff(attempt, response)
+                logger.warning(f"{method} {url} returned {response.status_code}; retrying in {delay:.2f}s")
+                response.close()
+
+            attempt += 1
+            time.sleep(delay)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+
+# Global client instance shared by every outbound call in this process
+http_client = PooledHttpClient(
+    pool_size=settings.HTTP_POOL_SIZE,
+    timeout=(settings.HTTP_CONNECT_TIMEOUT, settings.HTTP_READ_TIMEOUT),
+    max_retries=settings.HTTP_MAX_RETRIES,
+    backoff_base=settings.HTTP_BACKOFF_BASE,
+    backoff_max=settings.HTTP_BACKOFF_MAX
+)
@@ -0,0 +1,369 @@
+"""
+Inbound WhatsApp message handling for EeOnam
+Routes single webhook messages to the bot and manages the durable inbound queue
+"""
+
+import json
+import logging
+import time
+import zlib
+from datetime import timedelta
+from typing import Dict, Optional
+
+import requests
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils import timezone
+
+from .dedup import message_deduplicator
+from .http_client import http_client
+from .models import InboundMessage
+from .services import EeOnamBot, WhatsAppService
+
+logger = logging.getLogger(__name__)
+
+
+def process_inbound_message(message_data: Dict, deduplicate: bool = True,
+                            whatsapp: Optional[WhatsAppService] = None, raise_errors: bool = False) -> None:
+    """
+    Process a single message object from a WhatsApp webhook payload.
+    With raise_errors the exception is re-raised instead of apologising to the
+    customer, so the inbound queue can retry the message.
+    """
+
+    phone_number = message_data.get('from')
+    message_type = message_data.get('type')
+    message_id = message_data.get('id')
+
+    # Drop Meta redeliveries before any bot work starts
+    if deduplicate and message_deduplicator.is_duplicate(message_id):
+        logger.info(f"Dropping duplicate message {message_id} from {phone_number}")
+        return
+
+    # Add debug logging
+    logger.info(f"Processing message {message_id} from {phone_number}, type: {message_type}")
+    logger.info(f"Full message data: {json.dumps(message_data, indent=2)}")
+
+    bot = EeOnamBot(whatsapp=whatsapp)
+
+    try:
+        if message_type == 'text':
+            text = message_data.get('text', {}).get('body', '')
+            logger.info(f"Text message: '{text}'")
+            bot.process_message(phone_number, message_text=text, message_type='text')
+
+        elif message_type == 'interactive':
+            interactive_data = message_data.get('interactive', {})
+            logger.info(f"Interactive data: {interactive_data}")
+            bot.process_message(
+                phone_number,
+                message_type='interactive',
+                interactive_data=interactive_data
+            )
+
+        elif message_type == 'location':
+            location_data = message_data.get('location', {})
+            logger.info(f"Raw location data from WhatsApp: {location_data}")
+
+            # WhatsApp location format validation and processing
+            if 'latitude' in location_data and 'longitude' in location_data:
+                processed_location = {
+                    'latitude': location_data.get('latitude'),
+                    'longitude': location_data.get('longitude'),
+                    'name': location_data.get('name', ''),
+                    'address': location_data.get('address', '')
+                }
+
+                logger.info(f"Processed location: {processed_location}")
+
+                bot.process_message(
+                    phone_number,
+                    message_type='location',
+                    location_data=processed_location
+                )
+            else:
+                logger.warning(f"Invalid location data received: {location_data}")
+                bot.whatsapp.send_message(
+                    phone_number,
+                    "Invalid location data received. Please share your location again."
+                )
+
+        elif message_type == 'image':
+            image_data = message_data.get('image', {})
+            media_id = image_data.get('id')
+
+            logger.info(f"Image data: {image_data}")
+
+            if media_id:
+                media_url = get_media_url(media_id)
+                logger.info(f"Media URL: {media_url}")
+
+                if media_url:
+                    media_data = {
+                        'type': 'image',
+                        'url': media_url,
+                        'caption': image_data.get('caption', '')
+                    }
+                    bot.process_message(
+                        phone_number,
+                        message_type='media',
+                        media_data=media_data
+                    )
+                else:
+                    logger.error(f"Failed to get media URL for media_id: {media_id}")
+                    bot.whatsapp.send_message(
+                        phone_number,
+                        "Unable to process image. Please try again."
+                    )
+            else:
+                logger.warning("Image message without media_id")
+
+        elif message_type == 'document':
+            # Handle document messages if needed
+            logger.info(f"Document message received: {message_data}")
+            bot.whatsapp.send_message(
+                phone_number,
+                "Document messages are not supported. Please send images only."
+            )
+
+        elif message_type == 'audio':
+            # Handle audio messages if needed
+            logger.info(f"Audio message received: {message_data}")
+            bot.whatsapp.send_message(
+                phone_number,
+                "Audio messages are not supported. Please send text or images."
+            )
+
+        elif message_type == 'video':
+            # Handle video messages if needed
+            logger.info(f"Video message received: {message_data}")
+            bot.whatsapp.send_message(
+                phone_number,
+                "Video messages are not supported. Please send text or images."
+            )
+
+        else:
+            logger.warning(f"Unhandled message type: {message_type}")
+            bot.whatsapp.send_message(
+                phone_number,
+                "Sorry, I couldn't process that message type. Please try again or type 'start' to begin."
+            )
+
+    except Exception as e:
+        if raise_errors:
+            raise
+        logger.error(f"Error processing message {message_id}: {e}", exc_info=True)
+        send_processing_error(bot.whatsapp, phone_number)
+
+
+def send_processing_error(whatsapp: WhatsAppService, phone_number: str) -> None:
+    """Tell the customer their message could not be processed"""
+    try:
+        whatsapp.send_message(
+            phone_number,
+            "Sorry, something went wrong processing your message. Please try again or type 'start'."
+        )
+    except Exception as send_error:
+        logger.error(f"Failed to send error message: {send_error}")
+
+
+def get_media_url(media_id: str) -> Optional[str]:
+    """Get media URL from WhatsApp API"""
+    if not media_id:
+        return None
+
+    try:
+        # First, get media info
+        url = f"{settings.WHATSAPP_GRAPH_URL}/{media_id}"
+        headers = {
+            'Authorization': f'Bearer {settings.WHATSAPP_ACCESS_TOKEN}'
+        }
+
+        response = http_client.get(url, headers=headers)
+        response.raise_for_status()
+
+        data = response.json()
+        media_url = data.get('url')
+
+        if not media_url:
+            logger.error(f"No URL in media response: {data}")
+            return None
+
+        logger.info(f"Got media URL for {media_id}: {media_url}")
+        return media_url
+
+    except requests.exceptions.Timeout:
+        logger.error(f"Timeout getting media URL for {media_id}")
+        return None
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Request error getting media URL for {media_id}: {e}")
+        return None
+    except Exception as e:
+        logger.error(f"Unexpected error getting media URL for {media_id}: {e}")
+        return None
+
+
+# =========================
+# Durable inbound queue
+# =========================
+
+def iter_webhook_messages(data: Dict):
+    """Yield every message object contained in a webhook payload"""
+    for entry in data.get('entry', []):
+        for change in entry.get('changes', []):
+            value = change.get('value', {})
+
+            for message in value.get('messages', []):
+                yield message
+
+            # Status updates (delivery receipts, read receipts, etc.) are only logged
+            if 'statuses' in value:
+                logger.info(f"Received status updates: {value['statuses']}")
+
+
+def shard_key_for_phone(phone_number: str) -> int:
+    """Stable non-negative hash of a phone number (identical in every process)"""
+    return zlib.crc32((phone_number or '').encode('utf-8')) & 0x7FFFFFFF
+
+
+def lane_for_phone(phone_number: str, lanes: int) -> int:
+    """Worker lane that owns a phone number when the queue is split into `lanes` lanes"""
+    return shard_key_for_phone(phone_number) % lanes
+
+
+def enqueue_webhook_payload(data: Dict) -> int:
+    """Persist every new message of a webhook payload to the inbound queue"""
+
+    # Redeliveries are dropped here, so queue retries can skip deduplication.
+    # The seen ids commit together with the queue rows: if the enqueue fails the
+    # view answers 500 and Meta's redelivery must not be taken for a duplicate.
+    message_ids = []
+    try:
+        with transaction.atomic():
+            queued = []
+            for message in iter_webhook_messages(data):
+                message_ids.append(message.get('id'))
+                if message_deduplicator.is_duplicate(message.get('id')):
+                    continue
+                queued.append(InboundMessage(
+                    message_id=message.get('id') or '',
+                    phone_number=message.get('from') or '',
+                    shard_key=shard_key_for_phone(message.get('from') or ''),
+                    payload=json.dumps(message)
+                ))
+
+            if queued:
+                InboundMessage.objects.bulk_create(queued)
+    except Exception:
+        message_deduplicator.forget(message_ids)
+        raise
+
+    return len(queued)
+
+
+def _claimable() -> Q:
+    """Rows that are waiting, or whose worker lease has expired"""
+    lease_expired = timezone.now() - timedelta(seconds=settings.WEBHOOK_QUEUE_LEASE_SECONDS)
+    return Q(status='pending') | Q(status='processing', locked_at__lt=lease_expired)
+
+
+def _is_next_for_phone() -> Exists:
+    """
+    True for a row with no older unfinished row from the same phone.
+    UserSession.current_step is a state machine, so a conversation must never
+    be processed out of order or by two workers at once.
+    """
+    unfinished_earlier = InboundMessage.objects.filter(
+        phone_number=OuterRef('phone_number'),
+        id__lt=OuterRef('id'),
+        status__in=['pending', 'processing']
+    )
+    return ~Exists(unfinished_earlier)
+
+
+def claim_next_message(lane: int = 0, lanes: int = 1) -> Optional[InboundMessage]:
+    """
+    Atomically claim the oldest claimable queued message of a worker lane.
+    Phones are hashed onto lanes so different customers run in parallel while
+    each conversation stays on one lane. The claim is a conditional UPDATE that
+    re-checks per-phone ordering, so it is safe across worker processes even
+    while the lane count changes during a restart.
+    """
+    queryset = InboundMessage.objects.filter(_claimable())
+    if lanes > 1:
+        queryset = queryset.annotate(lane=F('shard_key') % lanes).filter(lane=lane)
+
+    candidates = list(
+        queryset.filter(_is_next_for_phone()).order_by('id').values_list('id', flat=True)[:10]
+    )
+
+    for pk in candidates:
+        claimed = InboundMessage.objects.filter(_claimable(), _is_next_for_phone(), pk=pk).update(
+            status='processing',
+            locked_at=timezone.now(),
+            attempts=F('attempts') + 1
+        )
+        if claimed:
+            return InboundMessage.objects.get(pk=pk)
+
+    return None
+
+
+def process_queued_message(item: InboundMessage) -> bool:
+    """Run the bot for a claimed queue row and record the outcome"""
+
+    try:
+        process_inbound_message(json.loads(item.payload), deduplicate=False, raise_errors=True)
+    except Exception as e:
+        logger.error(f"Error processing queued message {item.pk} (attempt {item.attempts}): {e}", exc_info=True)
+        item.status = 'failed' if item.attempts >= settings.WEBHOOK_QUEUE_MAX_ATTEMPTS else 'pending'
+        item.last_error = str(e)
+        item.locked_at = None
+        item.save(update_fields=['status', 'last_error', 'locked_at'])
+        if item.status == 'failed':
+            # Out of retries: the customer would otherwise never hear back
+            send_processing_error(WhatsAppService(), item.phone_number)
+        return False
+
+    item.status = 'done'
+    item.processed_at = timezone.now()
+    item.save(update_fields=['status', 'processed_at'])
+    return True
+
+
+def purge_processed_messages(older_than: timedelta) -> int:
+    """Delete processed queue rows older than the given age"""
+    cutoff = timezone.now() - older_than
+    deleted, _ = InboundMessage.objects.filter(status='done', processed_at__lt=cutoff).delete()
+    return deleted
+
+
+def drain_queue(should_stop=lambda: False, poll_interval: float = None,
+                exit_when_empty: bool = False, lane: int = 0, lanes: int = 1) -> int:
+    """Claim and process queued messages of one lane until stopped; returns the number processed"""
+
+    if poll_interval is None:
+        poll_interval = settings.WEBHOOK_WORKER_POLL_INTERVAL
+
+    processed = 0
+    while not should_stop():
+        try:
+            item = claim_next_message(lane, lanes)
+
+            if item is None:
+                if exit_when_empty:
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            process_queued_message(item)
+            processed += 1
+        except Exception as e:
+            # A lost database connection must not take the whole lane down; an
+            # unfinished claim is picked up again once its lease expires
+            logger.error(f"Webhook worker lane {lane} error: {e}", exc_info=True)
+            close_old_connections()
+            time.sleep(poll_interval)
+
+    return processed
@@ -3,6 +3,7 @@ Management command to initialize EeOnam bot data
 """
 
 from django.core.management.base import BaseCommand
+from bot.catalog import DEFAULT_MENU_ITEMS
 from bot.models import MenuItem
 from bot.utils import initialize_google_sheet
 
@@ -30,14 +31,7 @@ class Command(BaseCommand):
     def create_menu_items(self):
         """Create default menu items"""
         
-        menu_items = [
-            {'name': 'Veg Sadhya', 'price': 150, 'sort_order': 1, 'description': 'Traditional vegetarian Onam feast'},
-            {'name': 'Non-Veg Sadhya', 'price': 200, 'sort_order': 2, 'description': 'Sadhya with non-vegetarian dishes'},
-            {'name': 'Palada Pradhaman', 'price': 40, 'sort_order': 3, 'description': 'Traditional Kerala dessert'},
-            {'name': 'Parippu/Gothambu Payasam', 'price': 40, 'sort_order': 4, 'description': 'Lentil or wheat payasam'},
-            {'name': 'Kaaya Varuthathu', 'price': 30, 'sort_order': 5, 'description': 'Banana chips'},
-            {'name': 'Sharkkaravaratti', 'price': 30, 'sort_order': 6, 'description': 'Jaggery-coated banana chips'},
-        ]
+        menu_items = DEFAULT_MENU_ITEMS
         
         created_count = 0
         for item_data in menu_items:
@@ -0,0 +1,56 @@
+"""
+Django management command that flushes the Google Sheet outbox
+Usage: python manage.py run_sheet_sync [--interval 2] [--once]
+"""
+
+import signal
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from bot.sheet_sync import sheet_syncer
+
+
+class Command(BaseCommand):
+    help = 'Write queued order changes to the Google Sheet in batches (SHEET_SYNC_MODE=outbox)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=settings.SHEET_SYNC_FLUSH_INTERVAL,
+            help='Seconds between flushes; changes queued meanwhile share one write',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Flush the outbox and exit instead of running forever',
+        )
+        parser.add_argument(
+            '--purge-after-hours',
+            type=int,
+            default=24,
+            help='Delete written outbox rows older than this before starting',
+        )
+
+    def handle(self, *args, **options):
+        purged = sheet_syncer.purge(timedelta(hours=options['purge_after_hours']))
+        if purged:
+            self.stdout.write(f"Purged {purged} written outbox rows")
+
+        stopping = []
+        signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+
+        self.stdout.write(self.style.SUCCESS(f"Flushing the sheet outbox every {options['interval']}s..."))
+        handled = 0
+        try:
+            handled = sheet_syncer.run(
+                should_stop=lambda: bool(stopping),
+                interval=options['interval'],
+                exit_when_empty=options['once']
+            )
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(f"Sheet sync stopped after {handled} outbox rows"))
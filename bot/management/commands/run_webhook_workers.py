@@ -0,0 +1,129 @@
+"""
+Django management command that drains the inbound WhatsApp message queue
+Usage: python manage.py run_webhook_workers [--concurrency N] [--once]
+"""
+
+import multiprocessing
+import signal
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from bot.inbound import drain_queue, purge_processed_messages
+from bot.qr_service import qr_render_service
+
+# Minimum seconds between restarts of the same lane's worker
+RESTART_BACKOFF_SECONDS = 5
+
+
+def _worker_main(worker_index, lanes, poll_interval, exit_when_empty):
+    """Entry point of a single forked worker process; each worker owns one lane"""
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+    signal.signal(signal.SIGINT, lambda signum, frame: stopping.append(signum))
+    qr_render_service.warm_in_background()
+
+    drain_queue(
+        should_stop=lambda: bool(stopping),
+        poll_interval=poll_interval,
+        exit_when_empty=exit_when_empty,
+        lane=worker_index,
+        lanes=lanes
+    )
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Run background workers that process queued WhatsApp webhook messages'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=settings.WEBHOOK_WORKER_CONCURRENCY,
+            help='Number of worker processes (phones are hashed onto one lane per worker)',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=settings.WEBHOOK_WORKER_POLL_INTERVAL,
+            help='Seconds to wait when the queue is empty',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Drain the queue and exit instead of polling forever',
+        )
+        parser.add_argument(
+            '--purge-after-hours',
+            type=int,
+            default=24,
+            help='Delete processed queue rows older than this before starting',
+        )
+
+    def handle(self, *args, **options):
+        concurrency = options['concurrency']
+        if concurrency < 1:
+            raise CommandError('--concurrency must be at least 1')
+
+        purged = purge_processed_messages(timedelta(hours=options['purge_after_hours']))
+        if purged:
+            self.stdout.write(f"Purged {purged} processed inbound messages")
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Starting {concurrency} webhook worker(s)...')
+        )
+
+        # Children must open their own database connections
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+
+        def _spawn(index):
+            worker = context.Process(
+                target=_worker_main,
+                args=(index, concurrency, options['poll_interval'], options['once']),
+                name=f'webhook-worker-{index}',
+                daemon=False
+            )
+            worker.start()
+            return worker
+
+        workers = [_spawn(index) for index in range(concurrency)]
+        started_at = [time.monotonic()] * concurrency
+        stopping = []
+
+        # Forward SIGTERM so every worker finishes its current message before exiting
+        def _stop(signum, frame):
+            stopping.append(signum)
+            for worker in workers:
+                if worker.is_alive():
+                    worker.terminate()
+
+        signal.signal(signal.SIGTERM, _stop)
+
+        try:
+            # Supervise: a dead worker would leave every phone of its lane unserved
+            while not stopping:
+                for index, worker in enumerate(workers):
+                    if worker.is_alive() or (options['once'] and worker.exitcode == 0):
+                        continue
+                    if time.monotonic() - started_at[index] < RESTART_BACKOFF_SECONDS:
+                        continue
+                    self.stderr.write(f"{worker.name} exited with code {worker.exitcode}; restarting it")
+                    workers[index] = _spawn(index)
+                    started_at[index] = time.monotonic()
+
+                if options['once'] and all(not w.is_alive() and w.exitcode == 0 for w in workers):
+                    break
+                time.sleep(1)
+        except KeyboardInterrupt:
+            # Ctrl+C reaches the whole process group; workers wind down on their own
+            pass
+
+        for worker in workers:
+            worker.join()
+
+        self.stdout.write(self.style.SUCCESS('Webhook workers stopped'))
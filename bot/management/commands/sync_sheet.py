@@ -0,0 +1,75 @@
+"""
+Django management command that reconciles the Google Sheet with the database
+Usage: python manage.py sync_sheet [--full] [--every SECONDS]
+"""
+
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from bot.sheet_reconcile import sheet_reconciler
+
+
+class Command(BaseCommand):
+    help = 'Push orders changed since the last run that the Google Sheet is missing or shows with a stale status'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Ignore the watermark and the cached sheet index; check every order',
+        )
+        parser.add_argument(
+            '--every',
+            type=float,
+            nargs='?',
+            const=settings.SHEET_RECONCILE_INTERVAL,
+            default=None,
+            help=f'Keep running, reconciling every SECONDS (default {settings.SHEET_RECONCILE_INTERVAL:.0f})',
+        )
+
+    def _run_once(self, full):
+        started = time.perf_counter()
+        result = sheet_reconciler.reconcile(full=full)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"Scanned {result['orders_scanned']} changed orders in {elapsed:.2f}s: "
+            f"appended {result['appended']}, updated {result['status_cells']} status cells, "
+            f"fixed {result['row_numbers_fixed']} row numbers "
+            f"({'rebuilt index' if result['rebuilt_index'] else 'cached index'}, "
+            f"{result['rows_read']} sheet rows read, watermark {result['watermark']})"
+        )
+        if result['unlocated']:
+            self.stderr.write(
+                f"{result['unlocated']} orders have a sheet row number but are not on the sheet; see the log"
+            )
+
+    def handle(self, *args, **options):
+        if options['every'] is None:
+            try:
+                self._run_once(options['full'])
+            except Exception as e:
+                raise CommandError(f"Sheet reconciliation failed: {e}")
+            return
+
+        stopping = []
+        signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+        self.stdout.write(self.style.SUCCESS(f"Reconciling the order sheet every {options['every']:.0f}s..."))
+
+        full = options['full']
+        try:
+            while not stopping:
+                try:
+                    self._run_once(full)
+                    full = False
+                except Exception as e:
+                    self.stderr.write(f"Sheet reconciliation failed: {e}")
+                deadline = time.monotonic() + options['every']
+                while not stopping and time.monotonic() < deadline:
+                    time.sleep(min(1, options['every']))
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS('Sheet reconciliation stopped'))
@@ -0,0 +1,74 @@
+"""
+WhatsApp media id cache for EeOnam
+Images uploaded to the Graph /media endpoint can be sent by id for about 30
+days. Ids are cached in Django's cache under the SHA-256 of the uploaded bytes,
+so repeated images (shared amount QRs, menu cards, brand assets) are uploaded
+once and every later send is by id, with no re-upload and no link fetch.
+"""
+
+import hashlib
+import logging
+import threading
+from typing import Callable, Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+class MediaIdCache:
+    """Content digest -> WhatsApp media id, expiring before WhatsApp drops the media"""
+
+    KEY_PREFIX = 'bot:media:'
+
+    def __init__(self, timeout: int):
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.uploads = 0
+        self.failures = 0
+
+    def _key(self, data: bytes, mime_type: str) -> str:
+        return f"{self.KEY_PREFIX}{mime_type}:{hashlib.sha256(data).hexdigest()}"
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get_or_upload(self, data: bytes, mime_type: str,
+                      upload: Callable[[bytes, str], Optional[str]]) -> Optional[str]:
+        """Cached media id for this content, or upload(data, mime_type) and remember the id"""
+        key = self._key(data, mime_type)
+        media_id = cache.get(key)
+        if media_id:
+            self._count('hits')
+            return media_id
+
+        media_id = upload(data, mime_type)
+        if not media_id:
+            self._count('failures')
+            return None
+
+        self._count('uploads')
+        cache.set(key, media_id, timeout=self.timeout)
+        return media_id
+
+    def forget(self, data: bytes, mime_type: str):
+        """Drop a media id WhatsApp no longer accepts"""
+        cache.delete(self._key(data, mime_type))
+
+    def stats(self) -> Dict:
+        """Upload counters for this process"""
+        with self._lock:
+            sends = self.hits + self.uploads
+            return {
+                'hits': self.hits,
+                'uploads': self.uploads,
+                'failures': self.failures,
+                'hit_rate': round(self.hits / sends, 4) if sends else 0.0,
+            }
+
+
+# Global media id cache instance
+media_id_cache = MediaIdCache(timeout=settings.WHATSAPP_MEDIA_ID_TTL)
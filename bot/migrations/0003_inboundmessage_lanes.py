@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-16 07:52
+
+import zlib
+
+from django.db import migrations, models
+
+
+def backfill_shard_keys(apps, schema_editor):
+    InboundMessage = apps.get_model('bot', 'InboundMessage')
+    for item in InboundMessage.objects.exclude(status='done').only('id', 'phone_number'):
+        item.shard_key = zlib.crc32(item.phone_number.encode('utf-8')) & 0x7FFFFFFF
+        item.save(update_fields=['shard_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0002_inboundmessage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inboundmessage',
+            name='shard_key',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='inboundmessage',
+            index=models.Index(fields=['phone_number', 'id'], name='bot_inbound_phone_idx'),
+        ),
+        migrations.RunPython(backfill_shard_keys, migrations.RunPython.noop),
+    ]
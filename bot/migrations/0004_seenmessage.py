@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-16 07:54
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0003_inboundmessage_lanes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SeenMessage',
+            fields=[
+                ('message_id', models.CharField(max_length=128, primary_key=True, serialize=False)),
+                ('seen_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
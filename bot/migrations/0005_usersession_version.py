@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-16 08:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0004_seenmessage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usersession',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
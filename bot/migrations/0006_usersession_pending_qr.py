@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-16 08:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0005_usersession_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usersession',
+            name='pending_cart_key',
+            field=models.CharField(blank=True, max_length=40),
+        ),
+        migrations.AddField(
+            model_name='usersession',
+            name='pending_order_id',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+    ]
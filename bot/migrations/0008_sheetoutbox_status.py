@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-16 08:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0007_sheetoutbox'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='sheetoutbox',
+            name='kind',
+            field=models.CharField(choices=[('append', 'Append order row'), ('status', 'Update verification status')], default='append', max_length=10),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-16 08:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0008_sheetoutbox_status'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['updated_at'], name='bot_order_updated_idx'),
+        ),
+    ]
@@ -56,6 +56,10 @@ class Order(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Sheet reconciliation reads orders changed since its watermark
+            models.Index(fields=['updated_at'], name='bot_order_updated_idx'),
+        ]
         
     def __str__(self):
         return f"Order {self.order_id} - {self.phone_number}"
@@ -107,17 +111,42 @@ class UserSession(models.Model):
     # Current order reference
     current_order = models.ForeignKey(Order, on_delete=models.SET_NULL, null=True, blank=True)
     
+    # Order id reserved for the speculative payment QR, and the cart it was rendered for
+    pending_order_id = models.CharField(max_length=20, blank=True)
+    pending_cart_key = models.CharField(max_length=40, blank=True)
+    
     # Timestamps
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
     last_interaction = models.DateTimeField(default=timezone.now)
     
+    # Bumped on every session store write; a stale cached copy fails its update
+    version = models.PositiveIntegerField(default=0)
+    
     class Meta:
         ordering = ['-last_interaction']
         
     def __str__(self):
         return f"Session {self.phone_number} - {self.current_step}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+    
+    def snapshot_fields(self):
+        """Remember the current field values as the persisted state"""
+        self._loaded_values = {f.attname: getattr(self, f.attname) for f in self._meta.concrete_fields}
+    
+    def get_dirty_fields(self):
+        """Names of fields changed since the session was loaded or last flushed"""
+        loaded = getattr(self, '_loaded_values', {})
+        return [
+            f.name for f in self._meta.concrete_fields
+            if not f.primary_key and f.attname in loaded and getattr(self, f.attname) != loaded[f.attname]
+        ]
+    
     def update_interaction(self):
         """Update last interaction timestamp"""
         self.last_interaction = timezone.now()
@@ -133,8 +162,97 @@ class MenuItem(models.Model):
     is_available = models.BooleanField(default=True)
     sort_order = models.IntegerField(default=0)
     
+    # Part of the menu catalog version when no shared cache holds its stamp
+    updated_at = models.DateTimeField(auto_now=True)
+    
     class Meta:
         ordering = ['sort_order', 'name']
         
     def __str__(self):
         return f"{self.name} - ₹{self.price}"
+
+
+class InboundMessage(models.Model):
+    """Raw WhatsApp webhook message waiting to be processed by a background worker"""
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    
+    message_id = models.CharField(max_length=128, blank=True)
+    phone_number = models.CharField(max_length=15, blank=True)
+    payload = models.TextField()  # JSON of the single message object from the webhook
+    
+    # Stable hash of phone_number, used to spread conversations over worker lanes
+    shard_key = models.IntegerField(default=0)
+    
+    # Queue state
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    
+    # Timestamps
+    created_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'id'], name='bot_inbound_status_idx'),
+            models.Index(fields=['phone_number', 'id'], name='bot_inbound_phone_idx'),
+        ]
+        
+    def __str__(self):
+        return f"Inbound {self.message_id or self.pk} - {self.status}"
+
+
+class SeenMessage(models.Model):
+    """WhatsApp message id that has already been accepted, used to drop webhook redeliveries"""
+    
+    message_id = models.CharField(max_length=128, primary_key=True)
+    seen_at = models.DateTimeField(default=timezone.now, db_index=True)
+    
+    def __str__(self):
+        return self.message_id
+
+
+class SheetOutbox(models.Model):
+    """Order change waiting to be written to the Google Sheet by the sheet sync flusher"""
+    
+    KIND_CHOICES = [
+        ('append', 'Append order row'),
+        ('status', 'Update verification status'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='sheet_events')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, default='append')
+    
+    # Queue state
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    
+    # Timestamps
+    created_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'id'], name='bot_sheetoutbox_status_idx'),
+        ]
+        
+    def __str__(self):
+        return f"Sheet {self.kind} {self.order_id} - {self.status}"
@@ -0,0 +1,118 @@
+"""
+Amount-keyed payment QR cache for EeOnam
+In QR_CACHE_MODE=amount the UPI payload carries a fixed reconciliation note
+instead of the order id, so one branded QR (and its hosted URL) serves every
+order with the same total. Hosted URLs are kept in a small LRU keyed by the
+amount and the image's render inputs, and persisted to a JSON file so
+restarts and other processes on the same host reuse them.
+"""
+
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from django.conf import settings
+
+from .qr_store import render_key
+
+logger = logging.getLogger(__name__)
+
+
+def amount_key(amount: float) -> str:
+    """
+    Cache key for a total: the amount plus the digest of every render input
+    (revision, encoder, font, merchant, note), so an artwork or format change
+    never hands out a URL of the old image
+    """
+    return f"{amount:.2f}|{render_key(amount, None)}"
+
+
+class AmountQRCache:
+    """LRU of hosted QR URLs by amount, written through to a JSON file"""
+
+    def __init__(self, path: str = '', max_entries: int = 64):
+        self.path = path
+        self.max_entries = max_entries
+        self._urls = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _read_file(self) -> Dict[str, str]:
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable QR amount cache {self.path}: {e}")
+            return {}
+
+    def _entries(self) -> 'OrderedDict[str, str]':
+        if self._urls is None:
+            self._urls = OrderedDict(list(self._read_file().items())[-self.max_entries:])
+        return self._urls
+
+    def _save(self):
+        if not self.path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._urls, f, indent=0)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not persist QR amount cache at {self.path}: {e}")
+
+    def get(self, amount: float) -> Optional[str]:
+        """Hosted QR URL for this total, if one was uploaded before"""
+        key = amount_key(amount)
+        with self._lock:
+            urls = self._entries()
+            url = urls.get(key)
+            if url is None:
+                self.misses += 1
+                return None
+            urls.move_to_end(key)
+            self.hits += 1
+            return url
+
+    def put(self, amount: float, url: str):
+        """Remember an uploaded QR, evicting the least recently used total beyond max_entries"""
+        key = amount_key(amount)
+        with self._lock:
+            urls = self._entries()
+            # Pick up totals other processes added since we loaded
+            for other_key, other_url in self._read_file().items():
+                if other_key not in urls:
+                    urls[other_key] = other_url
+                    urls.move_to_end(other_key, last=False)
+            urls[key] = url
+            urls.move_to_end(key)
+            while len(urls) > self.max_entries:
+                urls.popitem(last=False)
+            self._save()
+
+    def stats(self) -> Dict:
+        """Hit counters for this process"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'mode': settings.QR_CACHE_MODE,
+                'entries': len(self._urls or ()),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+# Global amount QR cache instance
+amount_qr_cache = AmountQRCache(
+    path=settings.QR_AMOUNT_CACHE_PATH,
+    max_entries=settings.QR_AMOUNT_CACHE_SIZE
+)
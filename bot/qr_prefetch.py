@@ -0,0 +1,176 @@
+"""
+Speculative payment QR preparation for EeOnam
+As soon as a delivery order's total is fixed (menu selection), the order id is
+reserved on the session and its QR is rendered and uploaded in the background
+while the customer types their address. The payment step then only has to
+pick up the finished URL. A changed cart discards the reservation.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from decimal import Decimal
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import UserSession
+from .utils import generate_order_id, generate_qr_code, payment_qr_bytes
+
+logger = logging.getLogger(__name__)
+
+
+def cart_key(session: UserSession, total_amount: Decimal) -> str:
+    """Fingerprint of everything printed on (or encoded in) the payment QR"""
+    cart = f"{session.selected_items}|{session.selected_junction}|{total_amount}"
+    return hashlib.sha1(cart.encode('utf-8')).hexdigest()
+
+
+class QRPrefetcher:
+    """
+    Background QR preparation keyed by the reserved order id.
+    The reservation (order id + cart key) lives on the UserSession; the uploaded
+    URL is kept on the in-process future and in Django's cache, so a payment step
+    handled by another worker process can still use it.
+    """
+
+    KEY_PREFIX = 'bot:qr:'
+
+    def __init__(self, enabled: bool, threads: int, wait_timeout: float, cache_timeout: int = 3600):
+        self.enabled = enabled
+        self.threads = threads
+        self.wait_timeout = wait_timeout
+        self.cache_timeout = cache_timeout
+        self._executor = None
+        self._pid = None
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self.started = 0
+        self.used = 0
+        self.waited = 0
+        self.missed = 0
+        self.discarded = 0
+
+    def _key(self, order_id: str) -> str:
+        return f"{self.KEY_PREFIX}{order_id}"
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """Process-local thread pool; recreated after fork"""
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='qr-prefetch')
+                    self._jobs = {}
+                    self._pid = os.getpid()
+        return self._executor
+
+    def _prepare(self, order_id: str, amount: float) -> Optional[str]:
+        qr_url = generate_qr_code(amount, order_id)
+        if qr_url:
+            cache.set(self._key(order_id), qr_url, timeout=self.cache_timeout)
+            if settings.QR_HOSTING == 'whatsapp':
+                # Upload the media now so the payment step finds its id cached
+                from .qr_render import get_encoder
+                from .services import WhatsAppService
+                WhatsAppService().media_id_for(payment_qr_bytes(amount, order_id), get_encoder().mime_type)
+        return qr_url
+
+    def reserve(self, session: UserSession, total_amount: Decimal):
+        """Reserve an order id for the session's cart and start preparing its QR"""
+        if not self.enabled:
+            return
+
+        key = cart_key(session, total_amount)
+        if session.pending_order_id and session.pending_cart_key == key:
+            # Same cart re-sent; the QR already on its way still matches
+            return
+
+        self.discard(session)
+        order_id = generate_order_id()
+        future = self.executor.submit(self._prepare, order_id, float(total_amount))
+        with self._lock:
+            # Finished results are also in the cache; only keep futures still worth waiting on
+            self._jobs = {pending: job for pending, job in self._jobs.items() if not job.done()}
+            self._jobs[order_id] = future
+            self.started += 1
+
+        session.pending_order_id = order_id
+        session.pending_cart_key = key
+
+    def discard(self, session: UserSession):
+        """Drop the session's reservation (cart changed or conversation restarted)"""
+        order_id = session.pending_order_id
+        if not order_id:
+            return
+
+        with self._lock:
+            future = self._jobs.pop(order_id, None)
+        if future is not None:
+            future.cancel()
+        cache.delete(self._key(order_id))
+        self._count('discarded')
+
+        session.pending_order_id = ''
+        session.pending_cart_key = ''
+
+    def claim(self, session: UserSession, total_amount: Decimal) -> Tuple[Optional[str], Optional[str]]:
+        """
+        (order_id, qr_url) reserved for this cart and clears the reservation.
+        order_id is None if nothing was reserved for this exact cart; qr_url is None
+        if the reservation's QR is not ready (render it under the returned id).
+        """
+        order_id = session.pending_order_id
+        if not order_id or session.pending_cart_key != cart_key(session, total_amount):
+            self.discard(session)
+            return None, None
+
+        session.pending_order_id = ''
+        session.pending_cart_key = ''
+
+        with self._lock:
+            future = self._jobs.pop(order_id, None)
+
+        qr_url = None
+        if future is not None:
+            if not future.done():
+                self._count('waited')
+            try:
+                qr_url = future.result(timeout=self.wait_timeout)
+            except FutureTimeoutError:
+                logger.warning(f"Speculative QR for {order_id} still running after {self.wait_timeout}s")
+            except Exception as e:
+                logger.error(f"Speculative QR for {order_id} failed: {e}")
+        else:
+            qr_url = cache.get(self._key(order_id))
+
+        self._count('used' if qr_url else 'missed')
+        return order_id, qr_url
+
+    def stats(self) -> Dict:
+        """Speculation counters for this process"""
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'in_flight': sum(1 for future in self._jobs.values() if not future.done()),
+                'started': self.started,
+                'used': self.used,
+                'waited': self.waited,
+                'missed': self.missed,
+                'discarded': self.discarded,
+            }
+
+
+# Global QR prefetcher instance
+qr_prefetcher = QRPrefetcher(
+    enabled=settings.QR_PREFETCH_ENABLED,
+    threads=settings.QR_PREFETCH_THREADS,
+    wait_timeout=settings.QR_PREFETCH_WAIT
+)
@@ -0,0 +1,399 @@
+"""
+Branded payment QR rendering for EeOnam
+The static artwork (borders, header, brand text, QR frame, decorations) is drawn
+once per process into a template canvas; each order only pastes its QR matrix
+and draws its amount and order id lines onto a copy.
+"""
+
+import io
+import logging
+import os
+import struct
+import threading
+import zlib
+from typing import Optional
+
+import numpy as np
+import qrcode
+from django.conf import settings
+from PIL import Image, ImageDraw
+
+from .fonts import font_registry, text_width
+
+logger = logging.getLogger(__name__)
+
+# Canvas layout
+CANVAS_WIDTH = 800
+CANVAS_HEIGHT = 1000
+BORDER_WIDTH = 8
+HEADER_HEIGHT = 120
+QR_SIZE = 450
+QR_X = (CANVAS_WIDTH - QR_SIZE) // 2
+QR_Y = HEADER_HEIGHT + 50
+DETAILS_Y = QR_Y + QR_SIZE + 40
+
+TITLE_FONT_SIZE = 48
+SUBTITLE_FONT_SIZE = 24
+DETAIL_FONT_SIZE = 20
+
+BRAND_GREEN = "#2E8B57"
+GOLD = "#FFD700"
+GREY_TEXT = "#666666"
+
+BRAND_TEXT = "SADYA KOCHI"
+TAGLINE = "Authentic Kerala Meals Delivered"
+INSTRUCTION_TEXT = "Scan to pay with any UPI app"
+
+IMAGE_MIME_TYPES = {'png': 'image/png', 'jpeg': 'image/jpeg', 'webp': 'image/webp'}
+IMAGE_EXTENSIONS = {'png': 'png', 'jpeg': 'jpg', 'webp': 'webp'}
+
+# Formats each QR_HOSTING can deliver. Every host ends up in a WhatsApp image message,
+# which takes PNG and JPEG only, and the bytes are delivered as encoded, so WebP is
+# left to benchmarks/bench_qr_encode.py
+TRANSPORT_FORMATS = {
+    'cloudinary': ('png', 'jpeg'),
+    'local': ('png', 'jpeg'),
+    'whatsapp': ('png', 'jpeg'),
+}
+
+
+def build_upi_string(amount: float, order_id: Optional[str]) -> str:
+    """UPI deep link encoded in the payment QR (shared note instead of the order id when None)"""
+    note = f"Order_{order_id}" if order_id else settings.QR_AMOUNT_NOTE
+    return (
+        f"upi://pay?"
+        f"pa={settings.UPI_ID}&"
+        f"pn={settings.UPI_MERCHANT_NAME}&"
+        f"am={amount}&"
+        f"cu=INR&"
+        f"tn={note}"
+    )
+
+
+def _draw_centered(draw: ImageDraw.ImageDraw, y: int, text: str, fill: str, size: int):
+    font = font_registry.get(size)
+    if font:
+        draw.text(((CANVAS_WIDTH - text_width(text, size)) // 2, y), text, fill=fill, font=font)
+
+
+class QRTemplate:
+    """Pre-rendered branded canvas with an empty QR frame"""
+
+    def __init__(self, path: Optional[str] = None):
+        # Fonts are resolved and loaded here, never on the per-order path
+        font_registry.warm(TITLE_FONT_SIZE, SUBTITLE_FONT_SIZE, DETAIL_FONT_SIZE)
+
+        self.canvas = None
+        if path and os.path.exists(path):
+            try:
+                with Image.open(path) as cached:
+                    if cached.size == (CANVAS_WIDTH, CANVAS_HEIGHT):
+                        self.canvas = cached.convert('RGB')
+                        logger.debug(f"Loaded QR template from {path}")
+            except OSError as e:
+                logger.warning(f"Ignoring unreadable QR template {path}: {e}")
+
+        if self.canvas is None:
+            self.canvas = self._render()
+            if path:
+                self._save(path)
+
+    def _render(self) -> Image.Image:
+        canvas = Image.new('RGB', (CANVAS_WIDTH, CANVAS_HEIGHT), 'white')
+        draw = ImageDraw.Draw(canvas)
+
+        # Decorative borders
+        draw.rectangle([0, 0, CANVAS_WIDTH, CANVAS_HEIGHT], outline=BRAND_GREEN, width=BORDER_WIDTH)
+        inner_border_margin = 20
+        draw.rectangle([
+            inner_border_margin, inner_border_margin,
+            CANVAS_WIDTH - inner_border_margin, CANVAS_HEIGHT - inner_border_margin
+        ], outline=GOLD, width=4)
+
+        # Brand header
+        draw.rectangle([
+            BORDER_WIDTH, BORDER_WIDTH,
+            CANVAS_WIDTH - BORDER_WIDTH, HEADER_HEIGHT + BORDER_WIDTH
+        ], fill=BRAND_GREEN)
+
+        _draw_centered(draw, 25, BRAND_TEXT, "white", TITLE_FONT_SIZE)
+        _draw_centered(draw, 80, TAGLINE, GOLD, SUBTITLE_FONT_SIZE)
+
+        # Shadow + frame around the QR slot
+        shadow_offset = 5
+        draw.rectangle([
+            QR_X + shadow_offset, QR_Y + shadow_offset,
+            QR_X + QR_SIZE + shadow_offset, QR_Y + QR_SIZE + shadow_offset
+        ], fill="#CCCCCC")
+        draw.rectangle([QR_X - 10, QR_Y - 10, QR_X + QR_SIZE + 10, QR_Y + QR_SIZE + 10],
+                       fill="white", outline="#DDDDDD", width=2)
+
+        _draw_centered(draw, DETAILS_Y + 70, INSTRUCTION_TEXT, GREY_TEXT, DETAIL_FONT_SIZE)
+
+        # Decorative arcs
+        for i in range(3):
+            draw.arc([30 + i*10, 140 + i*10, 70 + i*10, 180 + i*10], start=0, end=90, fill=GOLD, width=3)
+            draw.arc([CANVAS_WIDTH - 70 - i*10, 140 + i*10, CANVAS_WIDTH - 30 - i*10, 180 + i*10],
+                     start=90, end=180, fill=GOLD, width=3)
+
+        return canvas
+
+    def _save(self, path: str):
+        try:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            self.canvas.save(tmp_path, format='PNG')
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not cache QR template at {path}: {e}")
+
+    def compose(self, qr_img: Image.Image, amount: float, order_id: Optional[str]) -> Image.Image:
+        """Copy of the template with this order's QR and detail lines (no order line for shared QRs)"""
+        canvas = self.canvas.copy()
+        canvas.paste(qr_img, (QR_X, QR_Y))
+
+        draw = ImageDraw.Draw(canvas)
+        _draw_centered(draw, DETAILS_Y, f"Amount: ₹{amount:.2f}", BRAND_GREEN, DETAIL_FONT_SIZE)
+        if order_id:
+            _draw_centered(draw, DETAILS_Y + 35, f"Order ID: {order_id}", GREY_TEXT, DETAIL_FONT_SIZE)
+
+        return canvas
+
+
+_template = None
+_template_lock = threading.Lock()
+
+
+def get_template() -> QRTemplate:
+    """Process-wide QR template, built (or loaded from QR_TEMPLATE_PATH) on first use"""
+    global _template
+    if _template is None:
+        with _template_lock:
+            if _template is None:
+                _template = QRTemplate(path=settings.QR_TEMPLATE_PATH or None)
+    return _template
+
+
+# ISO/IEC 18004 data mask patterns over row (i) / column (j) index grids (same as qrcode.util.mask_func)
+DATA_MASKS = (
+    lambda i, j: (i + j) % 2 == 0,
+    lambda i, j: i % 2 == 0,
+    lambda i, j: j % 3 == 0,
+    lambda i, j: (i + j) % 3 == 0,
+    lambda i, j: (i // 2 + j // 3) % 2 == 0,
+    lambda i, j: (i * j) % 2 + (i * j) % 3 == 0,
+    lambda i, j: ((i * j) % 2 + (i * j) % 3) % 2 == 0,
+    lambda i, j: ((i * j) % 3 + (i + j) % 2) % 2 == 0,
+)
+
+# 1:1:3:1:1 finder-like pattern with four light modules on one side
+_FINDER_PATTERNS = np.array([
+    [1, 0, 1, 1, 1, 0, 1, 0, 0, 0, 0],
+    [0, 0, 0, 0, 1, 0, 1, 1, 1, 0, 1],
+], dtype=bool)
+
+
+def _run_penalty(modules: np.ndarray) -> int:
+    """N1: every run of 5+ same-colour modules along a row costs (length - 2)"""
+    rows, count = modules.shape
+    change = np.ones((rows, count + 1), dtype=bool)
+    change[:, 1:count] = modules[:, 1:] != modules[:, :-1]
+    lengths = np.diff(np.flatnonzero(change))
+    return int((lengths[lengths >= 5] - 2).sum())
+
+
+def _finder_penalty(modules: np.ndarray) -> int:
+    """N3: 40 per 1:1:3:1:1 pattern (with its light margin) along a row"""
+    windows = np.lib.stride_tricks.sliding_window_view(modules, 11, axis=1)
+    matches = (windows[:, :, None, :] == _FINDER_PATTERNS).all(axis=-1).any(axis=-1)
+    return 40 * int(matches.sum())
+
+
+def mask_penalty(modules: np.ndarray) -> int:
+    """Mask penalty score, identical to qrcode.util.lost_point"""
+    count = modules.shape[0]
+    penalty = _run_penalty(modules) + _run_penalty(modules.T)
+
+    # N2: 2x2 blocks of one colour
+    top, bottom = modules[:-1], modules[1:]
+    blocks = (top[:, :-1] == top[:, 1:]) & (top[:, :-1] == bottom[:, :-1]) & (top[:, :-1] == bottom[:, 1:])
+    penalty += 3 * int(blocks.sum())
+
+    penalty += _finder_penalty(modules) + _finder_penalty(modules.T)
+
+    # N4: every 5% departure from 50% dark modules
+    percent = float(modules.sum()) / (count ** 2)
+    penalty += int(abs(percent * 100 - 50) / 5) * 10
+    return penalty
+
+
+class VectorizedQRCode(qrcode.QRCode):
+    """
+    qrcode.QRCode that picks the data mask with NumPy: the symbol is laid out once,
+    the eight masked candidates are derived by XOR and scored as arrays, instead of
+    eight pure-Python layouts and penalty scans. Chooses the same mask as qrcode.
+    """
+
+    def map_data(self, data, mask_pattern):
+        # Cells still empty at this point are the data/error-correction modules
+        self._data_cells = [[cell is None for cell in row] for row in self.modules]
+        super().map_data(data, mask_pattern)
+
+    def best_mask_pattern(self):
+        self.makeImpl(True, 0)
+        modules = np.array(self.modules, dtype=bool)
+        data_cells = np.array(self._data_cells, dtype=bool)
+        i, j = np.indices(modules.shape)
+
+        unmasked = modules ^ (data_cells & DATA_MASKS[0](i, j))
+        penalties = [mask_penalty(unmasked ^ (data_cells & mask(i, j))) for mask in DATA_MASKS]
+        return int(np.argmin(penalties))
+
+
+def qr_modules(upi_string: str) -> np.ndarray:
+    """QR module matrix (True = dark), including the quiet-zone border"""
+    qr = VectorizedQRCode(
+        version=3,
+        error_correction=qrcode.constants.ERROR_CORRECT_H,
+        border=6,
+    )
+    qr.add_data(upi_string)
+    qr.make(fit=True)
+    return np.array(qr.get_matrix(), dtype=bool)
+
+
+def rasterize_modules(modules: np.ndarray, size: int = QR_SIZE) -> Image.Image:
+    """
+    1-bit image of the matrix at the largest integer module scale that fits `size`,
+    centred on white; every module is an exact square of pixels (no resampling).
+    """
+    scale = max(1, size // modules.shape[0])
+    bitmap = np.ones((size, size), dtype=bool)
+    scaled = ~modules.repeat(scale, axis=0).repeat(scale, axis=1)
+    offset = (size - scaled.shape[0]) // 2
+    bitmap[offset:offset + scaled.shape[0], offset:offset + scaled.shape[1]] = scaled
+    return Image.frombytes('1', (size, size), np.packbits(bitmap, axis=1).tobytes())
+
+
+def render_qr_matrix(upi_string: str) -> Image.Image:
+    """QR code rasterised for the template's QR slot"""
+    return rasterize_modules(qr_modules(upi_string))
+
+
+def render_payment_qr(amount: float, order_id: Optional[str]) -> Image.Image:
+    """Branded payment QR for one order"""
+    qr_img = render_qr_matrix(build_upi_string(amount, order_id))
+    return get_template().compose(qr_img, amount, order_id)
+
+
+def _pad_png(data: bytes, min_bytes: int) -> bytes:
+    """Grow a PNG to min_bytes with a tEXt comment chunk before IEND (pixels untouched)"""
+    text = b'Comment\x00' + b' ' * max(0, min_bytes - len(data) - 20)
+    chunk = struct.pack('>I', len(text)) + b'tEXt' + text + struct.pack('>I', zlib.crc32(b'tEXt' + text))
+    return data[:-12] + chunk + data[-12:]
+
+
+def _pad_jpeg(data: bytes, min_bytes: int) -> bytes:
+    """Grow a JPEG to min_bytes with COM segments after SOI"""
+    missing = min_bytes - len(data)
+    segments = []
+    while missing > 0:
+        size = min(65533, max(0, missing - 4))
+        segments.append(b'\xff\xfe' + struct.pack('>H', size + 2) + b' ' * size)
+        missing -= size + 4
+    return data[:2] + b''.join(segments) + data[2:]
+
+
+class ImageEncoder:
+    """
+    Encodes composed payment QR canvases.
+    PNG is written as a palette image: the canvas is mapped onto a fixed palette
+    (computed once from the template) without dithering, then deflated at
+    `compress_level`. Files under `min_bytes` are padded with a metadata block
+    rather than re-rendered.
+    """
+
+    def __init__(self, image_format: str = 'png', palette_colors: int = 16, compress_level: int = 6,
+                 quality: int = 90, min_bytes: int = 0):
+        self.image_format = image_format
+        self.palette_colors = palette_colors
+        self.compress_level = compress_level
+        self.quality = quality
+        self.min_bytes = min_bytes
+        self._palette = None
+        self._lock = threading.Lock()
+
+    @property
+    def mime_type(self) -> str:
+        return IMAGE_MIME_TYPES[self.image_format]
+
+    @property
+    def extension(self) -> str:
+        return IMAGE_EXTENSIONS[self.image_format]
+
+    @property
+    def signature(self) -> str:
+        """Every setting that changes the encoded bytes"""
+        return (f"{self.image_format}:{self.palette_colors}:{self.compress_level}:"
+                f"{self.quality}:{self.min_bytes}")
+
+    def palette(self) -> Image.Image:
+        """P-mode image carrying the fixed palette (template colours plus the detail text)"""
+        if self._palette is None:
+            with self._lock:
+                if self._palette is None:
+                    sample = get_template().compose(Image.new('1', (QR_SIZE, QR_SIZE), 0), 9999.0, 'EO-SAMPLE')
+                    count = max(2, self.palette_colors - 2)
+                    flat = sample.quantize(
+                        colors=count, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE
+                    ).getpalette()[:3 * count]
+                    # Exact black and white (and no near-duplicates of them, which Pillow's
+                    # palette lookup could pick instead) keep the QR modules pixel-identical
+                    colors = [
+                        flat[i:i + 3] for i in range(0, len(flat), 3)
+                        if not (max(flat[i:i + 3]) <= 16 or min(flat[i:i + 3]) >= 239)
+                    ]
+                    palette = Image.new('P', (1, 1))
+                    palette.putpalette([0, 0, 0, 255, 255, 255] + [value for color in colors for value in color])
+                    self._palette = palette
+        return self._palette
+
+    def encode(self, canvas: Image.Image) -> bytes:
+        """Encoded image bytes ready for upload or serving"""
+        buffer = io.BytesIO()
+        if self.image_format == 'png':
+            paletted = canvas.quantize(palette=self.palette(), dither=Image.Dither.NONE)
+            paletted.save(buffer, format='PNG', compress_level=self.compress_level)
+            data = buffer.getvalue()
+            return _pad_png(data, self.min_bytes) if len(data) < self.min_bytes else data
+
+        if self.image_format == 'jpeg':
+            canvas.save(buffer, format='JPEG', quality=self.quality)
+            data = buffer.getvalue()
+            return _pad_jpeg(data, self.min_bytes) if len(data) < self.min_bytes else data
+
+        # WebP: lossless by default (quality 100), lossy below that
+        canvas.save(buffer, format='WEBP', lossless=self.quality >= 100, quality=self.quality)
+        return buffer.getvalue()
+
+
+_encoder = None
+
+
+def get_encoder() -> ImageEncoder:
+    """Process-wide encoder for QR_IMAGE_FORMAT, falling back to PNG where the QR hosting cannot take it"""
+    global _encoder
+    if _encoder is None:
+        image_format = settings.QR_IMAGE_FORMAT
+        if image_format not in TRANSPORT_FORMATS.get(settings.QR_HOSTING, ('png',)):
+            logger.warning(f"QR_IMAGE_FORMAT={image_format} cannot be sent with QR_HOSTING={settings.QR_HOSTING}; "
+                           "using png")
+            image_format = 'png'
+        _encoder = ImageEncoder(
+            image_format=image_format,
+            palette_colors=settings.QR_PNG_COLORS,
+            compress_level=settings.QR_PNG_COMPRESS_LEVEL,
+            quality=settings.QR_IMAGE_QUALITY,
+            min_bytes=settings.QR_MIN_IMAGE_BYTES
+        )
+    return _encoder
@@ -0,0 +1,158 @@
+"""
+Off-request QR rendering for EeOnam
+Payment QR images are rendered in a small pool of warm worker processes so the
+PIL/NumPy work never holds the GIL of a process that is serving conversations.
+"""
+
+import atexit
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class QRRenderBusy(Exception):
+    """Every render slot stayed taken for the whole submit timeout"""
+
+
+def _warm_worker():
+    """Pool initializer: set up Django and build the fonts, QR template and palette once per worker"""
+    import django
+    django.setup()
+
+    from .qr_render import get_encoder, get_template
+    get_template()
+    get_encoder().palette()
+
+
+def _render_image(amount: float, order_id: Optional[str]) -> bytes:
+    from .qr_render import get_encoder, render_payment_qr
+    return get_encoder().encode(render_payment_qr(amount, order_id))
+
+
+class QRRenderService:
+    """
+    ProcessPoolExecutor front-end with a bounded number of in-flight renders.
+    Callers beyond the bound wait up to `submit_timeout` for a slot, then get QRRenderBusy.
+    With workers=0 renders run inline in the calling thread.
+    """
+
+    def __init__(self, workers: int, max_pending: int, submit_timeout: float, render_timeout: float):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.submit_timeout = submit_timeout
+        self.render_timeout = render_timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.rendered = 0
+        self.rejected = 0
+        self.in_flight = 0
+
+    @property
+    def executor(self) -> Optional[ProcessPoolExecutor]:
+        """Process-local pool; recreated after fork or if a worker died"""
+        if not self.workers:
+            return None
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    # spawn, not fork: the web process is multi-threaded
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context('spawn'),
+                        initializer=_warm_worker
+                    )
+                    self._pid = os.getpid()
+                    atexit.register(self.shutdown)
+        return self._executor
+
+    def shutdown(self):
+        """Stop this process's workers (also run at interpreter exit)"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None and self._pid == os.getpid():
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def warm(self):
+        """Start every worker now instead of on the first order"""
+        executor = self.executor
+        if executor is not None:
+            for future in [executor.submit(os.getpid) for _ in range(self.workers)]:
+                future.result()
+
+    def warm_in_background(self):
+        """warm() on a daemon thread, so process start-up is not delayed"""
+        if self.workers:
+            threading.Thread(target=self._warm_quietly, name='qr-pool-warmup', daemon=True).start()
+
+    def _warm_quietly(self):
+        try:
+            self.warm()
+        except Exception as e:
+            logger.warning(f"QR render pool warm-up failed: {e}")
+
+    def _acquire(self):
+        if not self._slots.acquire(timeout=self.submit_timeout):
+            with self._lock:
+                self.rejected += 1
+            raise QRRenderBusy(f"{self.max_pending} QR renders already in flight")
+        with self._lock:
+            self.in_flight += 1
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def _submit(self, amount: float, order_id: Optional[str]):
+        try:
+            return self.executor.submit(_render_image, amount, order_id)
+        except BrokenProcessPool:
+            logger.warning("QR render pool broke; restarting it")
+            with self._lock:
+                self._executor = None
+            return self.executor.submit(_render_image, amount, order_id)
+
+    def render_image(self, amount: float, order_id: Optional[str]) -> bytes:
+        """Branded payment QR encoded as QR_IMAGE_FORMAT; blocks the calling thread, not the GIL"""
+        self._acquire()
+        try:
+            if self.executor is None:
+                image = _render_image(amount, order_id)
+            else:
+                image = self._submit(amount, order_id).result(timeout=self.render_timeout)
+        finally:
+            self._release()
+
+        with self._lock:
+            self.rendered += 1
+        return image
+
+    def stats(self) -> Dict:
+        """Render counters for this process"""
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'max_pending': self.max_pending,
+                'in_flight': self.in_flight,
+                'rendered': self.rendered,
+                'rejected': self.rejected,
+            }
+
+
+# Global QR render service instance
+qr_render_service = QRRenderService(
+    workers=settings.QR_RENDER_WORKERS,
+    max_pending=settings.QR_RENDER_MAX_PENDING,
+    submit_timeout=settings.QR_RENDER_SUBMIT_TIMEOUT,
+    render_timeout=settings.QR_RENDER_TIMEOUT
+)
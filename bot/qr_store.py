@@ -0,0 +1,172 @@
+"""
+Local payment QR image store for EeOnam
+With QR_HOSTING=local the payment QR is served by our own /qr/<order_id>.<ext>
+view instead of being uploaded to Cloudinary. Encoded images are kept on disk
+under the SHA-256 of their bytes (identical images are stored once), with a
+small index from render inputs to digest so a request can be answered, or
+revalidated with its ETag, without rendering. The store is bounded in bytes
+and evicts least recently used images.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Bump when the QR artwork changes, so old images are not served for new renders
+RENDER_REVISION = 1
+
+
+def render_key(amount: float, order_id: Optional[str]) -> str:
+    """Digest of everything that determines the encoded image"""
+    from .qr_render import get_encoder
+    inputs = '|'.join([
+        str(RENDER_REVISION), get_encoder().signature, settings.UPI_ID or '', settings.UPI_MERCHANT_NAME,
+        settings.QR_AMOUNT_NOTE if order_id is None else '', settings.QR_FONT_PATH,
+        f"{amount:.2f}", order_id or '',
+    ])
+    return hashlib.sha256(inputs.encode('utf-8')).hexdigest()
+
+
+class QRImageStore:
+    """Content-addressed image cache on local disk with size-bounded LRU eviction"""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._size = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.directory, 'objects', digest[:2], digest)
+
+    def _index_path(self, key: str) -> str:
+        return os.path.join(self.directory, 'index', key[:2], key)
+
+    def _write(self, path: str, data: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def lookup(self, amount: float, order_id: Optional[str]) -> Optional[str]:
+        """Digest of the stored image for these render inputs, if it is still on disk"""
+        try:
+            with open(self._index_path(render_key(amount, order_id)), encoding='ascii') as f:
+                digest = f.read().strip()
+            path = self._object_path(digest)
+            # Touch for LRU eviction
+            os.utime(path)
+            return digest
+        except OSError:
+            return None
+
+    def read(self, digest: str) -> Optional[bytes]:
+        """Stored image bytes by digest"""
+        try:
+            with open(self._object_path(digest), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def store(self, amount: float, order_id: Optional[str], image: bytes) -> str:
+        """Write an image (once per distinct content) and index it; returns its digest"""
+        digest = hashlib.sha256(image).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            self._write(path, image)
+            self._grow(len(image))
+        self._write(self._index_path(render_key(amount, order_id)), digest.encode('ascii'))
+        return digest
+
+    def get_or_render(self, amount: float, order_id: Optional[str]) -> Tuple[str, bytes]:
+        """(digest, image bytes), rendering and storing the image on a miss"""
+        digest = self.lookup(amount, order_id)
+        if digest:
+            image = self.read(digest)
+            if image is not None:
+                self._count('hits')
+                return digest, image
+
+        self._count('misses')
+        from .qr_service import qr_render_service
+        image = qr_render_service.render_image(amount, order_id)
+        try:
+            digest = self.store(amount, order_id, image)
+        except OSError as e:
+            logger.warning(f"Could not store QR image in {self.directory}: {e}")
+            digest = hashlib.sha256(image).hexdigest()
+        return digest, image
+
+    def _objects(self):
+        root = os.path.join(self.directory, 'objects')
+        for dirpath, _, filenames in os.walk(root):
+            for name in filenames:
+                if not name.endswith('.tmp'):
+                    path = os.path.join(dirpath, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    yield stat.st_mtime, stat.st_size, path
+
+    def _grow(self, added: int):
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._objects())
+            else:
+                self._size += added
+            if self._size <= self.max_bytes:
+                return
+            self._evict()
+
+    def _evict(self):
+        """Remove least recently used images until the store is under 90% of max_bytes"""
+        objects = sorted(self._objects())
+        total = sum(size for _, size, _ in objects)
+        target = self.max_bytes * 0.9
+        for _, size, path in objects:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self.evictions += 1
+        # Index entries of evicted images are left behind; lookup() treats them as misses
+        self._size = total
+
+    def stats(self) -> Dict:
+        """Hit counters for this process"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hosting': settings.QR_HOSTING,
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+            }
+
+
+# Global QR image store instance
+qr_image_store = QRImageStore(
+    directory=settings.QR_IMAGE_DIR,
+    max_bytes=settings.QR_IMAGE_CACHE_BYTES
+)
@@ -13,40 +13,47 @@ import requests
 from django.conf import settings
 from django.utils import timezone
 
-from .models import Order, UserSession, MenuItem
+from .catalog import menu_catalog, paise_to_decimal, to_paise
+from .date_window import delivery_dates
+from .http_client import http_client
+from .models import Order, UserSession
+from .qr_prefetch import qr_prefetcher
+from .qr_render import get_encoder
+from .session_store import session_store
+from .sheet_sync import sheet_syncer
 from .location_manager import location_manager
+from .media_cache import media_id_cache
 from .utils import (
     generate_order_id, 
     generate_qr_code, 
-    upload_to_cloudinary,  # Updated to match utils.py
-    save_to_google_sheet,
-    get_available_dates
+    payment_qr_bytes,
+    upload_to_cloudinary  # Updated to match utils.py
 )
 
 logger = logging.getLogger(__name__)
 
 
-class WhatsAppService:
-    """Service class for WhatsApp API interactions"""
+class WhatsAppPayloads:
+    """Graph API endpoints and message payload builders, shared by the sync and async clients"""
     
     def __init__(self):
         self.access_token = settings.WHATSAPP_ACCESS_TOKEN
         self.phone_number_id = settings.WHATSAPP_PHONE_NUMBER_ID
-        self.api_url = f"https://graph.facebook.com/v18.0/{self.phone_number_id}/messages"
+        self.api_url = f"{settings.WHATSAPP_GRAPH_URL}/{self.phone_number_id}/messages"
+        self.media_url = f"{settings.WHATSAPP_GRAPH_URL}/{self.phone_number_id}/media"
         
-    def send_message(self, to: str, message: str) -> bool:
-        """Send a text message"""
-        payload = {
+    def text_payload(self, to: str, message: str) -> Dict:
+        """Build a text message payload"""
+        return {
             "messaging_product": "whatsapp",
             "to": to,
             "type": "text",
             "text": {"body": message}
         }
-        return self._make_request(payload)
     
-    def send_interactive_message(self, to: str, message: str, buttons: List[Dict]) -> bool:
-        """Send an interactive message with buttons"""
-        payload = {
+    def interactive_payload(self, to: str, message: str, buttons: List[Dict]) -> Dict:
+        """Build an interactive message payload with buttons"""
+        return {
             "messaging_product": "whatsapp",
             "to": to,
             "type": "interactive",
@@ -58,11 +65,10 @@ class WhatsAppService:
                 }
             }
         }
-        return self._make_request(payload)
     
-    def send_list_message(self, to: str, message: str, button_text: str, sections: List[Dict]) -> bool:
-        """Send a list message"""
-        payload = {
+    def list_payload(self, to: str, message: str, button_text: str, sections: List[Dict]) -> Dict:
+        """Build a list message payload"""
+        return {
             "messaging_product": "whatsapp",
             "to": to,
             "type": "interactive",
@@ -75,20 +81,68 @@ class WhatsAppService:
                 }
             }
         }
-        return self._make_request(payload)
     
-    def send_image(self, to: str, image_url: str, caption: str = "") -> bool:
-        """Send an image message"""
-        payload = {
+    def image_payload(self, to: str, image_url: str = "", caption: str = "", media_id: str = None) -> Dict:
+        """Build an image message payload (by uploaded media id when given, else by link)"""
+        image = {"id": media_id} if media_id else {"link": image_url}
+        image["caption"] = caption
+        return {
             "messaging_product": "whatsapp",
             "to": to,
             "type": "image",
-            "image": {
-                "link": image_url,
-                "caption": caption
-            }
+            "image": image
         }
-        return self._make_request(payload)
+
+
+class WhatsAppService(WhatsAppPayloads):
+    """Service class for WhatsApp API interactions"""
+    
+    def send_message(self, to: str, message: str) -> bool:
+        """Send a text message"""
+        return self._make_request(self.text_payload(to, message))
+    
+    def send_interactive_message(self, to: str, message: str, buttons: List[Dict]) -> bool:
+        """Send an interactive message with buttons"""
+        return self._make_request(self.interactive_payload(to, message, buttons))
+    
+    def send_list_message(self, to: str, message: str, button_text: str, sections: List[Dict]) -> bool:
+        """Send a list message"""
+        return self._make_request(self.list_payload(to, message, button_text, sections))
+    
+    def send_image(self, to: str, image_url: str, caption: str = "") -> bool:
+        """Send an image message"""
+        return self._make_request(self.image_payload(to, image_url, caption))
+    
+    def media_id_for(self, data: bytes, mime_type: str = "image/png") -> Optional[str]:
+        """Media id for this content, from the media id cache or a fresh upload"""
+        return media_id_cache.get_or_upload(data, mime_type, self.upload_media)
+    
+    def upload_media(self, data: bytes, mime_type: str = "image/png", filename: str = None) -> Optional[str]:
+        """Upload bytes to the Graph /media endpoint; returns the media id"""
+        headers = {"Authorization": f"Bearer {self.access_token}"}
+        filename = filename or f"image.{mime_type.split('/')[-1]}"
+        
+        try:
+            response = http_client.post(
+                self.media_url,
+                headers=headers,
+                data={"messaging_product": "whatsapp", "type": mime_type},
+                files={"file": (filename, data, mime_type)}
+            )
+            response.raise_for_status()
+            media_id = response.json().get('id')
+            logger.info(f"Uploaded {len(data)} bytes of {mime_type} as media {media_id}")
+            return media_id
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.error(f"Failed to upload media: {e}")
+            return None
+    
+    def send_group(self, payloads: List[Dict]) -> List[bool]:
+        """
+        Send messages that do not depend on each other.
+        Delivery order inside the group is not guaranteed (the async service sends them concurrently).
+        """
+        return [self._make_request(payload) for payload in payloads]
     
     def _make_request(self, payload: Dict) -> bool:
         """Make API request to WhatsApp"""
@@ -98,7 +152,7 @@ class WhatsAppService:
         }
         
         try:
-            response = requests.post(self.api_url, headers=headers, json=payload)
+            response = http_client.post(self.api_url, headers=headers, json=payload)
             response.raise_for_status()
             logger.info(f"Message sent successfully: {response.json()}")
             return True
@@ -110,38 +164,26 @@ class WhatsAppService:
 class EeOnamBot:
     """Main bot logic handler"""
     
-    def __init__(self):
-        self.whatsapp = WhatsAppService()
+    def __init__(self, whatsapp: Optional[WhatsAppService] = None):
+        self.whatsapp = whatsapp or WhatsAppService()
         self.menu_items = self._load_menu_items()
         
     def _load_menu_items(self) -> Dict[str, Dict]:
-        """Load menu items from database"""
-        items = {}
-        menu_items = MenuItem.objects.filter(is_available=True)
-        for item in menu_items:
-            items[str(item.id)] = {
-                'name': item.name,
-                'price': float(item.price),
-                'description': item.description
-            }
-        return items
+        """Load menu items from the process-wide catalog"""
+        return menu_catalog.items()
     
     def process_message(self, phone_number: str, message_text: str = None, 
                        message_type: str = "text", interactive_data: Dict = None,
                        location_data: Dict = None, media_data: Dict = None) -> bool:
         """Process incoming message and route to appropriate handler"""
         
-        # Get or create user session
-        session, created = UserSession.objects.get_or_create(
-            phone_number=phone_number,
-            defaults={'current_step': 'start'}
-        )
-        session.update_interaction()
+        # Load (or start) the user session; changes are written once, when the step is done
+        session, created = session_store.load(phone_number)
+        session_store.touch(session)
 
         # Check for the 'start' message to reset the session
         if message_text and message_text.lower().strip() == 'start':
             session.current_step = 'start'
-            session.save()
         
         try:
             if created or session.current_step == 'start':
@@ -168,6 +210,8 @@ class EeOnamBot:
                 "Sorry, something went wrong. Please try again by typing 'start'."
             )
             return False
+        finally:
+            session_store.flush(session)
     
     def _handle_start(self, session: UserSession) -> bool:
         """Handle start of conversation"""
@@ -179,20 +223,11 @@ class EeOnamBot:
             "Let's start by selecting your preferred delivery date.\n\n"
             "Please choose a date (minimum 3 days in advance):"
         )
-        # Get available dates
-        dates = get_available_dates()
-        buttons = []
-        for i, date in enumerate(dates[:3]):  # Show first 3 dates as buttons
-            buttons.append({
-                "type": "reply",
-                "reply": {
-                    "id": f"date_{date.strftime('%Y-%m-%d')}",
-                    "title": date.strftime('%d %b %Y')
-                }
-            })
+        # First available dates as buttons (pre-rendered once per day)
+        buttons = delivery_dates.current().buttons
         
         session.current_step = 'date_selection'
-        session.save()
+        qr_prefetcher.discard(session)
         
         return self.whatsapp.send_interactive_message(
             session.phone_number, welcome_message, buttons
@@ -203,6 +238,7 @@ class EeOnamBot:
         """Handle date selection"""
         
         selected_date = None
+        date_window = delivery_dates.current()
         
         if interactive_data and interactive_data.get('button_reply'):
             button_id = interactive_data['button_reply']['id']
@@ -218,18 +254,14 @@ class EeOnamBot:
             try:
                 selected_date = datetime.strptime(message_text.strip(), '%Y-%m-%d').date()
             except (ValueError, AttributeError):
-                dates = get_available_dates()
-                date_list = '\n'.join([f"• {date.strftime('%d %b %Y')}" for date in dates[:7]])
-                
                 return self.whatsapp.send_message(
                     session.phone_number,
-                    f"Please select a valid date. Available dates:\n\n{date_list}\n\n"
+                    f"Please select a valid date. Available dates:\n\n{date_window.list_text}\n\n"
                     "You can click the buttons above or type the date in YYYY-MM-DD format."
                 )
         
         # Validate date is available
-        available_dates = get_available_dates()
-        if selected_date not in available_dates:
+        if selected_date not in date_window:
             return self.whatsapp.send_message(
                 session.phone_number,
                 "Selected date is not available. Please choose from the available dates."
@@ -237,7 +269,6 @@ class EeOnamBot:
         
         session.selected_date = selected_date
         session.current_step = 'junction_selection'
-        session.save()
         
         # Show junction selection using location manager
         junction_message = (
@@ -249,15 +280,16 @@ class EeOnamBot:
         # Get WhatsApp buttons from location manager
         button_groups = location_manager.get_whatsapp_buttons(max_buttons=3)
         
-        success_results = []
-        for i, buttons in enumerate(button_groups):
-            message = junction_message if i == 0 else "More options:"
-            success = self.whatsapp.send_interactive_message(
-                session.phone_number, message, buttons
+        payloads = [
+            self.whatsapp.interactive_payload(
+                session.phone_number,
+                junction_message if i == 0 else "More options:",
+                buttons
             )
-            success_results.append(success)
+            for i, buttons in enumerate(button_groups)
+        ]
         
-        return all(success_results)
+        return all(self.whatsapp.send_group(payloads))
     
     def _handle_junction_selection(self, session: UserSession, message_text: str,
                                   interactive_data: Dict) -> bool:
@@ -277,7 +309,6 @@ class EeOnamBot:
         
         session.selected_junction = selected_junction
         session.current_step = 'menu_selection'
-        session.save()
         
         # Show menu
         return self._show_menu(session)
@@ -287,20 +318,16 @@ class EeOnamBot:
         
         # Get junction display name from location manager
         junction_display = location_manager.get_display_name(session.selected_junction)
+        menu = menu_catalog.compiled()
         
         menu_message = (
             f"📍 Junction: *{junction_display}*\n"
             f"📅 Date: *{session.selected_date.strftime('%d %B %Y')}*\n\n"
             "🍽️ *Our Menu:*\n\n"
-            "1️⃣ Veg Sadhya - ₹150\n"
-            "2️⃣ Non-Veg Sadhya - ₹200\n"
-            "3️⃣ Palada Pradhaman - ₹40\n"
-            "4️⃣ Parippu/Gothambu Payasam - ₹40\n"
-            "5️⃣ Kaaya Varuthathu - ₹30\n"
-            "6️⃣ Sharkkaravaratti - ₹30\n\n"
+            f"{menu.menu_lines}\n\n"
             "*Note:* Payasams are included in sadhya, but can be ordered separately.\n\n"
             "Please reply with your order in this format:\n"
-            "*Example:* 1 x 2, 3 x 1 (means 2 Veg Sadhya, 1 Palada Pradhaman)\n\n"
+            f"{menu.example_hint}\n\n"
             "Just type the numbers and quantities you want!"
         )
         
@@ -317,7 +344,7 @@ class EeOnamBot:
                 return self.whatsapp.send_message(
                     session.phone_number,
                     "Invalid format. Please use format like: 1 x 2, 3 x 1\n"
-                    "Where numbers 1-6 represent menu items and quantities."
+                    f"Where numbers {menu_catalog.compiled().numbers_text} represent menu items and quantities."
                 )
             
             # Calculate total
@@ -337,7 +364,9 @@ class EeOnamBot:
             
             if 'delivery' in session.selected_junction:
                 session.current_step = 'delivery_details'
-                session.save()
+                
+                # The total is fixed now: get the payment QR ready while the address is typed
+                qr_prefetcher.reserve(session, total_amount)
                 
                 summary_message += (
                     "📍 Since you selected delivery, please share your delivery address.\n\n"
@@ -360,79 +389,17 @@ class EeOnamBot:
     
     def _parse_order(self, order_text: str) -> Dict[int, int]:
         """Parse order text into item_id: quantity mapping"""
-        
-        # Menu item mapping
-        menu_mapping = {
-            1: 'Veg Sadhya',
-            2: 'Non-Veg Sadhya', 
-            3: 'Palada Pradhaman',
-            4: 'Parippu/Gothambu Payasam',
-            5: 'Kaaya Varuthathu',
-            6: 'Sharkkaravaratti'
-        }
-        
-        selected_items = {}
-        
-        # Split by comma and process each item
-        items = order_text.split(',')
-        
-        for item in items:
-            item = item.strip()
-            # Match pattern like "1 x 2" or "1x2" or "1*2"
-            import re
-            match = re.match(r'(\d+)\s*[x*]\s*(\d+)', item, re.IGNORECASE)
-            
-            if match:
-                item_id = int(match.group(1))
-                quantity = int(match.group(2))
-                
-                if 1 <= item_id <= 6 and quantity > 0:
-                    selected_items[item_id] = selected_items.get(item_id, 0) + quantity
-        
-        return selected_items
+        return menu_catalog.compiled().parse_order(order_text)
     
     def _calculate_total(self, selected_items: Dict[int, int], junction: str) -> Tuple[Decimal, str]:
         """Calculate total amount and generate order summary"""
         
-        # Menu prices
-        prices = {
-            1: 150,  # Veg Sadhya
-            2: 200,  # Non-Veg Sadhya
-            3: 40,   # Palada Pradhaman
-            4: 40,   # Parippu/Gothambu Payasam
-            5: 30,   # Kaaya Varuthathu
-            6: 30    # Sharkkaravaratti
-        }
-        
-        names = {
-            1: 'Veg Sadhya',
-            2: 'Non-Veg Sadhya',
-            3: 'Palada Pradhaman', 
-            4: 'Parippu/Gothambu Payasam',
-            5: 'Kaaya Varuthathu',
-            6: 'Sharkkaravaratti'
-        }
-        
-        total = 0
-        summary_lines = []
-        
-        for item_id, quantity in selected_items.items():
-            price = prices[item_id]
-            item_total = price * quantity
-            total += item_total
-            
-            summary_lines.append(
-                f"• {names[item_id]} x {quantity} = ₹{item_total}"
-            )
-        
-        # Add delivery fee if applicable
-        if 'delivery' in junction:
-            delivery_fee = 50
-            total += delivery_fee
-            summary_lines.append(f"• Delivery Fee = ₹{delivery_fee}")
+        # Exact integer paise; converted to Decimal only for the order record
+        delivery_fee = to_paise(location_manager.get_delivery_fee(junction))
+        total, summary_lines = menu_catalog.compiled().total(selected_items, delivery_fee)
         
         summary = '\n'.join(summary_lines)
-        return Decimal(str(total)), summary
+        return paise_to_decimal(total), summary
     
     def _handle_delivery_details(self, session: UserSession, message_text: str,
                                 location_data: Dict) -> bool:
@@ -464,8 +431,6 @@ class EeOnamBot:
                 "Please provide your delivery address or share your location."
             )
         
-        session.save()
-        
         # Calculate total and generate payment QR
         selected_items = json.loads(session.selected_items)
         # Convert keys to int to avoid KeyError in _calculate_total
@@ -480,11 +445,25 @@ class EeOnamBot:
                            order_summary: str) -> bool:
         """Generate payment QR code"""
         
-        # Generate order ID
-        order_id = generate_order_id()
+        # Use the order ID (and QR) reserved at menu selection when the cart is unchanged
+        order_id, qr_url = qr_prefetcher.claim(session, total_amount)
+        if not order_id:
+            order_id = generate_order_id()
         
         # Generate QR code
-        qr_url = generate_qr_code(float(total_amount), order_id)
+        if not qr_url:
+            qr_url = generate_qr_code(float(total_amount), order_id)
+        
+        # With QR_HOSTING=whatsapp the image goes by media id (uploaded once per distinct image).
+        # There is no fallback to the BASE_URL/qr/ link: WhatsApp can only fetch that when it
+        # is served publicly, which is what QR_HOSTING=local is for
+        media_id = None
+        if qr_url and settings.QR_HOSTING == 'whatsapp':
+            qr_bytes = payment_qr_bytes(float(total_amount), order_id)
+            media_id = self.whatsapp.media_id_for(qr_bytes, get_encoder().mime_type)
+            if not media_id:
+                logger.error(f"Could not upload the payment QR of order {order_id} as WhatsApp media")
+                qr_url = None
         
         if not qr_url:
             return self.whatsapp.send_message(
@@ -506,7 +485,6 @@ class EeOnamBot:
         
         session.current_order = order
         session.current_step = 'payment_screenshot'
-        session.save()
         
         # Send QR code
         payment_message = (
@@ -518,14 +496,21 @@ class EeOnamBot:
             "After payment, send a screenshot of the transaction."
         )
         
-        success1 = self.whatsapp.send_message(session.phone_number, payment_message)
-        success2 = self.whatsapp.send_image(
-            session.phone_number, 
-            qr_url,
-            f"Scan to pay ₹{total_amount} for Order {order_id}"
-        )
+        results = self.whatsapp.send_group([
+            self.whatsapp.text_payload(session.phone_number, payment_message),
+            self.whatsapp.image_payload(
+                session.phone_number,
+                qr_url,
+                f"Scan to pay ₹{total_amount} for Order {order_id}",
+                media_id=media_id
+            )
+        ])
+        
+        if media_id and not results[1]:
+            # The id may have expired on WhatsApp's side; upload again next time
+            media_id_cache.forget(qr_bytes, get_encoder().mime_type)
         
-        return success1 and success2
+        return all(results)
     
     def _handle_payment_screenshot(self, session: UserSession, media_data: Dict) -> bool:
         """Handle payment screenshot upload"""
@@ -559,8 +544,8 @@ class EeOnamBot:
             order.payment_screenshot_url = cloudinary_url  # Now stores Cloudinary URL
             order.save()
             
-            # Save to Google Sheet
-            save_to_google_sheet(order)
+            # Save to Google Sheet (queued for the sheet sync flusher in outbox mode)
+            sheet_syncer.enqueue_append(order)
             
             # Send confirmation
             confirmation_message = (
@@ -574,7 +559,6 @@ class EeOnamBot:
             )
             
             session.current_step = 'completed'
-            session.save()
             
             return self.whatsapp.send_message(session.phone_number, confirmation_message)
             
@@ -0,0 +1,162 @@
+"""
+UserSession persistence for EeOnam
+A conversation step loads the session once (from Django's cache when it is
+warm), mutates it in memory and flushes only the changed columns in a single
+versioned statement when the step is done. The database stays authoritative.
+"""
+
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import UserSession
+
+logger = logging.getLogger(__name__)
+
+
+class SessionStore:
+    """
+    Unit of work for UserSession: one read and at most one write per inbound message.
+    Reads go through the cache; writes go to the DB first and then to the cache.
+    Every write bumps UserSession.version and only applies if the version it read
+    is still current. A step decided from a stale copy is aborted rather than
+    merged: its changes are dropped, the newer row stands and the cached copy is
+    evicted so the next message starts from the database.
+    """
+
+    KEY_PREFIX = 'bot:session:'
+
+    def __init__(self, cache_enabled: bool, cache_timeout: int):
+        self.cache_enabled = cache_enabled
+        self.cache_timeout = cache_timeout
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.db_reads = 0
+        self.conflicts = 0
+
+    def _key(self, phone_number: str) -> str:
+        return f"{self.KEY_PREFIX}{phone_number}"
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _to_cache(self, session: UserSession):
+        if self.cache_enabled:
+            values = {f.attname: getattr(session, f.attname) for f in UserSession._meta.concrete_fields}
+            cache.set(self._key(session.phone_number), values, timeout=self.cache_timeout)
+
+    def _from_cache(self, phone_number: str) -> Optional[UserSession]:
+        values = cache.get(self._key(phone_number))
+        if values is None:
+            return None
+        attnames = [f.attname for f in UserSession._meta.concrete_fields]
+        if not all(attname in values for attname in attnames):
+            # Cached before a schema change
+            return None
+        return UserSession.from_db('default', attnames, [values[attname] for attname in attnames])
+
+    def _read_db(self, phone_number: str) -> Optional[UserSession]:
+        self._count('db_reads')
+        return UserSession.objects.filter(phone_number=phone_number).first()
+
+    def load(self, phone_number: str) -> Tuple[UserSession, bool]:
+        """Session for a phone; a new one is returned unsaved and inserted on flush"""
+        if self.cache_enabled:
+            session = self._from_cache(phone_number)
+            if session is not None:
+                self._count('hits')
+                return session, False
+            self._count('misses')
+
+        session = self._read_db(phone_number)
+        if session is not None:
+            self._to_cache(session)
+            return session, False
+        return UserSession(phone_number=phone_number, current_step='start'), True
+
+    def touch(self, session: UserSession):
+        """Record the interaction; written together with the step's other changes"""
+        session.last_interaction = timezone.now()
+
+    def flush(self, session: UserSession) -> bool:
+        """Write the changed fields (if any); returns True if they were written"""
+        if session._state.adding:
+            if not self._insert(session):
+                return False
+            session.snapshot_fields()
+            self._to_cache(session)
+            return True
+
+        dirty = session.get_dirty_fields()
+        if not dirty:
+            return False
+
+        changes = {
+            f.attname: getattr(session, f.attname)
+            for f in UserSession._meta.concrete_fields if f.name in dirty
+        }
+        if dirty != ['last_interaction']:
+            changes['updated_at'] = timezone.now()
+
+        updated = UserSession.objects.filter(pk=session.pk, version=session.version).update(
+            version=F('version') + 1, **changes
+        )
+        if not updated:
+            # Someone else wrote this session since we read it, so this step was decided
+            # from a stale state: keep their row rather than write ours over it
+            self._abort(session, f"changed concurrently (read version {session.version})")
+            return False
+
+        session.version += 1
+        session.snapshot_fields()
+        self._to_cache(session)
+        return True
+
+    def _abort(self, session: UserSession, reason: str):
+        self._count('conflicts')
+        logger.warning(f"Session for {session.phone_number} {reason}; discarding this step's changes")
+        if self.cache_enabled:
+            cache.delete(self._key(session.phone_number))
+
+    def _insert(self, session: UserSession) -> bool:
+        try:
+            with transaction.atomic():
+                session.save(force_insert=True)
+        except IntegrityError:
+            # Another worker created this phone's session first; its row stands
+            self._abort(session, "was created concurrently")
+            return False
+        return True
+
+    def evict(self, phone_number: str):
+        """Forget the cached copy (after writes that bypass the store, e.g. the admin)"""
+        if self.cache_enabled:
+            cache.delete(self._key(phone_number))
+
+    def stats(self) -> Dict:
+        """Cache and DB read counters for this process"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.cache_enabled,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'db_reads': self.db_reads,
+                'conflicts': self.conflicts,
+            }
+
+
+# Global session store instance
+session_store = SessionStore(
+    cache_enabled=settings.SESSION_CACHE_ENABLED,
+    cache_timeout=settings.SESSION_CACHE_TIMEOUT
+)
@@ -0,0 +1,270 @@
+"""
+Incremental database -> Google Sheet reconciliation for EeOnam
+The live paths (inline writes or the sheet sync outbox) can still lose a write
+when Google fails for long enough. `manage.py sync_sheet` repairs that: it
+reads only orders whose updated_at is past a stored watermark, diffs them
+against a cached index of the sheet (order id -> row, status) and pushes just
+the missing rows and changed status cells in batched calls. The index is
+extended with rows appended since the last run, so a run costs Sheets
+requests in proportion to the changes, not to the size of the sheet.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from gspread.utils import rowcol_to_a1
+
+from .models import Order, SheetOutbox
+from .sheet_sync import sheet_syncer
+from .utils import (
+    SHEET_ORDER_ID_COLUMN,
+    SHEET_STATUS_COLUMN,
+    appended_row_number,
+    open_order_sheet,
+    order_sheet_row
+)
+
+logger = logging.getLogger(__name__)
+
+ORDER_ID_LETTER = rowcol_to_a1(1, SHEET_ORDER_ID_COLUMN)[:-1]
+STATUS_LETTER = rowcol_to_a1(1, SHEET_STATUS_COLUMN)[:-1]
+
+
+class SheetIndex:
+    """Order id -> [row, status] of the order sheet, with the reconciliation watermark"""
+
+    def __init__(self, sheet_id: str, built_at: float = None, indexed_rows: int = 0,
+                 watermark: Optional[datetime] = None, rows: Dict[str, List] = None):
+        self.sheet_id = sheet_id
+        self.built_at = built_at or time.time()
+        self.indexed_rows = indexed_rows
+        self.watermark = watermark
+        self.rows = rows or {}
+
+    def set(self, order_id: str, row: int, status: str):
+        self.rows[order_id] = [row, status]
+        self.indexed_rows = max(self.indexed_rows, row)
+
+    def to_json(self) -> Dict:
+        return {
+            'sheet_id': self.sheet_id,
+            'built_at': self.built_at,
+            'indexed_rows': self.indexed_rows,
+            'watermark': self.watermark.isoformat() if self.watermark else None,
+            'rows': self.rows,
+        }
+
+    @classmethod
+    def from_json(cls, data: Dict) -> 'SheetIndex':
+        watermark = data.get('watermark')
+        return cls(
+            sheet_id=data['sheet_id'],
+            built_at=data['built_at'],
+            indexed_rows=data['indexed_rows'],
+            watermark=datetime.fromisoformat(watermark) if watermark else None,
+            rows=data['rows'],
+        )
+
+
+class SheetReconciler:
+    """Pushes orders changed since the watermark that the sheet does not reflect"""
+
+    def __init__(self, index_path: str, index_max_age: int, overlap: int):
+        self.index_path = index_path
+        self.index_max_age = index_max_age
+        self.overlap = timedelta(seconds=overlap)
+        self._lock = threading.Lock()
+
+    def load_index(self, sheet_id: str) -> Optional[SheetIndex]:
+        """The saved index of this sheet, unless it is missing, unreadable or too old"""
+        if not self.index_path or not os.path.exists(self.index_path):
+            return None
+        try:
+            with open(self.index_path, encoding='utf-8') as f:
+                index = SheetIndex.from_json(json.load(f))
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable sheet index {self.index_path}: {e}")
+            return None
+        if index.sheet_id != sheet_id or time.time() - index.built_at > self.index_max_age:
+            return None
+        return index
+
+    def save_index(self, index: SheetIndex):
+        if not self.index_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.index_path) or '.', exist_ok=True)
+            tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(index.to_json(), f, separators=(',', ':'))
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            logger.warning(f"Could not persist sheet index at {self.index_path}: {e}")
+
+    def _read_rows(self, sheet, index: SheetIndex) -> int:
+        """Add rows past index.indexed_rows to the index (Order ID and status columns only)"""
+        start = index.indexed_rows + 1
+        order_ids, statuses = (
+            value_range[0] if value_range else []
+            for value_range in sheet.batch_get(
+                [f"{ORDER_ID_LETTER}{start}:{ORDER_ID_LETTER}", f"{STATUS_LETTER}{start}:{STATUS_LETTER}"],
+                major_dimension='COLUMNS'
+            )
+        )
+        for offset, order_id in enumerate(order_ids):
+            if order_id:
+                index.set(order_id, start + offset, statuses[offset] if offset < len(statuses) else '')
+        index.indexed_rows = max(index.indexed_rows, start + len(order_ids) - 1)
+        return len(order_ids)
+
+    def _order_ids_at(self, sheet, rows) -> Dict[int, str]:
+        """The Order ID cell of each row, in one request"""
+        rows = sorted(rows)
+        if not rows:
+            return {}
+        found = sheet.batch_get([rowcol_to_a1(row, SHEET_ORDER_ID_COLUMN) for row in rows])
+        return {row: cells[0][0] if cells and cells[0] else '' for row, cells in zip(rows, found)}
+
+    def _changed_orders(self, index: SheetIndex):
+        """Orders on (or due on) the sheet updated since the watermark, oldest change first"""
+        orders = Order.objects.exclude(payment_screenshot_url__isnull=True).exclude(payment_screenshot_url='')
+        if index.watermark is not None:
+            orders = orders.filter(updated_at__gt=index.watermark - self.overlap)
+        return orders.order_by('updated_at', 'id')
+
+    def reconcile(self, full: bool = False) -> Dict:
+        """One reconciliation pass; returns what it read and wrote"""
+        with self._lock:
+            return self._reconcile(full)
+
+    def _reconcile(self, full: bool) -> Dict:
+        sheet = open_order_sheet()
+        if sheet is None:
+            raise RuntimeError('Google Sheet is not configured')
+
+        # Snapshot the outbox before reading the sheet: an append the flusher makes
+        # after this point is either in the rows read below or still queued here
+        queued = set(
+            SheetOutbox.objects.filter(kind='append', status__in=['pending', 'processing'])
+            .values_list('order_id', flat=True)
+        )
+
+        sheet_id = settings.GOOGLE_SHEET_ID
+        index = None if full else self.load_index(sheet_id)
+        rebuilt = index is None
+        if rebuilt:
+            index = SheetIndex(sheet_id)
+        new_rows = self._read_rows(sheet, index)
+
+        scanned = 0
+        missing = []
+        cells = {}
+        targets = {}
+        unindexed = {}
+        fixes = []
+        newest = index.watermark
+        held = None
+        held_count = 0
+        for order in self._changed_orders(index).iterator():
+            scanned += 1
+            if order.pk in queued:
+                held = order.updated_at if held is None else min(held, order.updated_at)
+                held_count += 1
+                continue
+            newest = order.updated_at if newest is None else max(newest, order.updated_at)
+
+            entry = index.rows.get(order.order_id)
+            if entry is None:
+                # Only orders that were never appended are appended; one with a row
+                # number may have landed after the sheet was read, so check its row
+                if order.sheet_row_number is None:
+                    missing.append(order)
+                else:
+                    unindexed[order.sheet_row_number] = order
+                continue
+            row, status = entry
+            if status != order.status.title():
+                cells[row] = order
+                targets[row] = order.order_id
+            if order.sheet_row_number != row:
+                order.sheet_row_number = row
+                fixes.append(order)
+
+        found = self._order_ids_at(sheet, set(targets) | set(unindexed))
+        if any(found[row] != order_id for row, order_id in targets.items()):
+            if full:
+                raise RuntimeError('Order sheet rows changed while reconciling; try again')
+            # Rows were sorted or deleted by hand since the index was built
+            logger.warning("Order sheet rows moved; rebuilding the sheet index")
+            return self._reconcile(full=True)
+
+        unlocated = 0
+        for row, order in unindexed.items():
+            if found[row] == order.order_id:
+                # Its status on the sheet is unknown, so write it
+                cells[row] = order
+            elif not full:
+                logger.warning(f"Order {order.order_id} is not at sheet row {row}; rebuilding the sheet index")
+                return self._reconcile(full=True)
+            else:
+                # Not on the sheet at its recorded row nor anywhere else: leave it to a human
+                logger.warning(f"Order {order.order_id} is not on the order sheet (recorded row {row})")
+                unlocated += 1
+
+        if missing:
+            response = sheet_syncer.write(
+                sheet.append_rows, [order_sheet_row(order) for order in missing], table_range='A1'
+            )
+            first_row = appended_row_number(response)
+            if first_row is None:
+                raise RuntimeError('values.append response has no updatedRange')
+            for offset, order in enumerate(missing):
+                order.sheet_row_number = first_row + offset
+                index.set(order.order_id, order.sheet_row_number, order.status.title())
+            fixes.extend(missing)
+
+        if cells:
+            sheet_syncer.write(sheet.batch_update, [
+                {'range': rowcol_to_a1(row, SHEET_STATUS_COLUMN), 'values': [[order.status.title()]]}
+                for row, order in sorted(cells.items())
+            ])
+            for row, order in cells.items():
+                index.set(order.order_id, row, order.status.title())
+
+        if fixes:
+            # bulk_update leaves updated_at alone, so these don't come back next run
+            Order.objects.bulk_update(fixes, ['sheet_row_number'])
+
+        # Orders held for the outbox are looked at again next run
+        if held is not None:
+            held -= timedelta(microseconds=1)
+            newest = held if newest is None else min(newest, held)
+        index.watermark = newest
+        if rebuilt or new_rows or scanned:
+            self.save_index(index)
+
+        return {
+            'rebuilt_index': rebuilt,
+            'rows_read': new_rows,
+            'orders_scanned': scanned,
+            'appended': len(missing),
+            'status_cells': len(cells),
+            'row_numbers_fixed': len(fixes) - len(missing),
+            'held_for_outbox': held_count,
+            'unlocated': unlocated,
+            'watermark': index.watermark.isoformat() if index.watermark else None,
+        }
+
+
+# Global sheet reconciler instance
+sheet_reconciler = SheetReconciler(
+    index_path=settings.SHEET_INDEX_PATH,
+    index_max_age=settings.SHEET_INDEX_MAX_AGE,
+    overlap=settings.SHEET_RECONCILE_OVERLAP
+)
@@ -0,0 +1,327 @@
+"""
+Write-behind Google Sheet sync for EeOnam
+With SHEET_SYNC_MODE=outbox the payment step and the verify/reject links only
+record SheetOutbox rows and never wait on Google. The run_sheet_sync flusher
+picks up whatever queued up during its flush window, writes all new order rows
+with one values.append call and all status changes with one batch_update, paced
+by a token bucket under the Sheets write quota, and stores the new row numbers
+with one bulk update.
+"""
+
+import logging
+import random
+import threading
+import time
+from datetime import timedelta
+from typing import Dict, List
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+from gspread.utils import rowcol_to_a1
+
+from .google_client import google_client
+from .models import Order, SheetOutbox
+from .utils import (
+    SHEET_ORDER_ID_COLUMN,
+    SHEET_STATUS_COLUMN,
+    appended_row_number,
+    open_order_sheet,
+    order_sheet_row,
+    save_to_google_sheet,
+    update_sheet_verification_status
+)
+
+logger = logging.getLogger(__name__)
+
+
+def is_quota_error(error: Exception) -> bool:
+    """True for a Sheets API 429 (per-minute quota exceeded)"""
+    response = getattr(error, 'response', None)
+    return getattr(response, 'status_code', None) == 429
+
+
+class TokenBucket:
+    """Blocking token bucket: `rate` tokens per second, bursts of up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take one token, sleeping until one is available; returns the seconds waited"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+class SheetSyncer:
+    """Claims outbox rows in batches and writes them to the order sheet"""
+
+    def __init__(self, batch_size: int, max_attempts: int, lease_seconds: int, bucket: TokenBucket,
+                 quota_retries: int = 3):
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.bucket = bucket
+        self.quota_retries = quota_retries
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.flushes = 0
+        self.appended = 0
+        self.coalesced = 0
+        self.failures = 0
+        self.throttled = 0
+        self.throttle_seconds = 0.0
+        self.quota_retried = 0
+        self.status_calls = 0
+        self.status_events = 0
+        self.status_cells = 0
+        self.last_status_batch = 0
+
+    def _count(self, counter: str, amount=1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def enqueue_append(self, order: Order) -> bool:
+        """Record a new order row for the sheet (written inline unless SHEET_SYNC_MODE=outbox)"""
+        if settings.SHEET_SYNC_MODE != 'outbox':
+            return save_to_google_sheet(order)
+        SheetOutbox.objects.create(order=order, kind='append')
+        self._count('queued')
+        return True
+
+    def enqueue_status(self, order: Order, status: str) -> bool:
+        """Record a verification status change for the sheet (written inline unless SHEET_SYNC_MODE=outbox)"""
+        if settings.SHEET_SYNC_MODE != 'outbox':
+            return update_sheet_verification_status(order, status)
+        # The flusher writes the order's status as it is then, so only the latest change lands
+        SheetOutbox.objects.create(order=order, kind='status')
+        self._count('queued')
+        return True
+
+    def _claimable(self) -> Q:
+        """Rows that are waiting, or whose flusher lease has expired"""
+        lease_expired = timezone.now() - timedelta(seconds=self.lease_seconds)
+        return Q(status='pending') | Q(status='processing', locked_at__lt=lease_expired)
+
+    def claim_batch(self) -> List[SheetOutbox]:
+        """Atomically claim up to batch_size of the oldest claimable outbox rows"""
+        candidates = list(
+            SheetOutbox.objects.filter(self._claimable()).order_by('id').values_list('id', flat=True)[:self.batch_size]
+        )
+        if not candidates:
+            return []
+
+        stamp = timezone.now()
+        SheetOutbox.objects.filter(self._claimable(), pk__in=candidates).update(
+            status='processing',
+            locked_at=stamp,
+            attempts=F('attempts') + 1
+        )
+        return list(
+            SheetOutbox.objects.filter(pk__in=candidates, status='processing', locked_at=stamp)
+            .select_related('order').order_by('id')
+        )
+
+    def write(self, method, *args, **kwargs):
+        """One Sheets write, paced by the token bucket and retried with backoff on quota errors"""
+        for attempt in range(self.quota_retries + 1):
+            waited = self.bucket.acquire()
+            if waited:
+                self._count('throttled')
+                self._count('throttle_seconds', waited)
+            try:
+                return method(*args, **kwargs)
+            except Exception as e:
+                if not is_quota_error(e) or attempt == self.quota_retries:
+                    raise
+                delay = min(2 ** attempt + random.random(), 30)
+                logger.warning(f"Sheets write quota exceeded; retrying in {delay:.1f}s")
+                self._count('quota_retried')
+                time.sleep(delay)
+
+    def _append(self, sheet, events: List[SheetOutbox]) -> Dict[int, int]:
+        """One values.append for every order in the batch not yet on the sheet; returns {order pk: row}"""
+        orders = {}
+        for event in events:
+            if event.order.sheet_row_number is None:
+                orders.setdefault(event.order_id, event.order)
+        self._count('coalesced', len(events) - len(orders))
+        orders = list(orders.values())
+        if not orders:
+            return {}
+
+        response = self.write(sheet.append_rows, [order_sheet_row(order) for order in orders], table_range='A1')
+
+        # Appended rows are contiguous from the first row named in updatedRange
+        first_row = appended_row_number(response)
+        if first_row is None:
+            column = sheet.col_values(SHEET_ORDER_ID_COLUMN)
+            rows = {order_id: index + 1 for index, order_id in enumerate(column)}
+        for offset, order in enumerate(orders):
+            order.sheet_row_number = first_row + offset if first_row else rows.get(order.order_id)
+        Order.objects.bulk_update(orders, ['sheet_row_number'])
+        self._count('appended', len(orders))
+        return {order.pk: order.sheet_row_number for order in orders}
+
+    def _update_statuses(self, sheet, events: List[SheetOutbox], appended: Dict[int, int]) -> List[SheetOutbox]:
+        """
+        One batch_update of the status cell of every changed order; returns the
+        events that could not be written because their order has no sheet row yet.
+        Orders appended in this flush already carry their current status.
+        """
+        cells = {}
+        deferred = []
+        for event in events:
+            if event.order_id in appended:
+                continue
+            if not event.order.sheet_row_number:
+                deferred.append(event)
+                continue
+            cells[event.order.sheet_row_number] = event.order.status.title()
+        self._count('coalesced', len(events) - len(deferred) - len(cells))
+        if not cells:
+            return deferred
+
+        self.write(sheet.batch_update, [
+            {'range': rowcol_to_a1(row, SHEET_STATUS_COLUMN), 'values': [[status]]}
+            for row, status in sorted(cells.items())
+        ])
+        with self._lock:
+            self.status_calls += 1
+            self.status_events += len(events) - len(deferred)
+            self.status_cells += len(cells)
+            self.last_status_batch = len(events) - len(deferred)
+        return deferred
+
+    def _defer(self, events: List[SheetOutbox]):
+        """
+        Status changes of orders that are not on the sheet yet wait for their row.
+        Waiting is not a failure: the attempt is refunded, and the rows keep their
+        lease so they come back after lease_seconds instead of being claimed again
+        ahead of newer rows on every flush.
+        """
+        logger.info(f"{len(events)} status changes wait for their order's sheet row")
+        SheetOutbox.objects.filter(pk__in=[event.pk for event in events]).update(
+            locked_at=timezone.now(), attempts=F('attempts') - 1, last_error=''
+        )
+
+    def _release(self, events: List[SheetOutbox], error: Exception):
+        """Put a failed batch back on the queue, or give up on rows out of attempts"""
+        pks = [event.pk for event in events]
+        google_client.handle_error(error)
+        if is_quota_error(error):
+            # Quota rejections say nothing about the rows; don't spend their attempts
+            SheetOutbox.objects.filter(pk__in=pks).update(
+                status='pending', locked_at=None, attempts=F('attempts') - 1, last_error=str(error)
+            )
+            return
+        SheetOutbox.objects.filter(pk__in=pks, attempts__gte=self.max_attempts).update(
+            status='failed', locked_at=None, last_error=str(error)
+        )
+        SheetOutbox.objects.filter(pk__in=pks, status='processing').update(
+            status='pending', locked_at=None, last_error=str(error)
+        )
+
+    def flush(self) -> int:
+        """Write one claimed batch to the sheet; returns the number of outbox rows written (deferred rows excluded)"""
+        events = self.claim_batch()
+        if not events:
+            return 0
+
+        try:
+            sheet = open_order_sheet()
+            if sheet is None:
+                raise RuntimeError('Google Sheet is not configured')
+            appended = self._append(sheet, [event for event in events if event.kind == 'append'])
+            deferred = self._update_statuses(sheet, [event for event in events if event.kind == 'status'], appended)
+        except Exception as e:
+            logger.error(f"Sheet sync flush of {len(events)} rows failed: {e}", exc_info=True)
+            self._count('failures')
+            self._release(events, e)
+            raise
+
+        if deferred:
+            self._defer(deferred)
+        SheetOutbox.objects.filter(pk__in=[event.pk for event in events if event not in deferred]).update(
+            status='done', processed_at=timezone.now(), last_error=''
+        )
+        self._count('flushes')
+        return len(events) - len(deferred)
+
+    def run(self, should_stop=lambda: False, interval: float = None, exit_when_empty: bool = False) -> int:
+        """Flush every interval (the coalescing window) until stopped; returns outbox rows written"""
+        if interval is None:
+            interval = settings.SHEET_SYNC_FLUSH_INTERVAL
+
+        handled = 0
+        backoff = interval
+        while not should_stop():
+            try:
+                flushed = self.flush()
+            except Exception:
+                # Back off while Google is failing, up to a minute
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 60)
+                continue
+            backoff = interval
+            handled += flushed
+
+            if flushed == self.batch_size:
+                continue
+            if exit_when_empty and not flushed:
+                break
+            time.sleep(interval)
+
+        return handled
+
+    def purge(self, older_than: timedelta) -> int:
+        """Delete written outbox rows older than the given age"""
+        cutoff = timezone.now() - older_than
+        deleted, _ = SheetOutbox.objects.filter(status='done', processed_at__lt=cutoff).delete()
+        return deleted
+
+    def stats(self) -> Dict:
+        """Counters for this process, plus the shared outbox backlog"""
+        with self._lock:
+            counters = {
+                'mode': settings.SHEET_SYNC_MODE,
+                'queued': self.queued,
+                'flushes': self.flushes,
+                'appended': self.appended,
+                'coalesced': self.coalesced,
+                'failures': self.failures,
+                'throttled': self.throttled,
+                'throttle_seconds': round(self.throttle_seconds, 3),
+                'quota_retried': self.quota_retried,
+                'status_calls': self.status_calls,
+                'status_cells': self.status_cells,
+                # Status changes folded into each batch_update
+                'status_updates_per_call': round(self.status_events / self.status_calls, 2) if self.status_calls else 0.0,
+                'last_status_batch': self.last_status_batch,
+            }
+        counters['backlog'] = SheetOutbox.objects.filter(status__in=['pending', 'processing']).count()
+        return counters
+
+
+# Global sheet syncer instance
+sheet_syncer = SheetSyncer(
+    batch_size=settings.SHEET_SYNC_BATCH_SIZE,
+    max_attempts=settings.SHEET_SYNC_MAX_ATTEMPTS,
+    lease_seconds=settings.SHEET_SYNC_LEASE_SECONDS,
+    bucket=TokenBucket(
+        rate=settings.SHEET_SYNC_WRITES_PER_MINUTE / 60,
+        capacity=settings.SHEET_SYNC_BURST
+    ),
+    quota_retries=settings.SHEET_SYNC_QUOTA_RETRIES
+)
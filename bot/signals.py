@@ -0,0 +1,22 @@
+"""
+Model signal handlers for EeOnam
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .catalog import menu_catalog
+from .models import MenuItem, UserSession
+from .session_store import session_store
+
+
+@receiver([post_save, post_delete], sender=MenuItem)
+def invalidate_menu_catalog(sender, **kwargs):
+    """Any menu change makes every process reload the catalog"""
+    menu_catalog.invalidate()
+
+
+@receiver([post_save, post_delete], sender=UserSession)
+def evict_cached_session(sender, instance, **kwargs):
+    """Writes outside the session store (admin, shell) must not leave a stale cached copy"""
+    session_store.evict(instance.phone_number)
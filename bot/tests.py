@@ -1,3 +1,966 @@
-from django.test import TestCase
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import httpx
+import numpy as np
+import qrcode
+import requests
+from PIL import Image
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.db import OperationalError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import async_services, inbound
+from .catalog import DEFAULT_MENU_ITEMS, CompiledMenu, MenuCatalog, paise_to_decimal
+from .date_window import MIN_ADVANCE_DAYS, WINDOW_DAYS, DeliveryDateWindow, delivery_dates
+from .dedup import MessageDeduplicator, message_deduplicator
+from .http_client import PooledHttpClient, backoff_delay
+from .models import InboundMessage, MenuItem, Order, SeenMessage, SheetOutbox, UserSession
+from .qr_render import ImageEncoder, build_upi_string, qr_modules, render_payment_qr
+from .qr_service import QRRenderBusy, QRRenderService
+from .qr_store import QRImageStore
+from .services import EeOnamBot
+from .session_store import SessionStore, session_store
+from .sheet_reconcile import SheetReconciler
+from .sheet_sync import SheetSyncer, TokenBucket
+from .utils import appended_row_number, save_to_google_sheet
+
+
+def http_response(status, headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    response.raw = io.BytesIO(b'')
+    return response
+
+
+def fake_whatsapp():
+    whatsapp = mock.Mock()
+    for name in ('send_message', 'send_interactive_message', 'send_list_message', 'send_image'):
+        getattr(whatsapp, name).return_value = True
+    whatsapp.send_group.side_effect = lambda payloads: [True] * len(payloads)
+    return whatsapp
+
+
+def webhook_payload(*messages):
+    return {'entry': [{'changes': [{'value': {'messages': list(messages)}}]}]}
+
+
+def text_message(message_id, phone):
+    return {'id': message_id, 'from': phone, 'type': 'text', 'text': {'body': 'hi'}}
+
+
+class QueueTestCase(TestCase):
+
+    def tearDown(self):
+        # The deduplicator's in-process cache outlives each test's rolled-back transaction
+        message_deduplicator.forget(SeenMessage.objects.values_list('message_id', flat=True))
+
+    def enqueue(self, *messages):
+        return inbound.enqueue_webhook_payload(webhook_payload(*messages))
+
+
+class InboundQueueTests(QueueTestCase):
+
+    @override_settings(WEBHOOK_PROCESSING_MODE='queue')
+    def test_webhook_acknowledges_and_queues(self):
+        with mock.patch.object(inbound, 'process_inbound_message') as process:
+            response = self.client.post(
+                '/webhook/', json.dumps(webhook_payload(text_message('wamid.a1', '911'))),
+                content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 200)
+        process.assert_not_called()
+        self.assertEqual(InboundMessage.objects.get().status, 'pending')
+
+    def test_expired_lease_is_claimed_again(self):
+        self.enqueue(text_message('wamid.a2', '911'))
+        item = inbound.claim_next_message()
+        self.assertIsNone(inbound.claim_next_message())
+        InboundMessage.objects.filter(pk=item.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+        again = inbound.claim_next_message()
+        self.assertEqual(again.pk, item.pk)
+        self.assertEqual(again.attempts, 2)
+
+    def test_processed_message_is_done(self):
+        self.enqueue(text_message('wamid.a3', '911'))
+        with mock.patch.object(inbound.EeOnamBot, 'process_message'):
+            self.assertEqual(inbound.drain_queue(exit_when_empty=True, poll_interval=0), 1)
+        self.assertEqual(InboundMessage.objects.get().status, 'done')
+
+    @override_settings(WEBHOOK_QUEUE_MAX_ATTEMPTS=2)
+    def test_failing_message_is_retried_then_failed(self):
+        self.enqueue(text_message('wamid.a4', '911'))
+        with mock.patch.object(inbound.EeOnamBot, 'process_message', side_effect=RuntimeError('bot broke')), \
+                mock.patch.object(inbound.WhatsAppService, 'send_message', return_value=True) as apology:
+            self.assertEqual(inbound.drain_queue(exit_when_empty=True, poll_interval=0), 2)
+        item = InboundMessage.objects.get()
+        self.assertEqual((item.status, item.attempts, item.last_error), ('failed', 2, 'bot broke'))
+        apology.assert_called_once()
+
+    def test_drain_survives_database_errors(self):
+        claims = [OperationalError('connection lost'), None]
+        with mock.patch.object(inbound, 'claim_next_message', side_effect=claims), \
+                mock.patch.object(inbound, 'close_old_connections'):
+            self.assertEqual(inbound.drain_queue(exit_when_empty=True, poll_interval=0), 0)
+
+
+class WorkerLaneTests(QueueTestCase):
+
+    def test_claim_keeps_each_phone_in_order(self):
+        self.enqueue(text_message('wamid.b1', '911'), text_message('wamid.b2', '911'), text_message('wamid.b3', '922'))
+        first = inbound.claim_next_message()
+        second = inbound.claim_next_message()
+        self.assertEqual((first.message_id, second.message_id), ('wamid.b1', 'wamid.b3'))
+        # 911's second message waits until its first is finished
+        self.assertIsNone(inbound.claim_next_message())
+
+    def test_lanes_only_claim_their_own_phones(self):
+        phones = [f"9190000{n:05d}" for n in range(8)]
+        self.enqueue(*(text_message(f"wamid.b{n + 10}", phone) for n, phone in enumerate(phones)))
+        for lane in range(3):
+            claimed = []
+            while (item := inbound.claim_next_message(lane, 3)) is not None:
+                claimed.append(item.phone_number)
+            self.assertEqual(claimed, [phone for phone in phones if inbound.lane_for_phone(phone, 3) == lane])
+
+    def test_lane_is_stable_across_processes(self):
+        self.assertEqual(inbound.shard_key_for_phone('919876543210'), 2078705381)
+
+
+class DeduplicationTests(QueueTestCase):
+
+    def test_redelivery_is_queued_once(self):
+        self.assertEqual(self.enqueue(text_message('wamid.c1', '911')), 1)
+        self.assertEqual(self.enqueue(text_message('wamid.c1', '911')), 0)
+        self.assertEqual(InboundMessage.objects.count(), 1)
+
+    def test_failed_enqueue_does_not_mark_message_seen(self):
+        with mock.patch.object(InboundMessage.objects, 'bulk_create', side_effect=OperationalError('disk full')):
+            with self.assertRaises(OperationalError):
+                self.enqueue(text_message('wamid.c2', '911'))
+        self.assertFalse(SeenMessage.objects.filter(message_id='wamid.c2').exists())
+        self.assertEqual(self.enqueue(text_message('wamid.c2', '911')), 1)
+
+    def test_other_process_seen_ids_come_from_the_table(self):
+        # A second process has its own empty LRU; the SeenMessage primary key still catches the id
+        other = MessageDeduplicator(max_entries=10, ttl=timedelta(days=1))
+        self.assertFalse(message_deduplicator.is_duplicate('wamid.c3'))
+        self.assertTrue(other.is_duplicate('wamid.c3'))
+
+    def test_lru_is_bounded(self):
+        dedup = MessageDeduplicator(max_entries=2, ttl=timedelta(days=1))
+        for message_id in ('wamid.c4', 'wamid.c5', 'wamid.c6'):
+            dedup.is_duplicate(message_id)
+        self.assertEqual(dedup.stats()['cached_ids'], 2)
+        self.assertTrue(dedup.is_duplicate('wamid.c4'))
+
+    def test_prune_drops_expired_ids(self):
+        SeenMessage.objects.create(message_id='wamid.c7', seen_at=timezone.now() - timedelta(days=8))
+        SeenMessage.objects.create(message_id='wamid.c8')
+        self.assertEqual(MessageDeduplicator(max_entries=10, ttl=timedelta(days=7)).prune(), 1)
+        self.assertEqual(list(SeenMessage.objects.values_list('message_id', flat=True)), ['wamid.c8'])
+
+
+@mock.patch('bot.http_client.time.sleep')
+class PooledHttpClientTests(TestCase):
+
+    def setUp(self):
+        self.http = PooledHttpClient(max_retries=2, backoff_base=0.5, backoff_max=8.0)
+
+    def send(self, *outcomes):
+        with mock.patch.object(requests.Session, 'request', side_effect=outcomes) as request:
+            try:
+                return self.http.post('https://graph.test/messages', json={}), request
+            except Exception as e:
+                e.request_mock = request
+                raise
+
+    def test_retries_throttling_and_server_errors(self, sleep):
+        response, request = self.send(http_response(503), http_response(429, {'Retry-After': '3'}), http_response(200))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(request.call_count, 3)
+        self.assertEqual(sleep.call_args_list[1], mock.call(3.0))
+
+    def test_gives_up_after_the_retry_budget(self, sleep):
+        response, request = self.send(http_response(502), http_response(502), http_response(502))
+        self.assertEqual(response.status_code, 502)
+        self.assertEqual(request.call_count, 3)
+
+    def test_client_errors_are_not_retried(self, sleep):
+        response, request = self.send(http_response(400))
+        self.assertEqual((response.status_code, request.call_count), (400, 1))
+        sleep.assert_not_called()
+
+    def test_connection_errors_are_retried(self, sleep):
+        response, request = self.send(requests.exceptions.ConnectionError('refused'), http_response(200))
+        self.assertEqual((response.status_code, request.call_count), (200, 2))
+
+    def test_read_timeouts_are_not_retried(self, sleep):
+        with self.assertRaises(requests.exceptions.ReadTimeout) as raised:
+            self.send(requests.exceptions.ReadTimeout('slow'), http_response(200))
+        self.assertEqual(raised.exception.request_mock.call_count, 1)
+
+    def test_requests_get_the_default_timeouts(self, sleep):
+        _, request = self.send(http_response(200))
+        self.assertEqual(request.call_args.kwargs['timeout'], self.http.timeout)
+
+    def test_session_is_recreated_after_fork(self, sleep):
+        session = self.http.session
+        self.assertIs(self.http.session, session)
+        with mock.patch('bot.http_client.os.getpid', return_value=-1):
+            self.assertIsNot(self.http.session, session)
+
+    def test_backoff_is_capped(self, sleep):
+        self.assertEqual(backoff_delay(0, '120', 0.5, 8.0), 8.0)
+        self.assertTrue(all(0 <= backoff_delay(10, None, 0.5, 8.0) <= 8.0 for _ in range(50)))
+
+
+class AsyncPipelineTests(TestCase):
+
+    def run_bot_with(self, handler, messages):
+        with mock.patch.object(async_services, 'process_inbound_message', side_effect=handler):
+            async_to_sync(async_services.aprocess_webhook_messages)(messages)
+
+    def test_phones_run_concurrently_and_each_phone_in_order(self):
+        lock = threading.Lock()
+        running, seen = set(), []
+        overlap = []
+
+        def handler(message, whatsapp):
+            with lock:
+                overlap.append(len(running))
+                running.add(message['id'])
+            time.sleep(0.05)
+            with lock:
+                running.discard(message['id'])
+                seen.append((message['from'], message['id'], threading.current_thread().name))
+
+        messages = [text_message(f"wamid.e{n}", phone) for n, phone in enumerate(['911', '922', '911', '933'])]
+        self.run_bot_with(handler, messages)
+        self.assertGreater(max(overlap), 0)
+        self.assertEqual([message_id for phone, message_id, _ in seen if phone == '911'], ['wamid.e0', 'wamid.e2'])
+        self.assertTrue(all(name.startswith('async-bot') for _, _, name in seen))
+
+    def test_bot_threads_are_sized_by_the_setting(self):
+        self.assertEqual(async_services.bot_executor()._max_workers, settings.ASYNC_BOT_THREADS)
+
+    def test_bot_sees_the_real_send_result_from_the_event_loop(self):
+        results = []
+        send_threads = []
+
+        async def make_request(payload):
+            send_threads.append(threading.current_thread())
+            return payload['to'] == '922'
+
+        def handler(message, whatsapp):
+            results.append(whatsapp.send_message(message['from'], 'hello'))
+
+        with mock.patch.object(async_services.async_whatsapp, '_make_request', side_effect=make_request):
+            self.run_bot_with(handler, [text_message('wamid.e5', '911')])
+            self.run_bot_with(handler, [text_message('wamid.e6', '922')])
+        self.assertEqual(results, [False, True])
+        self.assertFalse(send_threads[0].name.startswith('async-bot'))
+
+
+class AsyncWhatsAppServiceTests(TestCase):
+
+    def send(self, *outcomes):
+        calls = []
+
+        def handler(request):
+            outcome = outcomes[len(calls)]
+            calls.append(request)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return httpx.Response(outcome, json={'messages': []})
+
+        async def run():
+            service = async_services.AsyncWhatsAppService()
+            client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            service._client = lambda: client
+            with mock.patch('bot.async_services.asyncio.sleep', new=mock.AsyncMock()):
+                try:
+                    return await service.send_message('911', 'hello')
+                finally:
+                    await client.aclose()
+
+        return async_to_sync(run)(), len(calls)
+
+    def test_connect_errors_and_server_errors_are_retried(self):
+        self.assertEqual(self.send(httpx.ConnectError('refused'), 503, 200), (True, 3))
+
+    def test_client_errors_fail_without_retry(self):
+        self.assertEqual(self.send(400), (False, 1))
+
+    def test_read_timeouts_are_not_retried(self):
+        self.assertEqual(self.send(httpx.ReadTimeout('slow'), 200), (False, 1))
+
+
+class MenuCatalogTests(TestCase):
+
+    def setUp(self):
+        self.veg = MenuItem.objects.create(name='Veg Sadhya', price=150, sort_order=1)
+        self.payasam = MenuItem.objects.create(name='Palada Pradhaman', price=40, sort_order=3)
+
+    def prices(self, catalog):
+        return {item['name']: item['price'] for item in catalog.items().values()}
+
+    def test_edit_in_one_process_reaches_the_others_without_a_shared_cache(self):
+        # Two catalogs stand in for two worker processes; the save's signal reaches neither
+        first, second = (MenuCatalog(check_interval=0, shared_cache=False) for _ in range(2))
+        self.assertEqual(self.prices(first), self.prices(second))
+
+        self.veg.price = 175
+        self.veg.save()
+        self.assertEqual(self.prices(first)['Veg Sadhya'], 175.0)
+        self.assertEqual(self.prices(second)['Veg Sadhya'], 175.0)
+
+        self.payasam.delete()
+        self.assertNotIn('Palada Pradhaman', self.prices(second))
+        MenuItem.objects.create(name='Pal Payasam', price=45, sort_order=3)
+        self.assertIn('Pal Payasam', self.prices(first))
+
+    def test_hidden_item_leaves_every_process(self):
+        catalog = MenuCatalog(check_interval=0, shared_cache=False)
+        catalog.items()
+        self.payasam.is_available = False
+        self.payasam.save()
+        self.assertEqual(list(self.prices(catalog)), ['Veg Sadhya'])
+
+    def test_shared_cache_stamp_reloads_other_processes(self):
+        first, second = (MenuCatalog(check_interval=0, shared_cache=True) for _ in range(2))
+        second.items()
+        MenuItem.objects.filter(pk=self.veg.pk).update(price=160)
+        first.invalidate()
+        self.assertEqual(self.prices(second)['Veg Sadhya'], 160.0)
+
+    def test_current_catalog_costs_no_queries(self):
+        catalog = MenuCatalog(check_interval=60, shared_cache=False)
+        catalog.items()
+        with self.assertNumQueries(0):
+            catalog.items()
+            catalog.compiled()
+
+
+# Prices and names hard-coded in EeOnamBot before the compiled menu
+LEGACY_PRICES = {1: 150, 2: 200, 3: 40, 4: 40, 5: 30, 6: 30}
+LEGACY_NAMES = {
+    1: 'Veg Sadhya', 2: 'Non-Veg Sadhya', 3: 'Palada Pradhaman',
+    4: 'Parippu/Gothambu Payasam', 5: 'Kaaya Varuthathu', 6: 'Sharkkaravaratti'
+}
+ORDER_TEXTS = [
+    '1 x 2, 3 x 1', '1x2', '2*3', '6 X 1, 6 x 2', '4 * 1, 5 x 0, 7 x 1, 0 x 3', 'two sadhya', '',
+    '1 x 2, 2 x 1, 3 x 1, 4 x 1, 5 x 1, 6 x 1', ' 3x1 , 1 x 10',
+]
+
+
+class CompiledMenuTests(TestCase):
+
+    def assert_matches_legacy(self, menu):
+        for text in ORDER_TEXTS:
+            selected = menu.parse_order(text)
+            expected = {}
+            for number, quantity in ((int(a), int(b)) for a, b in re.findall(r'(\d+)\s*[x*]\s*(\d+)', text, re.I)):
+                if number in LEGACY_PRICES and quantity > 0:
+                    expected[number] = expected.get(number, 0) + quantity
+            self.assertEqual(selected, expected, text)
+
+            total, lines = menu.total(selected, delivery_fee_paise=5000)
+            legacy_total = sum(LEGACY_PRICES[n] * q for n, q in expected.items()) + 50
+            self.assertEqual(paise_to_decimal(total), Decimal(legacy_total))
+            self.assertEqual(lines, [
+                f"• {LEGACY_NAMES[n]} x {q} = ₹{LEGACY_PRICES[n] * q}" for n, q in expected.items()
+            ] + ["• Delivery Fee = ₹50"])
+            self.assertEqual(
+                menu.describe({str(n): q for n, q in selected.items()}),
+                ', '.join(f"{LEGACY_NAMES[n]} x {q}" for n, q in expected.items())
+            )
+
+    def test_default_menu_prices_match_the_old_hard_coded_ones(self):
+        self.assert_matches_legacy(CompiledMenu.from_rows(DEFAULT_MENU_ITEMS))
+
+    def seed(self):
+        # The ids `initialize_bot` gives the default menu on a fresh database
+        for number, row in enumerate(DEFAULT_MENU_ITEMS, start=1):
+            MenuItem.objects.create(id=number, **row)
+
+    def test_seeded_menu_prices_match_the_old_hard_coded_ones(self):
+        self.seed()
+        self.assert_matches_legacy(MenuCatalog(check_interval=0, shared_cache=False).compiled())
+
+    def test_stored_numbers_survive_menu_edits(self):
+        self.seed()
+        catalog = MenuCatalog(check_interval=0, shared_cache=False)
+        stored = json.loads('{"3": 1, "5": 2}')
+        before = catalog.compiled().describe(stored)
+
+        aviyal = MenuItem.objects.create(name='Aviyal', price=60, sort_order=0)
+        MenuItem.objects.filter(name='Veg Sadhya').update(sort_order=9)
+        MenuItem.objects.get(name='Non-Veg Sadhya').save()
+        menu = catalog.compiled()
+
+        self.assertEqual(menu.describe(stored), before)
+        self.assertEqual(menu.parse_order('3 x 1'), {3: 1})
+        self.assertEqual(menu.total({3: 1})[0], 4000)
+        # Listed first, under its own id
+        self.assertEqual((menu.entries[0].number, menu.entries[0].name), (aviyal.pk, 'Aviyal'))
+
+    def test_hidden_item_cannot_be_ordered_but_still_describes_orders(self):
+        self.seed()
+        MenuItem.objects.filter(name='Palada Pradhaman').update(is_available=False)
+        menu = CompiledMenu.from_rows(MenuItem.objects.values('id', 'name', 'price', 'is_available', 'sort_order'))
+        self.assertEqual(menu.parse_order('3 x 1, 1 x 1'), {1: 1})
+        self.assertEqual(menu.describe({'3': 1}), 'Palada Pradhaman x 1')
+        self.assertEqual(menu.numbers_text, '1, 2, 4, 5, 6')
+        self.assertNotIn('Palada', menu.menu_lines)
+
+    def test_exact_paise_totals(self):
+        menu = CompiledMenu.from_rows([{'id': 11, 'name': 'Ada', 'price': Decimal('40.50')}])
+        total, lines = menu.total(menu.parse_order('11 x 3'))
+        self.assertEqual((total, paise_to_decimal(total)), (12150, Decimal('121.50')))
+        self.assertEqual(lines, ['• Ada x 3 = ₹121.50'])
+
+
+class SessionWriteTests(TestCase):
+
+    def session_writes(self, **message):
+        bot = EeOnamBot(whatsapp=fake_whatsapp())
+        with CaptureQueriesContext(connection) as queries:
+            bot.process_message('919999900000', **message)
+        return [
+            query['sql'] for query in queries.captured_queries
+            if 'bot_usersession' in query['sql'] and query['sql'].startswith(('INSERT', 'UPDATE'))
+        ]
+
+    def test_each_message_writes_the_session_once(self):
+        writes = self.session_writes(message_text='hi')
+        self.assertEqual(len(writes), 1)
+        self.assertTrue(writes[0].startswith('INSERT'))
+
+        day = delivery_dates.current().dates[0]
+        writes = self.session_writes(
+            message_type='interactive', interactive_data={'button_reply': {'id': f"date_{day:%Y-%m-%d}"}}
+        )
+        self.assertEqual(len(writes), 1)
+        session = UserSession.objects.get()
+        self.assertEqual((session.current_step, session.selected_date), ('junction_selection', day))
+
+    def test_only_changed_columns_are_written(self):
+        session, _ = session_store.load('919999900001')
+        session_store.flush(session)
+        session, _ = session_store.load('919999900001')
+        session.selected_junction = 'pickup'
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(session_store.flush(session))
+        update = queries.captured_queries[-1]['sql']
+        self.assertIn('"selected_junction"', update)
+        self.assertNotIn('"current_step"', update)
+
+    def test_untouched_session_is_not_written(self):
+        session, _ = session_store.load('919999900002')
+        session_store.flush(session)
+        session, created = session_store.load('919999900002')
+        self.assertFalse(created)
+        with self.assertNumQueries(0):
+            self.assertFalse(session_store.flush(session))
+
+
+class SessionCacheTests(TestCase):
+
+    def setUp(self):
+        self.store = SessionStore(cache_enabled=True, cache_timeout=60)
+        self.phone = '919999900010'
+        session, _ = self.store.load(self.phone)
+        session.current_step = 'date_selection'
+        self.store.flush(session)
+
+    def tearDown(self):
+        self.store.evict(self.phone)
+
+    def test_warm_session_is_read_without_a_query(self):
+        reads = self.store.stats()['db_reads']
+        with self.assertNumQueries(0):
+            session, created = self.store.load(self.phone)
+        self.assertEqual((session.current_step, created), ('date_selection', False))
+        self.assertEqual(self.store.stats()['db_reads'], reads)
+
+    def test_stale_copy_does_not_overwrite_newer_row(self):
+        stale, _ = self.store.load(self.phone)
+        other = UserSession.objects.get(phone_number=self.phone)
+        other.current_step = 'junction_selection'
+        self.assertTrue(SessionStore(cache_enabled=False, cache_timeout=0).flush(other))
+
+        stale.current_step = 'start'
+        self.assertFalse(self.store.flush(stale))
+        self.assertEqual(UserSession.objects.get(phone_number=self.phone).current_step, 'junction_selection')
+        self.assertEqual(self.store.stats()['conflicts'], 1)
+        # The stale cached copy was evicted, so the next message reads the newer row
+        session, _ = self.store.load(self.phone)
+        self.assertEqual(session.current_step, 'junction_selection')
+
+    def test_concurrent_first_message_keeps_the_existing_row(self):
+        duplicate = UserSession(phone_number=self.phone, current_step='start')
+        self.assertFalse(self.store.flush(duplicate))
+        self.assertEqual(UserSession.objects.get(phone_number=self.phone).current_step, 'date_selection')
+
+    def test_writes_outside_the_store_evict_the_cached_copy(self):
+        with mock.patch('bot.signals.session_store', self.store):
+            UserSession.objects.get(phone_number=self.phone).save()
+        with self.assertNumQueries(1):
+            self.store.load(self.phone)
+
+
+class DeliveryDateWindowTests(TestCase):
+
+    def at(self, *utc):
+        return mock.patch('django.utils.timezone.now', return_value=datetime(*utc, tzinfo=dt_timezone.utc))
+
+    def test_window_rolls_over_at_local_midnight(self):
+        window = DeliveryDateWindow()
+        # 18:29 UTC is 23:59 in Asia/Kolkata; 18:31 UTC is already the next local day
+        with self.at(2025, 8, 20, 18, 29):
+            before = window.current()
+            self.assertIs(window.current(), before)
+        with self.at(2025, 8, 20, 18, 31):
+            after = window.current()
+
+        self.assertEqual((before.day, after.day), (date(2025, 8, 20), date(2025, 8, 21)))
+        self.assertEqual(before.dates[0], date(2025, 8, 20) + timedelta(days=MIN_ADVANCE_DAYS))
+        self.assertEqual(after.dates[0], date(2025, 8, 21) + timedelta(days=MIN_ADVANCE_DAYS))
+        self.assertEqual(after.buttons[0]['reply']['id'], f"date_{after.dates[0]:%Y-%m-%d}")
+
+    def test_membership_covers_exactly_the_bookable_days(self):
+        with self.at(2025, 8, 20, 6, 0):
+            window = DeliveryDateWindow().current()
+        first = date(2025, 8, 20) + timedelta(days=MIN_ADVANCE_DAYS)
+        self.assertEqual(len(window.dates), WINDOW_DAYS)
+        self.assertIn(first, window)
+        self.assertIn(first + timedelta(days=WINDOW_DAYS - 1), window)
+        self.assertNotIn(first - timedelta(days=1), window)
+        self.assertNotIn(first + timedelta(days=WINDOW_DAYS), window)
+
+
+class QRMatrixTests(TestCase):
+
+    def test_vectorized_mask_choice_matches_qrcode(self):
+        # VectorizedQRCode overrides qrcode internals (map_data, best_mask_pattern): this pins
+        # its output to the installed qrcode release (verified on the one in requirements.txt)
+        cases = [(350, 'EO-20250820-0001'), (1049.5, 'EO-20250820-ABCD'), (700, None)]
+        cases += [(150 + n % 7 * 50, f"EO-20250901-{n:04X}") for n in range(40)]
+        for amount, order_id in cases:
+            upi_string = build_upi_string(amount, order_id)
+            reference = qrcode.QRCode(version=3, error_correction=qrcode.constants.ERROR_CORRECT_H, border=6)
+            reference.add_data(upi_string)
+            reference.make(fit=True)
+            self.assertTrue(
+                np.array_equal(np.array(reference.get_matrix(), dtype=bool), qr_modules(upi_string)), upi_string
+            )
+
+
+def scratch_dir(test):
+    directory = tempfile.mkdtemp(prefix='eeonam-test-')
+    test.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+    return directory
+
+
+def create_order(order_id, **fields):
+    values = {
+        'order_id': order_id, 'phone_number': '919000000000', 'delivery_date': timezone.localdate(),
+        'junction': 'pickup', 'items': '{"1": 2}', 'total_amount': Decimal(700),
+        'payment_screenshot_url': 'https://res.cloudinary.test/x.jpg',
+    }
+    values.update(fields)
+    return Order.objects.create(**values)
+
+
+class QRImageStoreTests(TestCase):
+
+    def setUp(self):
+        self.store = QRImageStore(directory=scratch_dir(self), max_bytes=250)
+
+    def test_identical_images_are_stored_once(self):
+        first = self.store.store(350.0, 'EO-1', b'x' * 100)
+        second = self.store.store(350.0, None, b'x' * 100)
+        self.assertEqual(first, second)
+        self.assertEqual((self.store.lookup(350.0, 'EO-1'), self.store.lookup(350.0, None)), (first, first))
+        self.assertIsNone(self.store.lookup(400.0, 'EO-1'))
+        self.assertEqual(self.store.read(first), b'x' * 100)
+
+    def test_least_recently_used_images_are_evicted(self):
+        old = self.store.store(100.0, 'EO-1', b'a' * 100)
+        older = self.store.store(200.0, 'EO-2', b'b' * 100)
+        os.utime(self.store._object_path(old), (1000, 1000))
+        os.utime(self.store._object_path(older), (500, 500))
+        self.store.store(300.0, 'EO-3', b'c' * 100)
+        self.assertIsNotNone(self.store.lookup(100.0, 'EO-1'))
+        self.assertIsNone(self.store.lookup(200.0, 'EO-2'))
+        self.assertEqual(self.store.stats()['evictions'], 1)
+
+    def test_render_happens_once(self):
+        with mock.patch('bot.qr_service.qr_render_service.render_image', return_value=b'png') as render:
+            self.assertEqual(self.store.get_or_render(350.0, 'EO-1')[1], b'png')
+            self.assertEqual(self.store.get_or_render(350.0, 'EO-1')[1], b'png')
+        render.assert_called_once_with(350.0, 'EO-1')
+
+
+class PaymentQRImageViewTests(TestCase):
+
+    def setUp(self):
+        create_order('EO-Q-1', total_amount=Decimal(350))
+        store = QRImageStore(directory=scratch_dir(self), max_bytes=1 << 20)
+        patcher = mock.patch('bot.views.qr_image_store', store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, path, **headers):
+        with mock.patch('bot.qr_service.qr_render_service.render_image', return_value=b'\x89PNG image') as render:
+            return self.client.get(path, **headers), render
+
+    def test_image_is_served_with_etag_and_revalidated_without_rendering(self):
+        response, render = self.get('/qr/EO-Q-1.png')
+        self.assertEqual((response.status_code, response['Content-Type']), (200, 'image/png'))
+        self.assertEqual(response.content, b'\x89PNG image')
+        self.assertIn('max-age', response['Cache-Control'])
+        render.assert_called_once()
+
+        response, render = self.get('/qr/EO-Q-1.png', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        render.assert_not_called()
+
+    def test_unknown_order(self):
+        self.assertEqual(self.get('/qr/EO-NOPE.png')[0].status_code, 404)
+
+    def test_link_in_another_format_redirects(self):
+        response, _ = self.get('/qr/EO-Q-1.jpg')
+        self.assertEqual((response.status_code, response['Location']), (301, '/qr/EO-Q-1.png'))
+
+    @mock.patch('bot.views.qr_render_service.submit_timeout', 2.5)
+    def test_busy_renderer_answers_503_with_retry_after(self):
+        with mock.patch('bot.qr_service.qr_render_service.render_image', side_effect=QRRenderBusy('busy')):
+            response = self.client.get('/qr/EO-Q-1.png')
+        self.assertEqual((response.status_code, response['Retry-After']), (503, '3'))
+
+
+class QRRenderServiceTests(TestCase):
+
+    def test_callers_beyond_the_bound_get_busy(self):
+        service = QRRenderService(workers=0, max_pending=1, submit_timeout=0.01, render_timeout=1)
+        service._acquire()
+        with self.assertRaises(QRRenderBusy):
+            service.render_image(350.0, 'EO-1')
+        self.assertEqual(service.stats()['rejected'], 1)
+
+
+class ImageEncoderTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.canvas = render_payment_qr(350.0, 'EO-20250820-0001').convert('RGB')
+
+    def decode(self, data):
+        image = Image.open(io.BytesIO(data))
+        image.load()
+        return np.asarray(image.convert('RGB'))
+
+    def test_small_png_is_padded_to_the_floor_without_changing_pixels(self):
+        plain = ImageEncoder('png', min_bytes=0).encode(self.canvas)
+        padded = ImageEncoder('png', min_bytes=len(plain) + 5000).encode(self.canvas)
+        self.assertGreaterEqual(len(padded), len(plain) + 5000)
+        self.assertTrue(np.array_equal(self.decode(padded), self.decode(plain)))
+
+    def test_png_above_the_floor_is_untouched(self):
+        plain = ImageEncoder('png', min_bytes=0).encode(self.canvas)
+        self.assertEqual(ImageEncoder('png', min_bytes=len(plain) - 1).encode(self.canvas), plain)
+
+    def test_small_jpeg_is_padded_to_the_floor_without_changing_pixels(self):
+        plain = ImageEncoder('jpeg', min_bytes=0).encode(self.canvas)
+        padded = ImageEncoder('jpeg', min_bytes=len(plain) + 70000).encode(self.canvas)
+        self.assertGreaterEqual(len(padded), len(plain) + 70000)
+        self.assertTrue(np.array_equal(self.decode(padded), self.decode(plain)))
+
+    def test_palette_keeps_black_and_white_exact(self):
+        original = np.asarray(self.canvas)
+        decoded = self.decode(ImageEncoder('png', palette_colors=16).encode(self.canvas))
+        for value in (0, 255):
+            pure = (original == value).all(axis=2)
+            self.assertTrue(pure.any())
+            self.assertTrue((decoded[pure] == value).all())
+
+    def test_palette_png_is_smaller_than_truecolor(self):
+        truecolor = io.BytesIO()
+        self.canvas.save(truecolor, format='PNG')
+        self.assertLess(len(ImageEncoder('png').encode(self.canvas)), len(truecolor.getvalue()))
+
+    def test_signature_covers_every_encoding_setting(self):
+        signatures = {
+            ImageEncoder(**options).signature for options in
+            [{}, {'image_format': 'jpeg'}, {'palette_colors': 8}, {'compress_level': 9},
+             {'quality': 80}, {'min_bytes': 10240}]
+        }
+        self.assertEqual(len(signatures), 6)
+
+
+A1_RANGE = re.compile(r'^([A-Z]+)(\d+)(?::([A-Z]+)(\d*))?$')
+
+
+def column_number(letters):
+    number = 0
+    for letter in letters:
+        number = number * 26 + ord(letter) - ord('A') + 1
+    return number
+
+
+def sheet_row(order_id, status):
+    return ['', '', '', '', order_id, '', '', '', '', '', '', '', status]
+
+
+class FakeSheet:
+    """In-memory worksheet with the gspread calls the sheet sync code makes"""
+
+    def __init__(self, rows=None):
+        self.rows = [list(row) for row in rows or []]
+        self.calls = []
+
+    def _cell(self, row, col):
+        if row <= len(self.rows) and col <= len(self.rows[row - 1]):
+            return self.rows[row - 1][col - 1]
+        return ''
+
+    def append_rows(self, values, table_range='A1'):
+        self.calls.append('append_rows')
+        first = len(self.rows) + 1
+        self.rows.extend(list(row) for row in values)
+        return {'updates': {'updatedRange': f"Sheet1!A{first}:M{len(self.rows)}"}}
+
+    def append_row(self, values, table_range='A1'):
+        response = self.append_rows([values], table_range=table_range)
+        self.calls[-1] = 'append_row'
+        return response
+
+    def batch_update(self, data):
+        self.calls.append('batch_update')
+        for item in data:
+            col, row = A1_RANGE.match(item['range']).group(1, 2)
+            self._set(int(row), column_number(col), item['values'][0][0])
+
+    def update_cell(self, row, col, value):
+        self.calls.append('update_cell')
+        self._set(row, col, value)
+
+    def _set(self, row, col, value):
+        while len(self.rows) < row:
+            self.rows.append([])
+        self.rows[row - 1].extend([''] * (col - len(self.rows[row - 1])))
+        self.rows[row - 1][col - 1] = value
+
+    def batch_get(self, ranges, major_dimension='ROWS'):
+        self.calls.append('batch_get')
+        result = []
+        for a1 in ranges:
+            col, start, _, end = A1_RANGE.match(a1).groups()
+            col, start = column_number(col), int(start)
+            end = int(end) if end else (len(self.rows) if end == '' else start)
+            cells = [self._cell(row, col) for row in range(start, end + 1)]
+            while cells and not cells[-1]:
+                cells.pop()
+            if not cells:
+                result.append([])
+            elif major_dimension == 'COLUMNS':
+                result.append([cells])
+            else:
+                result.append([[cell] for cell in cells])
+        return result
+
+    def col_values(self, col):
+        self.calls.append('col_values')
+        return [self._cell(row, col) for row in range(1, len(self.rows) + 1)]
+
+
+class SheetTestCase(TestCase):
+    """Runs with open_order_sheet patched to an in-memory sheet holding the header row"""
+
+    patch_targets = ('bot.utils.open_order_sheet',)
+
+    def setUp(self):
+        self.sheet = FakeSheet([sheet_row('Order ID', 'Verified Status')])
+        for target in self.patch_targets:
+            patcher = mock.patch(target, return_value=self.sheet)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+class AppendedRowNumberTests(TestCase):
+
+    def test_first_row_of_updated_range(self):
+        self.assertEqual(appended_row_number({'updates': {'updatedRange': 'Sheet1!A101:M103'}}), 101)
+        self.assertEqual(appended_row_number({'updates': {'updatedRange': "'Orders 2025'!A7:M7"}}), 7)
+
+    def test_missing_range(self):
+        self.assertIsNone(appended_row_number({}))
+        self.assertIsNone(appended_row_number(None))
+
+
+class SaveToGoogleSheetTests(SheetTestCase):
+
+    def test_row_number_comes_from_the_append_response(self):
+        self.sheet.rows += [sheet_row(f"EO-OTHER-{n}", 'Pending') for n in range(4)]
+        order = create_order('EO-G-1')
+        self.assertTrue(save_to_google_sheet(order))
+        self.assertEqual(Order.objects.get(pk=order.pk).sheet_row_number, 6)
+        self.assertEqual(self.sheet.calls, ['append_row'])
+        self.assertEqual(self.sheet.rows[5][4], 'EO-G-1')
+
+    def test_order_id_column_is_the_fallback(self):
+        order = create_order('EO-G-2')
+        with mock.patch.object(FakeSheet, 'append_row', lambda sheet, values, table_range: sheet.rows.append(values)):
+            self.assertTrue(save_to_google_sheet(order))
+        self.assertEqual(Order.objects.get(pk=order.pk).sheet_row_number, 2)
+        self.assertEqual(self.sheet.calls, ['col_values'])
+
+
+@override_settings(SHEET_SYNC_MODE='outbox')
+class SheetSyncerTests(SheetTestCase):
+    patch_targets = ('bot.sheet_sync.open_order_sheet',)
+
+    def setUp(self):
+        super().setUp()
+        self.syncer = SheetSyncer(batch_size=50, max_attempts=3, lease_seconds=60,
+                                  bucket=TokenBucket(rate=1000, capacity=1000))
+
+    def test_appends_are_coalesced_into_one_call(self):
+        first, second = create_order('EO-S-1'), create_order('EO-S-2')
+        for order in (first, second, first):
+            self.syncer.enqueue_append(order)
+
+        self.assertEqual(self.syncer.flush(), 3)
+        self.assertEqual(self.sheet.calls, ['append_rows'])
+        self.assertEqual(Order.objects.get(pk=first.pk).sheet_row_number, 2)
+        self.assertEqual(Order.objects.get(pk=second.pk).sheet_row_number, 3)
+        self.assertEqual(self.syncer.coalesced, 1)
+        self.assertFalse(SheetOutbox.objects.exclude(status='done').exists())
+
+    def test_status_changes_are_one_batch_update(self):
+        self.sheet.rows += [sheet_row('EO-S-3', 'Pending'), sheet_row('EO-S-4', 'Pending')]
+        third = create_order('EO-S-3', sheet_row_number=2, status='verified')
+        fourth = create_order('EO-S-4', sheet_row_number=3, status='rejected')
+        for order in (third, fourth, third):
+            self.syncer.enqueue_status(order, order.status)
+
+        self.assertEqual(self.syncer.flush(), 3)
+        self.assertEqual(self.sheet.calls, ['batch_update'])
+        self.assertEqual([row[12] for row in self.sheet.rows[1:]], ['Verified', 'Rejected'])
+        self.assertEqual(self.syncer.last_status_batch, 3)
+
+    def test_status_of_order_without_row_waits_without_spending_attempts(self):
+        order = create_order('EO-S-5', status='verified')
+        self.syncer.enqueue_status(order, 'verified')
+
+        for _ in range(self.syncer.max_attempts + 1):
+            self.assertEqual(self.syncer.flush(), 0)
+            # Expire the lease so the next flush claims the row again
+            SheetOutbox.objects.update(locked_at=timezone.now() - timedelta(seconds=120))
+        event = SheetOutbox.objects.get()
+        self.assertEqual((event.status, event.attempts, event.last_error), ('processing', 0, ''))
+        self.assertEqual(self.sheet.calls, [])
+
+        Order.objects.filter(pk=order.pk).update(sheet_row_number=2)
+        self.assertEqual(self.syncer.flush(), 1)
+        self.assertEqual(self.sheet.calls, ['batch_update'])
+        self.assertEqual(SheetOutbox.objects.get().status, 'done')
+
+    def test_waiting_rows_are_not_claimed_again_until_their_lease_expires(self):
+        waiting = create_order('EO-S-6')
+        self.syncer.enqueue_status(waiting, 'verified')
+        self.syncer.flush()
+
+        self.syncer.enqueue_append(create_order('EO-S-7'))
+        self.assertEqual(self.syncer.flush(), 1)
+        self.assertEqual(self.sheet.calls, ['append_rows'])
+
+    def test_run_sleeps_when_a_full_batch_only_waits(self):
+        self.syncer.batch_size = 1
+        self.syncer.enqueue_status(create_order('EO-S-8'), 'verified')
+        loops = iter(range(3))
+
+        with mock.patch('bot.sheet_sync.time.sleep') as sleep:
+            handled = self.syncer.run(should_stop=lambda: next(loops, None) is None, interval=2)
+        self.assertEqual(handled, 0)
+        self.assertEqual(sleep.call_args_list, [mock.call(2)] * 3)
+
+
+class SheetReconcilerTests(SheetTestCase):
+    patch_targets = ('bot.sheet_reconcile.open_order_sheet', 'bot.sheet_sync.open_order_sheet')
+
+    def setUp(self):
+        super().setUp()
+        self.index_path = os.path.join(scratch_dir(self), 'sheet_index.json')
+        self.reconciler = SheetReconciler(index_path=self.index_path, index_max_age=3600, overlap=60)
+
+    def test_missing_rows_and_stale_statuses_are_fixed(self):
+        self.sheet.rows.append(sheet_row('EO-R-1', 'Pending'))
+        synced = create_order('EO-R-1', sheet_row_number=2, status='verified')
+        lost = create_order('EO-R-2')
+
+        result = self.reconciler.reconcile()
+        self.assertEqual((result['appended'], result['status_cells']), (1, 1))
+        self.assertEqual([row[4] for row in self.sheet.rows[1:]], ['EO-R-1', 'EO-R-2'])
+        self.assertEqual(self.sheet.rows[1][12], 'Verified')
+        self.assertEqual(Order.objects.get(pk=lost.pk).sheet_row_number, 3)
+        self.assertEqual(Order.objects.get(pk=synced.pk).sheet_row_number, 2)
+
+        # Nothing changed since: the cached index answers with one read of the sheet's tail
+        self.sheet.calls.clear()
+        result = self.reconciler.reconcile()
+        self.assertEqual((result['appended'], result['status_cells']), (0, 0))
+        self.assertEqual(self.sheet.calls, ['batch_get'])
+        with open(self.index_path) as f:
+            self.assertEqual(json.load(f)['rows']['EO-R-2'], [3, 'Pending'])
+
+    def test_order_with_a_row_number_is_never_appended_again(self):
+        self.reconciler.reconcile()
+        # Appended (by the live path) after the index was read
+        self.sheet.rows.append(sheet_row('EO-R-3', 'Pending'))
+        create_order('EO-R-3', sheet_row_number=2)
+
+        with mock.patch.object(SheetReconciler, '_read_rows', return_value=0):
+            result = self.reconciler.reconcile()
+        self.assertEqual((result['appended'], result['status_cells']), (0, 1))
+        self.assertEqual(len(self.sheet.rows), 2)
+        self.assertEqual(self.sheet.rows[1][12], 'Pending')
+
+    def test_order_queued_in_outbox_is_left_to_the_flusher(self):
+        order = create_order('EO-R-4')
+        SheetOutbox.objects.create(order=order, kind='append')
+        result = self.reconciler.reconcile()
+        self.assertEqual((result['appended'], result['held_for_outbox']), (0, 1))
+        self.assertEqual(len(self.sheet.rows), 1)
+
+    def test_moved_rows_rebuild_the_index(self):
+        self.sheet.rows += [sheet_row('EO-R-5', 'Pending'), sheet_row('EO-R-6', 'Pending')]
+        create_order('EO-R-5', sheet_row_number=2)
+        sixth = create_order('EO-R-6', sheet_row_number=3)
+        self.reconciler.reconcile()
+
+        # Someone sorts the sheet by hand, then the order is verified
+        self.sheet.rows[1], self.sheet.rows[2] = self.sheet.rows[2], self.sheet.rows[1]
+        sixth.status = 'verified'
+        sixth.save()
+        result = self.reconciler.reconcile()
+        self.assertTrue(result['rebuilt_index'])
+        self.assertEqual((self.sheet.rows[1][4], self.sheet.rows[1][12]), ('EO-R-6', 'Verified'))
+        self.assertEqual((self.sheet.rows[2][4], self.sheet.rows[2][12]), ('EO-R-5', 'Pending'))
+        self.assertEqual(Order.objects.get(pk=sixth.pk).sheet_row_number, 2)
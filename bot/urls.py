@@ -2,7 +2,7 @@
 URL configuration for bot app
 """
 
-from django.urls import path
+from django.urls import path, re_path
 from . import views
 
 app_name = 'bot'
@@ -10,6 +10,8 @@ app_name = 'bot'
 urlpatterns = [
     # WhatsApp webhook - Now using DebugWebhookView for extensive logging
     path('webhook/', views.WhatsAppWebhookView.as_view(), name='webhook'),
+    # Async variant of the webhook for ASGI servers (uvicorn eeonam_project.asgi:application)
+    path('webhook/async/', views.AsyncWhatsAppWebhookView.as_view(), name='webhook_async'),
     
     # Verification endpoints
     path('verify/<uuid:token>/', views.verify_payment, name='verify_payment'),
@@ -17,5 +19,9 @@ urlpatterns = [
     
     # Utility endpoints
     path('health/', views.health_check, name='health_check'),
+    path('metrics/', views.metrics, name='metrics'),
     path('order/<str:order_id>/', views.order_status, name='order_status'),
+    
+    # Payment QR images (QR_HOSTING=local)
+    re_path(r'^qr/(?P<order_id>[^/]+)\.(?P<extension>png|jpg)$', views.payment_qr_image, name='payment_qr_image'),
 ]
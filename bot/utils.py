@@ -1,18 +1,17 @@
 import io
-import os
+import re
 import json
-import qrcode
+import hashlib
+import tempfile
 import traceback
 from typing import Optional
-from PIL import Image, ImageDraw, ImageFont
 import cloudinary
 import cloudinary.uploader
-import gspread
-from google.oauth2.credentials import Credentials
-from google.auth.transport.requests import Request
 from django.conf import settings
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime
+
+from .google_client import google_client
 
 logger = logging.getLogger(__name__)
 
@@ -23,142 +22,43 @@ logger = logging.getLogger(__name__)
 def generate_qr_code(amount: float, order_id: str) -> Optional[str]:
     """
     Generate a branded QR code with Sadya Kochi branding and graphics.
-    Ensures the final image is at least 10KB in size.
+    Images under QR_MIN_IMAGE_BYTES are padded up to it by the encoder.
     """
     try:
-        upi_string = (
-            f"upi://pay?"
-            f"pa={settings.UPI_ID}&"
-            f"pn={settings.UPI_MERCHANT_NAME}&"
-            f"am={amount}&"
-            f"cu=INR&"
-            f"tn=Order_{order_id}"
-        )
-        
-        # Create QR code with higher settings for better quality
-        qr = qrcode.QRCode(
-            version=3,
-            error_correction=qrcode.constants.ERROR_CORRECT_H,
-            box_size=15,
-            border=6,
-        )
-        qr.add_data(upi_string)
-        qr.make(fit=True)
-        
-        # Generate base QR code
-        qr_img = qr.make_image(fill_color="black", back_color="white")
-        
-        # Create a larger canvas with branding
-        canvas_width = 800
-        canvas_height = 1000
-        
-        # Create new image with white background
-        canvas = Image.new('RGB', (canvas_width, canvas_height), 'white')
-        draw = ImageDraw.Draw(canvas)
-        
-        # Decorative borders
-        border_color = "#2E8B57"
-        border_width = 8
-        draw.rectangle([0, 0, canvas_width, canvas_height], outline=border_color, width=border_width)
-        inner_border_margin = 20
-        draw.rectangle([
-            inner_border_margin, inner_border_margin, 
-            canvas_width - inner_border_margin, canvas_height - inner_border_margin
-        ], outline="#FFD700", width=4)
-        
-        # Brand header
-        header_height = 120
-        draw.rectangle([
-            border_width, border_width, 
-            canvas_width - border_width, header_height + border_width
-        ], fill="#2E8B57")
-        
-        # Fonts (fallback-safe)
-        try:
-            title_font = ImageFont.truetype("/System/Library/Fonts/Arial.ttc", 48)
-            subtitle_font = ImageFont.truetype("/System/Library/Fonts/Arial.ttc", 24)
-            detail_font = ImageFont.truetype("/System/Library/Fonts/Arial.ttc", 20)
-        except Exception:
-            try:
-                title_font = ImageFont.load_default()
-                subtitle_font = ImageFont.load_default()
-                detail_font = ImageFont.load_default()
-            except Exception:
-                title_font = subtitle_font = detail_font = None
-        
-        # Brand text
-        brand_text = "SADYA KOCHI"
-        if title_font:
-            bbox = draw.textbbox((0, 0), brand_text, font=title_font)
-            text_width = bbox[2] - bbox[0]
-            draw.text(((canvas_width - text_width) // 2, 25), brand_text, fill="white", font=title_font)
-        
-        tagline = "Authentic Kerala Meals Delivered"
-        if subtitle_font:
-            bbox = draw.textbbox((0, 0), tagline, font=subtitle_font)
-            text_width = bbox[2] - bbox[0]
-            draw.text(((canvas_width - text_width) // 2, 80), tagline, fill="#FFD700", font=subtitle_font)
-        
-        # QR placement
-        qr_size = 450
-        qr_img_resized = qr_img.resize((qr_size, qr_size), Image.Resampling.LANCZOS)
-        qr_x = (canvas_width - qr_size) // 2
-        qr_y = header_height + 50
-        
-        # Shadow + frame
-        shadow_offset = 5
-        draw.rectangle([
-            qr_x + shadow_offset, qr_y + shadow_offset,
-            qr_x + qr_size + shadow_offset, qr_y + qr_size + shadow_offset
-        ], fill="#CCCCCC")
-        draw.rectangle([qr_x - 10, qr_y - 10, qr_x + qr_size + 10, qr_y + qr_size + 10], 
-                      fill="white", outline="#DDDDDD", width=2)
-        canvas.paste(qr_img_resized, (qr_x, qr_y))
-        
-        # Details
-        details_y = qr_y + qr_size + 40
-        if detail_font:
-            amount_text = f"Amount: ₹{amount:.2f}"
-            bbox = draw.textbbox((0, 0), amount_text, font=detail_font)
-            draw.text(((canvas_width - (bbox[2]-bbox[0])) // 2, details_y), amount_text, fill="#2E8B57", font=detail_font)
-            
-            order_text = f"Order ID: {order_id}"
-            bbox = draw.textbbox((0, 0), order_text, font=detail_font)
-            draw.text(((canvas_width - (bbox[2]-bbox[0])) // 2, details_y + 35), order_text, fill="#666666", font=detail_font)
-            
-            instruction_text = "Scan to pay with any UPI app"
-            bbox = draw.textbbox((0, 0), instruction_text, font=detail_font)
-            draw.text(((canvas_width - (bbox[2]-bbox[0])) // 2, details_y + 70), instruction_text, fill="#666666", font=detail_font)
-        
-        # Decorative arcs
-        for i in range(3):
-            draw.arc([30 + i*10, 140 + i*10, 70 + i*10, 180 + i*10], start=0, end=90, fill="#FFD700", width=3)
-            draw.arc([canvas_width - 70 - i*10, 140 + i*10, canvas_width - 30 - i*10, 180 + i*10], start=90, end=180, fill="#FFD700", width=3)
-        
-        # Encode
-        img_buffer = io.BytesIO()
-        canvas.save(img_buffer, format='PNG', quality=95, optimize=False)
-        img_buffer.seek(0)
-        
-        if len(img_buffer.getvalue()) < 10240:
-            # Bump size if under 10KB
-            canvas_large = canvas.resize((1000, 1200), Image.Resampling.LANCZOS)
-            img_buffer = io.BytesIO()
-            canvas_large.save(img_buffer, format='PNG', quality=100, optimize=False)
-            img_buffer.seek(0)
-
-        # Upload to Cloudinary
+        from .qr_cache import amount_qr_cache
+        from .qr_render import get_encoder
+        from .qr_service import qr_render_service
+
+        # Amount mode: one shared QR per total, reused across orders
+        shared = settings.QR_CACHE_MODE == 'amount'
+
+        if settings.QR_HOSTING in ('local', 'whatsapp'):
+            # Served by the /qr/<order_id>.<ext> view (or uploaded as WhatsApp media);
+            # rendering into the image store now makes the later fetch a cache hit
+            payment_qr_bytes(amount, order_id)
+            return f"{settings.BASE_URL}/qr/{order_id}.{get_encoder().extension}"
+
+        if shared:
+            cached_url = amount_qr_cache.get(amount)
+            if cached_url:
+                return cached_url
+
+        # Rendered in a warm worker process; this thread just waits for the encoded bytes
+        img_buffer = io.BytesIO(qr_render_service.render_image(amount, None if shared else order_id))
+
+        # Upload to Cloudinary as encoded: no format or quality options, which would transcode it
         configure_cloudinary()
         result = cloudinary.uploader.upload(
             img_buffer,
             folder="qr_codes",
-            public_id=f"qr_{order_id}",
+            public_id=f"qr_amount_{amount:.2f}".replace('.', '_') if shared else f"qr_{order_id}",
             overwrite=True,
-            resource_type="image",
-            format="png",
-            quality="auto:best"
+            resource_type="image"
         )
-        return result.get('secure_url')
+        qr_url = result.get('secure_url')
+        if shared and qr_url:
+            amount_qr_cache.put(amount, qr_url)
+        return qr_url
         
     except Exception as e:
         logger.error(f"Error generating branded QR code: {str(e)}")
@@ -166,6 +66,13 @@ def generate_qr_code(amount: float, order_id: str) -> Optional[str]:
         return None
 
 
+def payment_qr_bytes(amount: float, order_id: str) -> bytes:
+    """Encoded payment QR from the local image store, rendered on a miss"""
+    from .qr_store import qr_image_store
+    shared = settings.QR_CACHE_MODE == 'amount'
+    return qr_image_store.get_or_render(amount, None if shared else order_id)[1]
+
+
 def configure_cloudinary():
     """Configure Cloudinary with settings from Django settings."""
     cloudinary.config(
@@ -175,25 +82,75 @@ def configure_cloudinary():
     )
 
 
+class MediaTooLarge(Exception):
+    """Downloaded media is bigger than SCREENSHOT_MAX_BYTES"""
+
+
+def download_media(media_url: str, max_bytes: int, spool_bytes: int, chunk_size: int = 64 * 1024):
+    """
+    Stream WhatsApp media into a spooled temporary file (in memory up to spool_bytes,
+    on disk beyond), hashing it on the way. Returns (file at offset 0, size, sha256 hex).
+    """
+    from .http_client import http_client
+    headers = { 'Authorization': f'Bearer {settings.WHATSAPP_ACCESS_TOKEN}' }
+
+    with http_client.get(media_url, headers=headers, timeout=(settings.HTTP_CONNECT_TIMEOUT, 30), stream=True) as resp:
+        resp.raise_for_status()
+        declared = int(resp.headers.get('Content-Length') or 0)
+        if declared > max_bytes:
+            raise MediaTooLarge(f"Media is {declared} bytes (limit {max_bytes})")
+
+        spool = tempfile.SpooledTemporaryFile(max_size=spool_bytes)
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            for chunk in resp.iter_content(chunk_size):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise MediaTooLarge(f"Media exceeded {max_bytes} bytes while downloading")
+                digest.update(chunk)
+                spool.write(chunk)
+        except BaseException:
+            spool.close()
+            raise
+
+    spool.seek(0)
+    return spool, size, digest.hexdigest()
+
+
 def upload_to_cloudinary(media_url: str, order_id: str) -> Optional[str]:
     """
     Upload payment screenshot to Cloudinary.
+    The image is streamed through a spooled temp file and uploaded in chunks when
+    large, so a request never holds more than about one chunk of it in memory.
     """
     try:
-        import requests
-        headers = { 'Authorization': f'Bearer {settings.WHATSAPP_ACCESS_TOKEN}' }
-        resp = requests.get(media_url, headers=headers, timeout=30)
-        resp.raise_for_status()
+        spool, size, sha256 = download_media(
+            media_url,
+            max_bytes=settings.SCREENSHOT_MAX_BYTES,
+            spool_bytes=settings.SCREENSHOT_SPOOL_BYTES
+        )
+        logger.info(f"Downloaded screenshot for {order_id}: {size} bytes, sha256 {sha256}")
 
         configure_cloudinary()
-        result = cloudinary.uploader.upload(
-            resp.content,
+        options = dict(
             folder="payment_screenshots",
             public_id=f"payment_{order_id}",
             overwrite=True,
-            resource_type="image"
+            resource_type="image",
+            context={'sha256': sha256}
         )
+        with spool:
+            if size > settings.SCREENSHOT_UPLOAD_CHUNK_BYTES:
+                result = cloudinary.uploader.upload_large(
+                    spool, chunk_size=settings.SCREENSHOT_UPLOAD_CHUNK_BYTES, **options
+                )
+            else:
+                result = cloudinary.uploader.upload(spool, **options)
         return result.get('secure_url')
+    except MediaTooLarge as e:
+        logger.warning(f"Rejected screenshot for {order_id}: {e}")
+        return None
     except Exception as e:
         logger.error(f"Error uploading to Cloudinary: {str(e)}")
         logger.error(traceback.format_exc())
@@ -210,8 +167,8 @@ def generate_order_id() -> str:
 
 def get_available_dates():
     """Get list of available delivery dates (minimum 3 days advance, next 30 days)."""
-    start_date = datetime.now().date() + timedelta(days=3)
-    return [start_date + timedelta(days=i) for i in range(30)]
+    from .date_window import delivery_dates
+    return list(delivery_dates.current().dates)
 
 
 # =========================
@@ -219,82 +176,67 @@ def get_available_dates():
 # =========================
 
 def get_google_credentials():
-    """Load credentials from environment variable (GOOGLE_OAUTH_TOKEN_JSON) or token.json."""
-    SCOPES = [
-        'https://www.googleapis.com/auth/drive',
-        'https://www.googleapis.com/auth/spreadsheets'
-    ]
-    creds = None
-    token_json_str = os.getenv('GOOGLE_OAUTH_TOKEN_JSON')
-
-    if token_json_str:
-        try:
-            logger.debug("Loading Google credentials from environment variable")
-            token_data = json.loads(token_json_str)
-            creds = Credentials.from_authorized_user_info(token_data, SCOPES)
-            logger.debug("Successfully loaded credentials from environment variable")
-        except json.JSONDecodeError as e:
-            logger.error(f"Error parsing GOOGLE_OAUTH_TOKEN_JSON: {str(e)}")
-            return None
-        except Exception as e:
-            logger.error(f"Error creating credentials from environment variable: {str(e)}")
-            logger.error(traceback.format_exc())
-            return None
-    else:
-        token_path = os.getenv('GOOGLE_OAUTH_TOKEN_PATH', 'token.json')
-        if os.path.exists(token_path):
-            try:
-                logger.debug(f"Loading Google credentials from file: {token_path}")
-                with open(token_path, 'r') as token_file:
-                    token_data = json.load(token_file)
-                    creds = Credentials.from_authorized_user_info(token_data, SCOPES)
-                logger.debug("Successfully loaded credentials from file")
-            except Exception as e:
-                logger.error(f"Error loading credentials from file: {str(e)}")
-                logger.error(traceback.format_exc())
-                return None
-        else:
-            logger.error(f"Neither GOOGLE_OAUTH_TOKEN_JSON env var nor token file found at: {token_path}")
-            return None
-
-    if creds and creds.expired and creds.refresh_token:
-        try:
-            logger.debug("Refreshing expired Google credentials")
-            creds.refresh(Request())
-            refreshed_token_json = creds.to_json()
-            if token_json_str:
-                logger.info("Token refreshed. Update GOOGLE_OAUTH_TOKEN_JSON env var with the new token JSON.")
-                logger.debug(refreshed_token_json)
-            else:
-                with open(os.getenv('GOOGLE_OAUTH_TOKEN_PATH', 'token.json'), 'w') as token_file:
-                    token_file.write(refreshed_token_json)
-                logger.debug("Updated local token.json with refreshed token")
-        except Exception as e:
-            logger.error(f"Error refreshing Google credentials: {str(e)}")
-            logger.error(traceback.format_exc())
-            return None
-
-    if not creds or not creds.valid:
-        logger.error("Invalid or missing Google credentials.")
-        return None
-
-    logger.debug("Google credentials are valid and ready to use")
-    return creds
+    """Cached Google credentials (GOOGLE_OAUTH_TOKEN_JSON or token.json), refreshed before they expire."""
+    return google_client.credentials()
 
 
 def parse_items_for_display(items_dict: dict) -> str:
-    names = {
-        1: 'Veg Sadhya',
-        2: 'Non-Veg Sadhya',
-        3: 'Palada Pradhaman',
-        4: 'Parippu/Gothambu Payasam',
-        5: 'Kaaya Varuthathu',
-        6: 'Sharkkaravaratti'
-    }
-    # Accept both {"1": 2} and {1: 2}
-    if items_dict and isinstance(list(items_dict.keys())[0], str):
-        items_dict = {int(k): v for k, v in items_dict.items()}
-    return ', '.join(f"{names[i]} x {q}" for i, q in items_dict.items() if i in names)
+    # Accepts both {"1": 2} and {1: 2}
+    from .catalog import menu_catalog
+    return menu_catalog.compiled().describe(items_dict)
+
+
+# Order sheet columns (1-based)
+SHEET_ORDER_ID_COLUMN = 5
+SHEET_STATUS_COLUMN = 13
+
+
+def appended_row_number(response) -> Optional[int]:
+    """First row written by a values.append call, from its updatedRange ('Sheet1!A101:M101' -> 101)"""
+    updated_range = ((response or {}).get('updates') or {}).get('updatedRange', '')
+    match = re.match(r'^[A-Z]*(\d+)', updated_range.rpartition('!')[2])
+    return int(match.group(1)) if match else None
+
+
+def find_order_row(sheet, order_id: str) -> Optional[int]:
+    """Row holding this exact Order ID, reading only the Order ID column (newest rows first)"""
+    column = sheet.col_values(SHEET_ORDER_ID_COLUMN)
+    for index in range(len(column) - 1, -1, -1):
+        if column[index] == order_id:
+            return index + 1
+    logger.warning(f"Order {order_id} not found in the Order ID column")
+    return None
+
+
+def open_order_sheet():
+    """The cached order worksheet (sheet1 of GOOGLE_SHEET_ID), or None without credentials or a sheet id"""
+    return google_client.worksheet()
+
+
+def order_sheet_row(order) -> list:
+    """Cell values of an order's row in the order sheet"""
+    # Items -> readable string
+    items_dict = json.loads(order.items)
+    items_display = parse_items_for_display(items_dict)
+
+    from .models import Order
+    junction_display = dict(Order.JUNCTION_CHOICES)[order.junction]
+
+    return [
+        order.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+        order.phone_number,
+        junction_display,
+        order.delivery_date.strftime('%Y-%m-%d'),
+        order.order_id,
+        items_display,
+        float(order.total_amount),
+        order.delivery_address,
+        order.maps_link or '',
+        order.payment_screenshot_url or '',  # Cloudinary URL
+        order.get_verification_url(),
+        order.get_rejection_url(),
+        order.status.title()
+    ]
 
 
 def save_to_google_sheet(order) -> bool:
@@ -303,54 +245,23 @@ def save_to_google_sheet(order) -> bool:
     (Restored behavior)
     """
     try:
-        creds = get_google_credentials()
-        if not creds:
+        sheet = open_order_sheet()
+        if sheet is None:
             return False
 
-        gc = gspread.authorize(creds)
-        sheet_id = getattr(settings, 'GOOGLE_SHEET_ID', None)
-        if not sheet_id:
-            logger.error("GOOGLE_SHEET_ID not set")
-            return False
+        response = sheet.append_row(order_sheet_row(order), table_range='A1')
 
-        workbook = gc.open_by_key(sheet_id)
-        sheet = workbook.sheet1
-
-        # Items -> readable string
-        items_dict = json.loads(order.items)
-        items_display = parse_items_for_display(items_dict)
-
-        from .models import Order
-        junction_display = dict(Order.JUNCTION_CHOICES)[order.junction]
-
-        row_data = [
-            order.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-            order.phone_number,
-            junction_display,
-            order.delivery_date.strftime('%Y-%m-%d'),
-            order.order_id,
-            items_display,
-            float(order.total_amount),
-            order.delivery_address,
-            order.maps_link or '',
-            order.payment_screenshot_url or '',  # Cloudinary URL
-            order.get_verification_url(),
-            order.get_rejection_url(),
-            order.status.title()
-        ]
-
-        sheet.append_row(row_data)
-
-        # Capture row number for future updates
-        all_values = sheet.get_all_values()
-        order.sheet_row_number = len(all_values)
+        # Capture row number for future updates: the append response names the
+        # rows it wrote, so concurrent appends from other workers can't shift it
+        order.sheet_row_number = appended_row_number(response) or find_order_row(sheet, order.order_id)
         order.save(update_fields=['sheet_row_number'])
 
         logger.debug(f"Order {order.order_id} saved to Google Sheet (row {order.sheet_row_number})")
         return True
 
-    except Exception:
+    except Exception as e:
         logger.error(traceback.format_exc())
+        google_client.handle_error(e)
         return False
 
 
@@ -360,23 +271,21 @@ def update_sheet_verification_status(order, status: str) -> bool:
     (Restored behavior)
     """
     try:
-        creds = get_google_credentials()
-        if not creds:
+        sheet = open_order_sheet()
+        if sheet is None:
             return False
 
-        gc = gspread.authorize(creds)
-        sheet = gc.open_by_key(settings.GOOGLE_SHEET_ID).sheet1
-
         if order.sheet_row_number:
-            sheet.update_cell(order.sheet_row_number, 13, status.title())
+            sheet.update_cell(order.sheet_row_number, SHEET_STATUS_COLUMN, status.title())
             logger.debug(f"Updated Google Sheet row {order.sheet_row_number} to {status.title()}")
             return True
 
         logger.warning(f"Order {order.order_id} has no stored sheet_row_number")
         return False
 
-    except Exception:
+    except Exception as e:
         logger.error(traceback.format_exc())
+        google_client.handle_error(e)
         return False
 
 
@@ -386,13 +295,10 @@ def initialize_google_sheet() -> bool:
     (Restored behavior)
     """
     try:
-        creds = get_google_credentials()
-        if not creds:
+        sheet = open_order_sheet()
+        if sheet is None:
             return False
 
-        gc = gspread.authorize(creds)
-        sheet = gc.open_by_key(settings.GOOGLE_SHEET_ID).sheet1
-
         if not sheet.row_values(1):
             headers = [
                 'Timestamp', 'Phone', 'Junction', 'Delivery Date', 'Order ID',
@@ -403,6 +309,7 @@ def initialize_google_sheet() -> bool:
 
         return True
 
-    except Exception:
+    except Exception as e:
         logger.error(traceback.format_exc())
+        google_client.handle_error(e)
         return False
@@ -1,17 +1,35 @@
 import json
 import logging
+import math
 import traceback
 from django.conf import settings
-from django.http import HttpResponse, Http404, HttpResponseBadRequest
+from django.http import HttpResponse, Http404, HttpResponseBadRequest, HttpResponsePermanentRedirect, JsonResponse
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.utils.decorators import method_decorator
 from django.views import View
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods, require_POST
 
+from .async_services import aenqueue_webhook_payload, aprocess_webhook_messages
+from .dedup import message_deduplicator
+from .inbound import (
+    enqueue_webhook_payload,
+    get_media_url,
+    iter_webhook_messages,
+    process_inbound_message
+)
+from .media_cache import media_id_cache
 from .models import Order
+from .qr_cache import amount_qr_cache
+from .qr_prefetch import qr_prefetcher
+from .qr_render import get_encoder
+from .qr_service import QRRenderBusy, qr_render_service
+from .qr_store import qr_image_store
 from .services import EeOnamBot
-from .utils import update_sheet_verification_status
+from .session_store import session_store
+from .sheet_sync import sheet_syncer
 
 # Set up detailed logging
 logger = logging.getLogger(__name__)
@@ -40,25 +58,17 @@ class WhatsAppWebhookView(View):
             data = json.loads(request.body)
             logger.info(f"Received webhook data: {json.dumps(data, indent=2)}")
             
-            # Extract message data
-            entries = data.get('entry', [])
+            if not isinstance(data, dict):
+                return HttpResponse('Invalid payload', status=400)
             
-            for entry in entries:
-                changes = entry.get('changes', [])
-                
-                for change in changes:
-                    value = change.get('value', {})
-                    
-                    if 'messages' in value:
-                        messages = value['messages']
-                        
-                        for message in messages:
-                            self._process_message(message)
-                    
-                    # Handle status updates (delivery receipts, read receipts, etc.)
-                    if 'statuses' in value:
-                        statuses = value['statuses']
-                        logger.info(f"Received status updates: {statuses}")
+            # Acknowledge-then-process: persist and let run_webhook_workers handle the messages
+            if settings.WEBHOOK_PROCESSING_MODE == 'queue':
+                queued = enqueue_webhook_payload(data)
+                logger.info(f"Queued {queued} inbound messages")
+                return HttpResponse('OK')
+            
+            for message in iter_webhook_messages(data):
+                self._process_message(message)
             
             return HttpResponse('OK')
             
@@ -71,168 +81,51 @@ class WhatsAppWebhookView(View):
     
     def _process_message(self, message_data):
         """Process individual message"""
-        
-        phone_number = message_data.get('from')
-        message_type = message_data.get('type')
-        message_id = message_data.get('id')
-        timestamp = message_data.get('timestamp')
-        
-        # Add debug logging
-        logger.info(f"Processing message {message_id} from {phone_number}, type: {message_type}")
-        logger.info(f"Full message data: {json.dumps(message_data, indent=2)}")
-        
-        bot = EeOnamBot()
-        
-        try:
-            if message_type == 'text':
-                text = message_data.get('text', {}).get('body', '')
-                logger.info(f"Text message: '{text}'")
-                bot.process_message(phone_number, message_text=text, message_type='text')
-                
-            elif message_type == 'interactive':
-                interactive_data = message_data.get('interactive', {})
-                logger.info(f"Interactive data: {interactive_data}")
-                bot.process_message(
-                    phone_number, 
-                    message_type='interactive',
-                    interactive_data=interactive_data
-                )
-                
-            elif message_type == 'location':
-                location_data = message_data.get('location', {})
-                logger.info(f"Raw location data from WhatsApp: {location_data}")
-                
-                # WhatsApp location format validation and processing
-                if 'latitude' in location_data and 'longitude' in location_data:
-                    processed_location = {
-                        'latitude': location_data.get('latitude'),
-                        'longitude': location_data.get('longitude'),
-                        'name': location_data.get('name', ''),
-                        'address': location_data.get('address', '')
-                    }
-                    
-                    logger.info(f"Processed location: {processed_location}")
-                    
-                    bot.process_message(
-                        phone_number,
-                        message_type='location',
-                        location_data=processed_location
-                    )
-                else:
-                    logger.warning(f"Invalid location data received: {location_data}")
-                    bot.whatsapp.send_message(
-                        phone_number,
-                        "Invalid location data received. Please share your location again."
-                    )
-                
-            elif message_type == 'image':
-                image_data = message_data.get('image', {})
-                media_id = image_data.get('id')
-                
-                logger.info(f"Image data: {image_data}")
-                
-                if media_id:
-                    media_url = self._get_media_url(media_id)
-                    logger.info(f"Media URL: {media_url}")
-                    
-                    if media_url:
-                        media_data = {
-                            'type': 'image',
-                            'url': media_url,
-                            'caption': image_data.get('caption', '')
-                        }
-                        bot.process_message(
-                            phone_number,
-                            message_type='media',
-                            media_data=media_data
-                        )
-                    else:
-                        logger.error(f"Failed to get media URL for media_id: {media_id}")
-                        bot.whatsapp.send_message(
-                            phone_number,
-                            "Unable to process image. Please try again."
-                        )
-                else:
-                    logger.warning("Image message without media_id")
-                    
-            elif message_type == 'document':
-                # Handle document messages if needed
-                logger.info(f"Document message received: {message_data}")
-                bot.whatsapp.send_message(
-                    phone_number,
-                    "Document messages are not supported. Please send images only."
-                )
-                
-            elif message_type == 'audio':
-                # Handle audio messages if needed
-                logger.info(f"Audio message received: {message_data}")
-                bot.whatsapp.send_message(
-                    phone_number,
-                    "Audio messages are not supported. Please send text or images."
-                )
-                
-            elif message_type == 'video':
-                # Handle video messages if needed
-                logger.info(f"Video message received: {message_data}")
-                bot.whatsapp.send_message(
-                    phone_number,
-                    "Video messages are not supported. Please send text or images."
-                )
-            
-            else:
-                logger.warning(f"Unhandled message type: {message_type}")
-                bot.whatsapp.send_message(
-                    phone_number,
-                    "Sorry, I couldn't process that message type. Please try again or type 'start' to begin."
-                )
-                
-        except Exception as e:
-            logger.error(f"Error processing message {message_id}: {e}", exc_info=True)
-            # Send error message to user
-            try:
-                bot.whatsapp.send_message(
-                    phone_number,
-                    "Sorry, something went wrong processing your message. Please try again or type 'start'."
-                )
-            except Exception as send_error:
-                logger.error(f"Failed to send error message: {send_error}")
+        process_inbound_message(message_data)
     
     def _get_media_url(self, media_id):
         """Get media URL from WhatsApp API"""
-        if not media_id:
-            return None
+        return get_media_url(media_id)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncWhatsAppWebhookView(View):
+    """Handle WhatsApp webhook requests on the event loop (serve via eeonam_project.asgi)"""
+    
+    async def get(self, request):
+        """Verify webhook"""
+        verify_token = request.GET.get('hub.verify_token')
+        challenge = request.GET.get('hub.challenge')
         
+        if verify_token == settings.WHATSAPP_VERIFY_TOKEN:
+            return HttpResponse(challenge)
+        
+        return HttpResponse('Forbidden', status=403)
+    
+    async def post(self, request):
+        """Handle incoming messages"""
         try:
-            import requests
+            data = json.loads(request.body)
+            logger.info(f"Received webhook data: {json.dumps(data, indent=2)}")
             
-            # First, get media info
-            url = f"https://graph.facebook.com/v18.0/{media_id}"
-            headers = {
-                'Authorization': f'Bearer {settings.WHATSAPP_ACCESS_TOKEN}'
-            }
+            if not isinstance(data, dict):
+                return HttpResponse('Invalid payload', status=400)
             
-            response = requests.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
+            if settings.WEBHOOK_PROCESSING_MODE == 'queue':
+                queued = await aenqueue_webhook_payload(data)
+                logger.info(f"Queued {queued} inbound messages")
+                return HttpResponse('OK')
             
-            data = response.json()
-            media_url = data.get('url')
+            await aprocess_webhook_messages(list(iter_webhook_messages(data)))
             
-            if not media_url:
-                logger.error(f"No URL in media response: {data}")
-                return None
-                
-            logger.info(f"Got media URL for {media_id}: {media_url}")
-            return media_url
+            return HttpResponse('OK')
             
-        except requests.exceptions.Timeout:
-            logger.error(f"Timeout getting media URL for {media_id}")
-            return None
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Request error getting media URL for {media_id}: {e}")
-            return None
+        except json.JSONDecodeError as e:
+            logger.error(f"Invalid JSON in webhook: {e}")
+            return HttpResponse('Invalid JSON', status=400)
         except Exception as e:
-            logger.error(f"Unexpected error getting media URL for {media_id}: {e}")
-            return None
+            logger.error(f"Error processing webhook: {e}", exc_info=True)
+            return HttpResponse('Error', status=500)
 
 
 @require_http_methods(["GET"])
@@ -246,8 +139,8 @@ def verify_payment(request, token):
         order.status = 'verified'
         order.save()
         
-        # Update Google Sheet
-        update_sheet_verification_status(order, 'verified')
+        # Update Google Sheet (queued for the sheet sync flusher in outbox mode)
+        sheet_syncer.enqueue_status(order, 'verified')
         
         # Send WhatsApp message to customer
         bot = EeOnamBot()
@@ -292,8 +185,8 @@ def reject_payment(request, token):
         order.status = 'rejected'
         order.save()
         
-        # Update Google Sheet
-        update_sheet_verification_status(order, 'rejected')
+        # Update Google Sheet (queued for the sheet sync flusher in outbox mode)
+        sheet_syncer.enqueue_status(order, 'rejected')
         
         # Send WhatsApp message to customer
         bot = EeOnamBot()
@@ -333,6 +226,21 @@ def health_check(request):
     return HttpResponse("EeOnam Bot is running!", content_type="text/plain")
 
 
+@require_http_methods(["GET"])
+def metrics(request):
+    """Per-process performance counters"""
+    return JsonResponse({
+        'dedup': message_deduplicator.stats(),
+        'session_cache': session_store.stats(),
+        'qr_render': qr_render_service.stats(),
+        'qr_prefetch': qr_prefetcher.stats(),
+        'qr_amount_cache': amount_qr_cache.stats(),
+        'qr_images': qr_image_store.stats(),
+        'whatsapp_media': media_id_cache.stats(),
+        'sheet_sync': sheet_syncer.stats(),
+    })
+
+
 @require_http_methods(["GET"])
 def order_status(request, order_id):
     """Check order status"""
@@ -379,6 +287,40 @@ def order_status(request, order_id):
         )
 
 
+@require_http_methods(["GET", "HEAD"])
+def payment_qr_image(request, order_id, extension):
+    """Payment QR image for an order, rendered once and served from the local image store"""
+    encoder = get_encoder()
+    if extension != encoder.extension:
+        # A link handed out before QR_IMAGE_FORMAT changed: the name must match the bytes
+        return HttpResponsePermanentRedirect(reverse('bot:payment_qr_image', args=[order_id, encoder.extension]))
+
+    total_amount = Order.objects.filter(order_id=order_id).values_list('total_amount', flat=True).first()
+    if total_amount is None:
+        raise Http404("Unknown order")
+    
+    amount = float(total_amount)
+    render_order_id = None if settings.QR_CACHE_MODE == 'amount' else order_id
+    
+    # Revalidation needs only the index, not the image
+    digest = qr_image_store.lookup(amount, render_order_id)
+    response = get_conditional_response(request, etag=f'"{digest}"') if digest else None
+    if response is None:
+        try:
+            digest, image = qr_image_store.get_or_render(amount, render_order_id)
+        except QRRenderBusy as e:
+            # Every render slot is taken: ask the fetcher to come back instead of failing with a 500
+            logger.warning(f"QR image for {order_id} not rendered: {e}")
+            response = HttpResponse('QR renderer busy', status=503, content_type='text/plain')
+            response['Retry-After'] = str(max(1, math.ceil(qr_render_service.submit_timeout)))
+            return response
+        response = HttpResponse(image, content_type=encoder.mime_type)
+    
+    response['ETag'] = f'"{digest}"'
+    patch_cache_control(response, public=True, max_age=settings.QR_IMAGE_MAX_AGE)
+    return response
+
+
 # -----------------------------------------------------------------------------
 # --- Debugging Views and Functions (Added) ---
 # -----------------------------------------------------------------------------
@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'eeonam_project.settings')
 
 application = get_asgi_application()
+
+# Start the QR render workers now rather than on the first order
+from bot.qr_service import qr_render_service  # noqa: E402
+
+qr_render_service.warm_in_background()
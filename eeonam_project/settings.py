@@ -88,6 +88,24 @@ DATABASES = {
 }
 
 
+# Cache
+# Local memory by default; set REDIS_URL to share caches (and invalidation stamps) between processes
+
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -137,6 +155,15 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 WHATSAPP_ACCESS_TOKEN = os.getenv('WHATSAPP_ACCESS_TOKEN')
 WHATSAPP_PHONE_NUMBER_ID = os.getenv('WHATSAPP_PHONE_NUMBER_ID')
 WHATSAPP_VERIFY_TOKEN = os.getenv('WHATSAPP_VERIFY_TOKEN')
+WHATSAPP_GRAPH_URL = os.getenv('WHATSAPP_GRAPH_URL', 'https://graph.facebook.com/v18.0')
+
+# Outbound HTTP (one keep-alive pool per process, shared by all Graph API calls)
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '20'))
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '3.05'))
+HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', '15'))
+HTTP_MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', '2'))
+HTTP_BACKOFF_BASE = float(os.getenv('HTTP_BACKOFF_BASE', '0.5'))
+HTTP_BACKOFF_MAX = float(os.getenv('HTTP_BACKOFF_MAX', '8'))
 
 # Google API Settings
 GOOGLE_CREDENTIALS_JSON = os.getenv('GOOGLE_CREDENTIALS_JSON')
@@ -149,3 +176,116 @@ UPI_MERCHANT_NAME = os.getenv('UPI_MERCHANT_NAME', 'EeOnam')
 
 # Base URL for verification links
 BASE_URL = os.getenv('BASE_URL', 'http://localhost:8000')
+
+# Webhook processing
+# 'inline' runs the bot inside the webhook request; 'queue' stores incoming messages
+# and acknowledges immediately, leaving them to `python manage.py run_webhook_workers`
+WEBHOOK_PROCESSING_MODE = os.getenv('WEBHOOK_PROCESSING_MODE', 'inline')
+WEBHOOK_WORKER_CONCURRENCY = int(os.getenv('WEBHOOK_WORKER_CONCURRENCY', '4'))
+WEBHOOK_WORKER_POLL_INTERVAL = float(os.getenv('WEBHOOK_WORKER_POLL_INTERVAL', '0.5'))
+WEBHOOK_QUEUE_MAX_ATTEMPTS = int(os.getenv('WEBHOOK_QUEUE_MAX_ATTEMPTS', '3'))
+WEBHOOK_QUEUE_LEASE_SECONDS = int(os.getenv('WEBHOOK_QUEUE_LEASE_SECONDS', '300'))
+
+# Async (ASGI) webhook: threads running the synchronous bot per process. Each conversation
+# holds one (and one DB connection) until its last send, so this caps conversations in flight
+ASYNC_BOT_THREADS = int(os.getenv('ASYNC_BOT_THREADS', '64'))
+
+# Inbound message deduplication (Meta redelivers webhooks for up to 7 days)
+MESSAGE_DEDUP_CACHE_SIZE = int(os.getenv('MESSAGE_DEDUP_CACHE_SIZE', '10000'))
+MESSAGE_DEDUP_TTL_SECONDS = int(os.getenv('MESSAGE_DEDUP_TTL_SECONDS', str(7 * 24 * 3600)))
+
+# Menu catalog: seconds between checks of the catalog version. The version is a stamp in the
+# cache only when the cache is shared (REDIS_URL); otherwise it is read from the MenuItem table
+MENU_CATALOG_CHECK_INTERVAL = float(os.getenv('MENU_CATALOG_CHECK_INTERVAL', '5'))
+MENU_CATALOG_SHARED_CACHE = os.getenv(
+    'MENU_CATALOG_SHARED_CACHE', 'True' if os.getenv('REDIS_URL') else 'False'
+) == 'True'
+
+# User session cache (read-through/write-through in front of UserSession; the DB stays authoritative)
+# On by default only with a shared cache (REDIS_URL). On locmem it is safe when one process
+# serves each phone: a single web process, or queue mode, where a phone always maps to one lane.
+# Entries expire after a conversation has been idle for SESSION_CACHE_TIMEOUT seconds.
+SESSION_CACHE_ENABLED = os.getenv('SESSION_CACHE_ENABLED', 'True' if os.getenv('REDIS_URL') else 'False') == 'True'
+SESSION_CACHE_TIMEOUT = int(os.getenv('SESSION_CACHE_TIMEOUT', '1800'))
+
+# Payment QR rendering
+# Optional PNG path for the pre-rendered branded template (written on first render if missing)
+QR_TEMPLATE_PATH = os.getenv('QR_TEMPLATE_PATH', '')
+# TrueType font for QR text; when unset, assets/fonts/ and common system fonts are tried
+QR_FONT_PATH = os.getenv('QR_FONT_PATH', '')
+# Worker processes that render QR images off the request thread (0 renders inline).
+# Each web process starts its own pool, so opt in per deployment (see DEPLOYMENT.md)
+QR_RENDER_WORKERS = int(os.getenv('QR_RENDER_WORKERS', '0'))
+# Renders allowed in flight per process; further callers wait QR_RENDER_SUBMIT_TIMEOUT seconds
+QR_RENDER_MAX_PENDING = int(os.getenv('QR_RENDER_MAX_PENDING', '8'))
+QR_RENDER_SUBMIT_TIMEOUT = float(os.getenv('QR_RENDER_SUBMIT_TIMEOUT', '10'))
+QR_RENDER_TIMEOUT = float(os.getenv('QR_RENDER_TIMEOUT', '15'))
+
+# Speculative QR: reserve the order id and render/upload its QR while a delivery customer types the address.
+# Off by default: every delivery cart that finishes menu selection pays for a render and upload, abandoned or not
+QR_PREFETCH_ENABLED = os.getenv('QR_PREFETCH_ENABLED', 'False') == 'True'
+QR_PREFETCH_THREADS = int(os.getenv('QR_PREFETCH_THREADS', '4'))
+# Seconds the payment step waits for an unfinished speculative QR before rendering its own
+QR_PREFETCH_WAIT = float(os.getenv('QR_PREFETCH_WAIT', '10'))
+
+# QR cache mode: 'order' renders a QR per order (note Order_<id>); 'amount' puts QR_AMOUNT_NOTE in the
+# UPI note instead, so one QR per total is rendered, uploaded once and reused from an LRU persisted on disk
+QR_CACHE_MODE = os.getenv('QR_CACHE_MODE', 'order')
+QR_AMOUNT_NOTE = os.getenv('QR_AMOUNT_NOTE', 'EeOnam')
+QR_AMOUNT_CACHE_SIZE = int(os.getenv('QR_AMOUNT_CACHE_SIZE', '64'))
+QR_AMOUNT_CACHE_PATH = os.getenv('QR_AMOUNT_CACHE_PATH', str(BASE_DIR / 'var' / 'qr_amount_urls.json'))
+
+# Payment QR hosting: 'cloudinary' uploads each QR; 'local' serves it from /qr/<order_id>.png
+# (BASE_URL must then be reachable by WhatsApp over HTTPS); 'whatsapp' uploads it to the Graph
+# /media endpoint and sends it by media id (one upload per distinct image)
+QR_HOSTING = os.getenv('QR_HOSTING', 'cloudinary')
+QR_IMAGE_DIR = os.getenv('QR_IMAGE_DIR', str(BASE_DIR / 'var' / 'qr_images'))
+QR_IMAGE_CACHE_BYTES = int(os.getenv('QR_IMAGE_CACHE_BYTES', str(256 * 1024 * 1024)))
+QR_IMAGE_MAX_AGE = int(os.getenv('QR_IMAGE_MAX_AGE', '86400'))
+
+# WhatsApp media ids are cached per image content; WhatsApp keeps uploaded media for 30 days
+WHATSAPP_MEDIA_ID_TTL = int(os.getenv('WHATSAPP_MEDIA_ID_TTL', str(29 * 24 * 3600)))
+
+# Payment QR encoding: png (palette PNG) or jpeg; WhatsApp image messages take nothing else
+QR_IMAGE_FORMAT = os.getenv('QR_IMAGE_FORMAT', 'png')
+QR_PNG_COLORS = int(os.getenv('QR_PNG_COLORS', '16'))
+# zlib level 0-9: higher is smaller and slower
+QR_PNG_COMPRESS_LEVEL = int(os.getenv('QR_PNG_COMPRESS_LEVEL', '6'))
+# JPEG/WebP quality (WebP at 100 is lossless)
+QR_IMAGE_QUALITY = int(os.getenv('QR_IMAGE_QUALITY', '90'))
+# Smaller images are padded with a metadata block up to this size (0 disables the floor)
+QR_MIN_IMAGE_BYTES = int(os.getenv('QR_MIN_IMAGE_BYTES', '10240'))
+
+# Payment screenshots: rejected above SCREENSHOT_MAX_BYTES, buffered in memory up to
+# SCREENSHOT_SPOOL_BYTES (then on disk), uploaded in chunks above SCREENSHOT_UPLOAD_CHUNK_BYTES
+# (Cloudinary needs chunks of at least 5 MB)
+SCREENSHOT_MAX_BYTES = int(os.getenv('SCREENSHOT_MAX_BYTES', str(16 * 1024 * 1024)))
+SCREENSHOT_SPOOL_BYTES = int(os.getenv('SCREENSHOT_SPOOL_BYTES', str(1024 * 1024)))
+SCREENSHOT_UPLOAD_CHUNK_BYTES = int(os.getenv('SCREENSHOT_UPLOAD_CHUNK_BYTES', str(6 * 1024 * 1024)))
+
+# Google Sheet sync: 'inline' writes each order and status change as it happens,
+# 'outbox' queues them for the run_sheet_sync flusher (batched writes per flush window)
+SHEET_SYNC_MODE = os.getenv('SHEET_SYNC_MODE', 'inline')
+SHEET_SYNC_FLUSH_INTERVAL = float(os.getenv('SHEET_SYNC_FLUSH_INTERVAL', '2'))
+SHEET_SYNC_BATCH_SIZE = int(os.getenv('SHEET_SYNC_BATCH_SIZE', '200'))
+SHEET_SYNC_MAX_ATTEMPTS = int(os.getenv('SHEET_SYNC_MAX_ATTEMPTS', '5'))
+SHEET_SYNC_LEASE_SECONDS = int(os.getenv('SHEET_SYNC_LEASE_SECONDS', '120'))
+# Token bucket under the Sheets per-minute write quota (60 per user)
+SHEET_SYNC_WRITES_PER_MINUTE = float(os.getenv('SHEET_SYNC_WRITES_PER_MINUTE', '50'))
+SHEET_SYNC_BURST = int(os.getenv('SHEET_SYNC_BURST', '5'))
+# Retries (with exponential backoff) of a flush write rejected by the Sheets quota
+SHEET_SYNC_QUOTA_RETRIES = int(os.getenv('SHEET_SYNC_QUOTA_RETRIES', '3'))
+
+# Google credentials are cached per process and refreshed this many seconds before
+# they expire; the token source (env var or token.json) is re-checked for rotation every
+# GOOGLE_TOKEN_CHECK_INTERVAL seconds
+GOOGLE_TOKEN_REFRESH_MARGIN = int(os.getenv('GOOGLE_TOKEN_REFRESH_MARGIN', '300'))
+GOOGLE_TOKEN_CHECK_INTERVAL = float(os.getenv('GOOGLE_TOKEN_CHECK_INTERVAL', '30'))
+
+# Sheet reconciliation (manage.py sync_sheet): cached sheet index file, rebuilt from the
+# sheet when older than SHEET_INDEX_MAX_AGE seconds; orders updated within
+# SHEET_RECONCILE_OVERLAP seconds before the watermark are re-checked
+SHEET_INDEX_PATH = os.getenv('SHEET_INDEX_PATH', str(BASE_DIR / 'var' / 'sheet_index.json'))
+SHEET_INDEX_MAX_AGE = int(os.getenv('SHEET_INDEX_MAX_AGE', '86400'))
+SHEET_RECONCILE_OVERLAP = int(os.getenv('SHEET_RECONCILE_OVERLAP', '60'))
+SHEET_RECONCILE_INTERVAL = float(os.getenv('SHEET_RECONCILE_INTERVAL', '300'))
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'eeonam_project.settings')
 
 application = get_wsgi_application()
+
+# Start the QR render workers now rather than on the first order
+from bot.qr_service import qr_render_service  # noqa: E402
+
+qr_render_service.warm_in_background()